@@ -22,6 +22,7 @@ def create_app(config_name='default'):
     
     @app.route('/health')
     def health():
-        return {'status': 'ok'}, 200
+        from app.services.reader_service import ReaderService
+        return {'status': 'ok', 'frame_cache': ReaderService().cache_stats()}, 200
     
     return app
\ No newline at end of file
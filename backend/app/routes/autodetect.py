@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify
 from werkzeug.utils import secure_filename
 from app.services.autodetect_service import AutoDetectService
+from app.services.reader_service import ReaderService
+from app.services.profiles_service import ProfilesService
 from config import Config
 import os
 
@@ -35,8 +37,21 @@ def analyze_files():
         if not file_paths:
             return jsonify({'error': 'No valid files provided'}), 400
         
+        sheets = ReaderService.parse_sheet_selection(request.form.get('sheets'))
+        
+        # Perfil opcional cuyas palabras clave complementan la detección
+        profile = None
+        profile_id = request.form.get('profile_id')
+        if profile_id:
+            profile = ProfilesService().get_profile(profile_id)
+            if not profile:
+                return jsonify({'error': 'Profile not found'}), 404
+        
+        infer_types = request.form.get('infer_types', 'true').lower() == 'true'
+        use_index = request.form.get('use_index', 'true').lower() == 'true'
+        
         # Analizar archivos
-        result = service.analyze_files(file_paths)
+        result = service.analyze_files(file_paths, sheets, profile, infer_types, use_index)
         
         # Limpiar archivos temporales
         for file_path in file_paths:
@@ -77,3 +92,40 @@ def create_profile_from_detection():
     
     except Exception as e:
         return jsonify({'error': str(e)}), 400
+
+
+@bp.route('/index', methods=['GET'])
+def get_header_index():
+    """Resumen del índice de encabezados de análisis anteriores"""
+    try:
+        top = request.args.get('top', 50, type=int)
+        return jsonify(service.index.summary(top)), 200
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/index/<path:header>', methods=['GET'])
+def get_header_entry(header):
+    """Entrada del índice para un encabezado"""
+    try:
+        entry = service.index.lookup(header)
+        
+        if entry is None:
+            return jsonify({'error': 'Header not found'}), 404
+        
+        return jsonify({'header': service.index.normalize(header), **entry}), 200
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/index', methods=['DELETE'])
+def clear_header_index():
+    """Vacía el índice de encabezados"""
+    try:
+        service.index.clear()
+        return jsonify({'message': 'Header index cleared'}), 200
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
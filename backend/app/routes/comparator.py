@@ -1,10 +1,16 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from werkzeug.utils import secure_filename
 from app.services.comparator_service import ComparatorService
+from app.services.reader_service import ReaderService
+from app.services.scanner_service import ScannerService
+from app.services.profiles_service import ProfilesService
+from app.services.diff_service import DiffService
 from config import Config
+import json
 
 bp = Blueprint('comparator', __name__, url_prefix='/api/comparator')
 service = ComparatorService()
+diff_service = DiffService()
 
 
 @bp.route('/compare', methods=['POST'])
@@ -33,13 +39,18 @@ def compare_file():
         except:
             return jsonify({'error': 'Invalid model_columns format'}), 400
         
+        check_data = request.form.get('check_data', 'true').lower() == 'true'
+        sheets = ReaderService.parse_sheet_selection(request.form.get('sheets'))
+        fuzzy = request.form.get('fuzzy', 'false').lower() == 'true'
+        model_name = request.form.get('model_name') or None
+        
         # Guardar archivo temporalmente
         filename = secure_filename(file.filename)
         file_path = Config.UPLOADS_DIR / filename
         file.save(str(file_path))
         
         # Comparar archivo
-        result = service.compare_with_model(str(file_path), model_columns)
+        result = service.compare_with_model(str(file_path), model_columns, check_data, sheets, fuzzy, model_name)
         
         return jsonify(result), 200
     
@@ -47,6 +58,137 @@ def compare_file():
         return jsonify({'error': str(e)}), 500
 
 
+@bp.route('/compare-bulk', methods=['POST'])
+def compare_bulk():
+    """
+    Compara muchos archivos contra un mismo modelo en una sola petición
+    
+    Los archivos llegan como 'files' y/o se toman de una carpeta escaneada
+    ('folder', 'recursive'). El modelo es 'model_columns' (JSON) o los
+    campos del perfil 'profile_id'. Con stream=true la respuesta es JSON
+    Lines: una línea por archivo a medida que termina y al final el resumen.
+    """
+    try:
+        # Obtener columnas del modelo
+        model_columns = request.form.get('model_columns')
+        profile_id = request.form.get('profile_id')
+        model_name = request.form.get('model_name') or None
+        
+        if model_columns:
+            try:
+                model_columns = json.loads(model_columns)
+            except:
+                return jsonify({'error': 'Invalid model_columns format'}), 400
+        elif profile_id:
+            profile = ProfilesService().get_profile(profile_id)
+            if not profile:
+                return jsonify({'error': 'Profile not found'}), 404
+            model_columns = [campo['nombre'] for campo in profile.get('campos', [])]
+            model_name = model_name or f'profile:{profile_id}'
+        else:
+            return jsonify({'error': 'model_columns or profile_id is required'}), 400
+        
+        # Archivos subidos
+        file_paths = []
+        for file in request.files.getlist('files'):
+            if file.filename == '':
+                continue
+            
+            filename = secure_filename(file.filename)
+            file_path = Config.UPLOADS_DIR / filename
+            file.save(str(file_path))
+            file_paths.append(str(file_path))
+        
+        # Archivos de una carpeta
+        folder = request.form.get('folder')
+        if folder:
+            recursive = request.form.get('recursive', 'true').lower() == 'true'
+            try:
+                scan = ScannerService().scan_folder(folder, recursive)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            file_paths.extend(sorted(f['path'] for f in scan['files']))
+        
+        if not file_paths:
+            return jsonify({'error': 'No files provided'}), 400
+        
+        check_data = request.form.get('check_data', 'true').lower() == 'true'
+        sheets = ReaderService.parse_sheet_selection(request.form.get('sheets'))
+        fuzzy = request.form.get('fuzzy', 'false').lower() == 'true'
+        stream = request.form.get('stream', 'false').lower() == 'true'
+        
+        if not stream:
+            summary = service.compare_many(file_paths, model_columns, check_data, sheets, fuzzy, model_name)
+            return jsonify(summary), 200
+        
+        def generate():
+            try:
+                for item in service.iter_compare_many(file_paths, model_columns, check_data, sheets, fuzzy, model_name):
+                    yield json.dumps(item, ensure_ascii=False, default=str) + '\n'
+            except Exception as e:
+                yield json.dumps({'type': 'error', 'error': str(e)}) + '\n'
+        
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/diff', methods=['POST'])
+def diff_files():
+    """
+    Diferencias fila a fila entre dos versiones de un libro
+    
+    Recibe 'old_file' y 'new_file', 'key_columns' (nombre de columna o
+    lista JSON para una clave compuesta) y opcionalmente 'old_sheet',
+    'new_sheet' y 'max_rows' (filas devueltas por categoría).
+    """
+    try:
+        if 'old_file' not in request.files or 'new_file' not in request.files:
+            return jsonify({'error': 'old_file and new_file are required'}), 400
+        
+        key_columns = request.form.get('key_columns')
+        
+        if not key_columns:
+            return jsonify({'error': 'key_columns is required'}), 400
+        
+        try:
+            key_columns = json.loads(key_columns)
+        except ValueError:
+            pass
+        
+        max_rows = request.form.get('max_rows', Config.DIFF_MAX_ROWS, type=int)
+        
+        # Guardar archivos temporalmente
+        file_paths = []
+        for field in ('old_file', 'new_file'):
+            file = request.files[field]
+            
+            if file.filename == '':
+                return jsonify({'error': f'No {field} selected'}), 400
+            
+            filename = secure_filename(f'{field}_{file.filename}')
+            file_path = Config.UPLOADS_DIR / filename
+            file.save(str(file_path))
+            file_paths.append(str(file_path))
+        
+        result = diff_service.diff_files(
+            file_paths[0],
+            file_paths[1],
+            key_columns if isinstance(key_columns, list) else str(key_columns),
+            request.form.get('old_sheet') or None,
+            request.form.get('new_sheet') or None,
+            max_rows if max_rows > 0 else None
+        )
+        
+        return jsonify(result), 200
+    
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @bp.route('/report/<report_name>', methods=['GET'])
 def get_report(report_name):
     """Obtiene un reporte de comparación guardado"""
@@ -60,3 +202,100 @@ def get_report(report_name):
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/reports', methods=['GET'])
+def query_reports():
+    """
+    Busca reportes guardados con filtros y paginación
+    
+    Parámetros: file (exacto o patrón con *), model, status, since, until,
+    min_similarity, max_similarity, missing_column, kind (file, bulk, all),
+    limit, offset y order (asc o desc)
+    """
+    try:
+        args = request.args
+        kind = args.get('kind', 'file')
+        
+        result = service.store.query(
+            file=args.get('file'),
+            model=args.get('model'),
+            status=args.get('status'),
+            since=args.get('since'),
+            until=args.get('until'),
+            min_similarity=args.get('min_similarity', type=float),
+            max_similarity=args.get('max_similarity', type=float),
+            missing_column=args.get('missing_column'),
+            kind=None if kind == 'all' else kind,
+            limit=args.get('limit', 50, type=int),
+            offset=args.get('offset', 0, type=int),
+            ascending=args.get('order', 'desc').lower() == 'asc'
+        )
+        
+        return jsonify(result), 200
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/reports/trends', methods=['GET'])
+def report_trends():
+    """Comparaciones, similitud media y estados por día, semana, mes o año"""
+    try:
+        args = request.args
+        trends = service.store.trends(
+            model=args.get('model'),
+            file=args.get('file'),
+            since=args.get('since'),
+            until=args.get('until'),
+            interval=args.get('interval', 'day')
+        )
+        
+        return jsonify({'trends': trends}), 200
+    
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/reports/missing-columns', methods=['GET'])
+def report_missing_columns():
+    """Columnas del modelo que faltan con más frecuencia"""
+    try:
+        args = request.args
+        columns = service.store.missing_columns(
+            model=args.get('model'),
+            since=args.get('since'),
+            until=args.get('until'),
+            limit=args.get('limit', 50, type=int)
+        )
+        
+        return jsonify({'missing_columns': columns}), 200
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/reports/import', methods=['POST'])
+def import_reports():
+    """Importa al almacén los reportes JSON de COMPARISON_REPORTS_DIR"""
+    try:
+        result = service.store.import_json_reports()
+        return jsonify(result), 200
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/reports/<report_name>', methods=['DELETE'])
+def delete_report(report_name):
+    """Elimina un reporte guardado"""
+    try:
+        if not service.store.delete(report_name):
+            return jsonify({'error': 'Report not found'}), 404
+        
+        return jsonify({'message': 'Report deleted'}), 200
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -1,6 +1,8 @@
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, Response, request, jsonify, send_file
+from pathlib import Path
 from werkzeug.utils import secure_filename
 from app.services.exporter_service import ExporterService
+from app.services.reader_service import ReaderService
 from config import Config
 
 bp = Blueprint('exporter', __name__, url_prefix='/api/exporter')
@@ -21,9 +23,11 @@ def export_file():
             return jsonify({'error': 'No file selected'}), 400
         
         # Obtener parámetros
-        formats = request.form.get('formats', 'csv')  # csv, json, sql
+        formats = request.form.get('formats', 'csv')  # csv, json, sql, sqlite
         table_name = request.form.get('table_name', 'data')
         database_type = request.form.get('database_type', 'postgresql')
+        sheets = ReaderService.parse_sheet_selection(request.form.get('sheets'))
+        normalize_dates = request.form.get('normalize_dates', 'false').lower() == 'true'
         
         # Convertir formats a lista
         if isinstance(formats, str):
@@ -35,7 +39,7 @@ def export_file():
         file.save(str(file_path))
         
         # Exportar a múltiples formatos
-        results = service.export_multiple_formats(str(file_path), formats)
+        results = service.export_multiple_formats(str(file_path), formats, sheets, normalize_dates, database_type)
         
         return jsonify(results), 200
     
@@ -57,12 +61,14 @@ def export_csv():
         
         delimiter = request.form.get('delimiter', ',')
         output_name = request.form.get('output_name')
+        sheet_name = request.form.get('sheet_name') or None
+        normalize_dates = request.form.get('normalize_dates', 'false').lower() == 'true'
         
         filename = secure_filename(file.filename)
         file_path = Config.UPLOADS_DIR / filename
         file.save(str(file_path))
         
-        csv_path = service.export_to_csv(str(file_path), output_name, delimiter)
+        csv_path = service.export_to_csv(str(file_path), output_name, delimiter, sheet_name, normalize_dates)
         
         return jsonify({'csv_path': csv_path}), 200
     
@@ -82,14 +88,17 @@ def export_json():
         if file.filename == '':
             return jsonify({'error': 'No file selected'}), 400
         
-        orient = request.form.get('orient', 'records')
+        orient = request.form.get('orient', 'records')  # también jsonl y columnar
         output_name = request.form.get('output_name')
+        sheet_name = request.form.get('sheet_name') or None
+        normalize_dates = request.form.get('normalize_dates', 'false').lower() == 'true'
+        compress = request.form.get('gzip', 'false').lower() == 'true'
         
         filename = secure_filename(file.filename)
         file_path = Config.UPLOADS_DIR / filename
         file.save(str(file_path))
         
-        json_path = service.export_to_json(str(file_path), output_name, orient)
+        json_path = service.export_to_json(str(file_path), output_name, orient, sheet_name, normalize_dates, compress)
         
         return jsonify({'json_path': json_path}), 200
     
@@ -112,6 +121,10 @@ def export_sql():
         table_name = request.form.get('table_name', 'data')
         database_type = request.form.get('database_type', 'postgresql')
         output_name = request.form.get('output_name')
+        sheet_name = request.form.get('sheet_name') or None
+        normalize_dates = request.form.get('normalize_dates', 'false').lower() == 'true'
+        batch_size = request.form.get('batch_size', type=int)
+        use_copy = request.form.get('use_copy', 'true').lower() == 'true'
         
         filename = secure_filename(file.filename)
         file_path = Config.UPLOADS_DIR / filename
@@ -121,10 +134,136 @@ def export_sql():
             str(file_path), 
             table_name, 
             database_type, 
-            output_name
+            output_name,
+            sheet_name,
+            normalize_dates,
+            batch_size,
+            use_copy
         )
         
         return jsonify({'sql_path': sql_path}), 200
     
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/export-sqlite', methods=['POST'])
+def export_sqlite():
+    """Exporta uno o más archivos a una base SQLite (una tabla por archivo)"""
+    try:
+        if 'files' not in request.files and 'file' not in request.files:
+            return jsonify({'error': 'No files provided'}), 400
+        
+        files = request.files.getlist('files') + request.files.getlist('file')
+        
+        output_name = request.form.get('output_name')
+        sheet_name = request.form.get('sheet_name') or None
+        normalize_dates = request.form.get('normalize_dates', 'false').lower() == 'true'
+        batch_size = request.form.get('batch_size', type=int)
+        table_names = request.form.get('table_names')
+        index_columns = request.form.get('indexes')
+        
+        # Listas separadas por comas
+        if table_names:
+            table_names = [name.strip() for name in table_names.split(',')]
+        if index_columns:
+            index_columns = [column.strip() for column in index_columns.split(',') if column.strip()]
+        
+        file_paths = []
+        for file in files:
+            if file.filename == '':
+                continue
+            
+            filename = secure_filename(file.filename)
+            file_path = Config.UPLOADS_DIR / filename
+            file.save(str(file_path))
+            file_paths.append(str(file_path))
+        
+        if not file_paths:
+            return jsonify({'error': 'No valid files provided'}), 400
+        
+        result = service.export_to_sqlite(
+            file_paths,
+            output_name,
+            table_names,
+            sheet_name,
+            normalize_dates,
+            batch_size,
+            index_columns
+        )
+        
+        return jsonify(result), 200
+    
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/export-stream', methods=['POST'])
+def export_stream():
+    """
+    Exporta un archivo y lo envía en la misma respuesta, por partes
+    
+    No se escribe archivo de salida: format es csv, jsonl o sql y con
+    gzip=true la descarga va comprimida (.gz).
+    """
+    try:
+        if 'file' not in request.files:
+            return jsonify({'error': 'No file provided'}), 400
+        
+        file = request.files['file']
+        
+        if file.filename == '':
+            return jsonify({'error': 'No file selected'}), 400
+        
+        fmt = request.form.get('format', 'csv').lower()
+        compress = request.form.get('gzip', 'false').lower() == 'true'
+        sheet_name = request.form.get('sheet_name') or None
+        normalize_dates = request.form.get('normalize_dates', 'false').lower() == 'true'
+        
+        if fmt not in service.STREAM_FORMATS:
+            return jsonify({'error': f'Unsupported format: {fmt}'}), 400
+        
+        filename = secure_filename(file.filename)
+        file_path = Config.UPLOADS_DIR / filename
+        file.save(str(file_path))
+        
+        stream = service.stream_export(
+            str(file_path),
+            fmt,
+            sheet_name,
+            normalize_dates,
+            compress,
+            delimiter=request.form.get('delimiter', ','),
+            table_name=request.form.get('table_name', 'data'),
+            database_type=request.form.get('database_type', 'postgresql'),
+            batch_size=request.form.get('batch_size', type=int),
+            use_copy=request.form.get('use_copy', 'true').lower() == 'true'
+        )
+        
+        # La primera parte se produce aquí: los errores de lectura o de
+        # parámetros todavía pueden responder con JSON y su código
+        first = next(stream, b'')
+        
+        def generate():
+            yield first
+            yield from stream
+        
+        mimetype, extension = service.STREAM_FORMATS[fmt]
+        download_name = f"{Path(filename).stem}.{extension}"
+        if compress:
+            mimetype, download_name = 'application/gzip', download_name + '.gz'
+        
+        return Response(
+            generate(),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename="{download_name}"'}
+        )
+    
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
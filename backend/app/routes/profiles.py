@@ -1,8 +1,12 @@
 from flask import Blueprint, request, jsonify
+from werkzeug.utils import secure_filename
 from app.services.profiles_service import ProfilesService
+from app.services.validation_service import ValidationService
+from config import Config
 
 bp = Blueprint('profiles', __name__, url_prefix='/api/profiles')
 service = ProfilesService()
+validation_service = ValidationService()
 
 
 @bp.route('', methods=['GET'])
@@ -94,3 +98,46 @@ def search_profiles():
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/<profile_id>/validate', methods=['POST'])
+def validate_file(profile_id):
+    """
+    Valida un archivo contra los campos de un perfil
+    
+    Recibe el archivo como 'file' y opcionalmente 'sheet' y 'sample_size'
+    (filas de ejemplo por campo). Devuelve, por campo, las violaciones de
+    obligatoriedad y de tipo con una muestra de las filas que fallan.
+    """
+    try:
+        profile = service.get_profile(profile_id)
+        
+        if profile is None:
+            return jsonify({'error': 'Profile not found'}), 404
+        
+        if 'file' not in request.files:
+            return jsonify({'error': 'No file provided'}), 400
+        
+        file = request.files['file']
+        
+        if file.filename == '':
+            return jsonify({'error': 'No file selected'}), 400
+        
+        sample_size = request.form.get('sample_size', Config.VALIDATION_SAMPLE_ROWS, type=int)
+        
+        # Guardar archivo temporalmente
+        filename = secure_filename(file.filename)
+        file_path = Config.UPLOADS_DIR / filename
+        file.save(str(file_path))
+        
+        result = validation_service.validate_file(
+            str(file_path),
+            profile,
+            request.form.get('sheet') or None,
+            max(sample_size, 0)
+        )
+        
+        return jsonify(result), 200
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from werkzeug.utils import secure_filename
 from app.services.unifier_service import UnifierService
+from app.services.reader_service import ReaderService
 from config import Config
 
 bp = Blueprint('unifier', __name__, url_prefix='/api/unifier')
@@ -24,6 +25,13 @@ def unify_files():
         output_name = request.form.get('output_name', 'unificado.xlsx')
         remove_duplicates = request.form.get('remove_duplicates', 'false').lower() == 'true'
         add_source_column = request.form.get('add_source_column', 'true').lower() == 'true'
+        sheets = ReaderService.parse_sheet_selection(request.form.get('sheets'))
+        normalize_dates = request.form.get('normalize_dates', 'false').lower() == 'true'
+        
+        # 'true' / 'false' fuerzan el modo; sin valor se decide por tamaño
+        out_of_core = request.form.get('out_of_core')
+        if out_of_core is not None:
+            out_of_core = out_of_core.lower() == 'true'
         
         # Guardar archivos temporalmente
         file_paths = []
@@ -44,7 +52,10 @@ def unify_files():
             file_paths, 
             output_name, 
             remove_duplicates, 
-            add_source_column
+            add_source_column,
+            sheets,
+            out_of_core,
+            normalize_dates
         )
         
         return jsonify(result), 200
@@ -53,6 +64,98 @@ def unify_files():
         return jsonify({'error': str(e)}), 500
 
 
+@bp.route('/targets', methods=['GET'])
+def list_targets():
+    """Lista los destinos de unificación incremental"""
+    try:
+        return jsonify({'targets': service.list_targets()}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/targets/<target_name>', methods=['GET'])
+def get_target(target_name):
+    """Obtiene el manifiesto de un destino"""
+    try:
+        manifest = service.get_target(target_name)
+        
+        if not manifest:
+            return jsonify({'error': 'Target not found'}), 404
+        
+        return jsonify(manifest), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/targets/<target_name>', methods=['DELETE'])
+def delete_target(target_name):
+    """Elimina un destino"""
+    try:
+        if not service.delete_target(target_name):
+            return jsonify({'error': 'Target not found'}), 404
+        
+        return jsonify({'message': 'Target deleted successfully'}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/targets/<target_name>/append', methods=['POST'])
+def append_to_target(target_name):
+    """Agrega al destino solo los archivos que aún no contiene"""
+    try:
+        if 'files' not in request.files:
+            return jsonify({'error': 'No files provided'}), 400
+        
+        files = request.files.getlist('files')
+        
+        remove_duplicates = request.form.get('remove_duplicates', 'false').lower() == 'true'
+        add_source_column = request.form.get('add_source_column', 'true').lower() == 'true'
+        sheets = ReaderService.parse_sheet_selection(request.form.get('sheets'))
+        output_name = request.form.get('output_name') or None
+        
+        file_paths = []
+        for file in files:
+            if file.filename == '':
+                continue
+            
+            filename = secure_filename(file.filename)
+            file_path = Config.UPLOADS_DIR / filename
+            file.save(str(file_path))
+            file_paths.append(str(file_path))
+        
+        if not file_paths:
+            return jsonify({'error': 'No valid files provided'}), 400
+        
+        result = service.unify_incremental(
+            target_name,
+            file_paths,
+            remove_duplicates,
+            add_source_column,
+            sheets,
+            output_name
+        )
+        
+        return jsonify(result), 200
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/targets/<target_name>/materialize', methods=['POST'])
+def materialize_target(target_name):
+    """Genera el Excel unificado de un destino"""
+    try:
+        data = request.get_json(silent=True) or {}
+        result = service.materialize_target(target_name, data.get('output_name'))
+        
+        return jsonify(result), 200
+    
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @bp.route('/normalize-columns', methods=['POST'])
 def normalize_columns():
     """Normaliza nombres de columnas de un archivo"""
@@ -69,7 +172,8 @@ def normalize_columns():
         file_path = Config.UPLOADS_DIR / filename
         file.save(str(file_path))
         
-        column_mapping = service.normalize_column_names(str(file_path))
+        sheet_name = request.form.get('sheet_name') or None
+        column_mapping = service.normalize_column_names(str(file_path), sheet_name)
         
         return jsonify({'column_mapping': column_mapping}), 200
     
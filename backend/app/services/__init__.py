@@ -5,6 +5,19 @@ from .scanner_service import ScannerService
 from .unifier_service import UnifierService
 from .comparator_service import ComparatorService
 from .exporter_service import ExporterService
+from .reader_service import ReaderService
+from .csv_service import CsvService
+from .columnar_cache_service import ColumnarCacheService
+from .dedup_service import DedupService
+from .fuzzy_matcher_service import FuzzyMatcherService
+from .type_inference_service import TypeInferenceService
+from .header_index_service import HeaderIndexService
+from .column_profiler_service import ColumnProfilerService
+from .report_store_service import ReportStoreService
+from .diff_service import DiffService
+from .validation_service import ValidationService
+from .date_normalizer_service import DateNormalizerService
+from .sql_export_service import SqlExportService
 
 __all__ = [
     'ProfilesService',
@@ -13,5 +26,18 @@ __all__ = [
     'ScannerService',
     'UnifierService',
     'ComparatorService',
-    'ExporterService'
+    'ExporterService',
+    'ReaderService',
+    'CsvService',
+    'ColumnarCacheService',
+    'DedupService',
+    'FuzzyMatcherService',
+    'TypeInferenceService',
+    'HeaderIndexService',
+    'ColumnProfilerService',
+    'ReportStoreService',
+    'DiffService',
+    'ValidationService',
+    'DateNormalizerService',
+    'SqlExportService'
 ]
@@ -1,8 +1,98 @@
 import pandas as pd
 import re
-from typing import List, Dict, Any, Optional
+from collections import Counter
+from typing import List, Dict, Any, Optional, Union
 from pathlib import Path
 from config import Config
+from app.services.reader_service import ReaderService
+from app.services.fuzzy_matcher_service import FuzzyMatcherService
+from app.services.type_inference_service import TypeInferenceService
+from app.services.header_index_service import HeaderIndexService
+from app.models.profile import Profile
+
+
+class HeaderMatcher:
+    """
+    Clasificador de encabezados compilado una sola vez
+    
+    Todos los patrones se combinan en una única expresión regular: por cada
+    tipo de campo hay un grupo opcional con una alternativa por patrón, cada
+    una como lookahead con grupo con nombre. Con un solo match al inicio del
+    encabezado se obtienen todos los tipos que coinciden, el primer patrón
+    de cada uno (en el orden definido) y la posición de la coincidencia,
+    de la que sale la confianza. El resultado se memoriza por encabezado
+    normalizado.
+    """
+    
+    MEMO_SIZE = 65536
+    
+    def __init__(self, patterns: Dict[str, List[str]], data_types: Dict[str, str]):
+        """
+        Args:
+            patterns: Patrones (regex) por tipo de campo, en orden de prioridad
+            data_types: Tipo de dato de cada tipo de campo
+        """
+        self.data_types = data_types
+        self._groups = {}
+        self._memo = {}
+        
+        parts = []
+        for i, (field_type, field_patterns) in enumerate(patterns.items()):
+            alternatives = []
+            for j, pattern in enumerate(field_patterns):
+                group = f'f{i}_{j}'
+                self._groups[group] = (field_type, pattern)
+                alternatives.append(f'(?=.*?(?P<{group}>{pattern}))')
+            
+            if alternatives:
+                parts.append('(?:' + '|'.join(alternatives) + ')?')
+        
+        self._regex = re.compile(''.join(parts), re.DOTALL)
+    
+    def match(self, header: Any) -> List[Dict[str, Any]]:
+        """
+        Clasifica un encabezado
+        
+        Returns:
+            Lista de coincidencias (una por tipo de campo) con 'field',
+            'data_type', 'pattern' y 'confidence'
+        """
+        key = str(header).lower()
+        
+        cached = self._memo.get(key)
+        if cached is not None:
+            return cached
+        
+        matches = []
+        found = self._regex.match(key)
+        
+        for group, value in found.groupdict().items():
+            if value is None:
+                continue
+            
+            field_type, pattern = self._groups[group]
+            start, end = found.span(group)
+            
+            # Coincidencia exacta = 100%; al inicio = 90%; parcial = 70%
+            if start == 0 and end == len(key):
+                confidence = 1.0
+            elif start == 0:
+                confidence = 0.9
+            else:
+                confidence = 0.7
+            
+            matches.append({
+                'field': field_type,
+                'data_type': self.data_types.get(field_type, 'texto'),
+                'pattern': pattern,
+                'confidence': confidence
+            })
+        
+        if len(self._memo) >= self.MEMO_SIZE:
+            self._memo.clear()
+        self._memo[key] = matches
+        
+        return matches
 
 
 class AutoDetectService:
@@ -22,82 +112,287 @@ class AutoDetectService:
         'estado': [r'estado', r'status', r'situaci[oó]n'],
     }
     
+    # Matchers con palabras clave de perfiles, por (id, fecha de actualización)
+    _profile_matchers = {}
+    
     def __init__(self):
         self.temp_dir = Config.TEMP_MUESTRAS_DIR
         self.temp_dir.mkdir(parents=True, exist_ok=True)
+        self.reader = ReaderService()
+        self.matcher = self._build_matcher()
+        self.fuzzy = FuzzyMatcherService()
+        self.types = TypeInferenceService()
+        self.index = HeaderIndexService()
     
-    def analyze_files(self, file_paths: List[str]) -> Dict[str, Any]:
+    def analyze_files(self, 
+                      file_paths: List[str], 
+                      sheets: Union[None, str, List[str]] = None,
+                      profile: Optional[Dict[str, Any]] = None,
+                      infer_types: bool = True,
+                      use_index: bool = True) -> Dict[str, Any]:
         """
         Analiza múltiples archivos Excel y detecta campos comunes
         
         Args:
             file_paths: Lista de rutas a archivos Excel
-            
+            sheets: Hojas a analizar: None (primera), 'all', un nombre,
+                un patrón tipo glob o una lista de nombres
+            profile: Perfil cuyas palabras clave se suman a los patrones
+            infer_types: Si infiere el tipo de cada columna a partir de una
+                muestra de filas (costo acotado por Config.SAMPLE_ROWS)
+            use_index: Si consulta y actualiza el índice de encabezados de
+                análisis anteriores. Las hojas cuyos encabezados ya tienen
+                un tipo aprendido en suficientes hojas no se muestrean.
+                
         Returns:
-            Diccionario con campos detectados y estadísticas
+            Diccionario con campos detectados y estadísticas (una entrada
+            de files_analyzed por cada hoja analizada)
         """
         all_columns = []
         file_stats = []
+        errors = []
+        column_types = {}
         
-        for file_path in file_paths:
-            try:
-                # Leer archivo Excel
-                df = pd.read_excel(file_path)
-                columns = df.columns.tolist()
+        # Solo se necesitan encabezados y conteo de filas, leídos en paralelo
+        for outcome in self.reader.probe_many(file_paths, sheets):
+            if 'error' in outcome:
+                errors.append({'file': Path(outcome['file']).name, 'error': outcome['error']})
+                continue
+            
+            for sheet_name, probe in outcome['probes'].items():
+                columns = probe['columns']
                 
                 all_columns.extend(columns)
-                file_stats.append({
-                    'file': Path(file_path).name,
+                stats = {
+                    'file': Path(outcome['file']).name,
+                    'sheet': sheet_name,
                     'columns': columns,
-                    'rows': len(df)
-                })
-            
-            except Exception as e:
-                print(f"Error reading {file_path}: {e}")
-                continue
+                    'rows': probe['rows']
+                }
+                
+                if infer_types:
+                    known = self._indexed_types(columns) if use_index else None
+                    
+                    if known is not None:
+                        stats['column_types'] = known
+                    else:
+                        try:
+                            stats['column_types'] = self.types.infer_file(outcome['file'], sheet_name)
+                        except Exception as e:
+                            errors.append({'file': stats['file'], 'sheet': sheet_name, 'error': str(e)})
+                    
+                    # Para cada columna se usa la muestra con más valores no vacíos
+                    for col, inferred in stats.get('column_types', {}).items():
+                        current = column_types.get(col)
+                        if current is None or self._non_null(inferred) > self._non_null(current):
+                            column_types[col] = inferred
+                
+                stats['_path'] = outcome['file']
+                file_stats.append(stats)
+        
+        unique_columns = list(dict.fromkeys(all_columns))
+        corpus = self.index.lookup_many(unique_columns) if use_index else {}
         
         # Detectar campos comunes
-        detected_fields = self._detect_common_fields(all_columns)
+        detected_fields = self._detect_common_fields(all_columns, self._matcher_for(profile), column_types)
+        
+        # Columnas sin patrón que el índice ya conoce por análisis anteriores
+        matched = {field['original_column'] for field in detected_fields}
+        for column in unique_columns:
+            entry = corpus.get(column)
+            if column in matched or not entry or not entry.get('last_field'):
+                continue
+            
+            detected_fields.append({
+                'original_column': column,
+                'suggested_field': entry['last_field'],
+                'data_type': entry.get('last_data_type') or 'texto',
+                'confidence': 0.8 if entry['files'] >= Config.HEADER_INDEX_TRUST_SHEETS else 0.6,
+                'keywords': [str(column).lower()],
+                'source': 'index'
+            })
+        
+        # Con perfil, cada hoja se empareja además por similitud con sus campos
+        if profile:
+            fields = self._profile_keywords(profile)
+            for stats in file_stats:
+                stats['profile_matches'] = self.fuzzy.match(stats['columns'], fields)
+        
+        # Frecuencias históricas del índice, antes de sumar este análisis
+        corpus_frequency = {
+            column: {'count': entry['count'], 'files': entry['files']}
+            for column, entry in corpus.items() if entry
+        }
+        
+        if use_index:
+            self._update_index(file_stats, detected_fields)
+        
+        for stats in file_stats:
+            stats.pop('_path', None)
         
         # Calcular estadísticas
-        unique_columns = list(set(all_columns))
-        column_frequency = {col: all_columns.count(col) for col in unique_columns}
+        column_frequency = dict(Counter(all_columns))
         
-        return {
+        result = {
             'detected_fields': detected_fields,
             'statistics': {
                 'total_files': len(file_paths),
                 'total_columns': len(all_columns),
                 'unique_columns': len(unique_columns),
-                'files_analyzed': file_stats
+                'files_analyzed': file_stats,
+                'errors': errors
             },
             'column_frequency': column_frequency
         }
+        
+        if use_index:
+            result['corpus_frequency'] = corpus_frequency
+        
+        return result
+    
+    def _indexed_types(self, columns: List[Any]) -> Optional[Dict[Any, Dict[str, Any]]]:
+        """
+        Tipos aprendidos para todas las columnas de una hoja, o None
+        
+        Solo se usan si cada encabezado tiene un tipo de contenido visto en
+        al menos Config.HEADER_INDEX_TRUST_SHEETS hojas.
+        """
+        entries = self.index.lookup_many(columns)
+        known = {}
+        
+        for column in columns:
+            entry = entries.get(column)
+            if not entry or not entry.get('last_content_type') or entry['files'] < Config.HEADER_INDEX_TRUST_SHEETS:
+                return None
+            
+            known[column] = {
+                'data_type': entry.get('last_data_type') or 'texto',
+                'content_type': entry['last_content_type'],
+                'confidence': None,
+                'sample_size': 0,
+                'null_rate': 0.0,
+                'source': 'index'
+            }
+        
+        return known
     
-    def _detect_common_fields(self, columns: List[str]) -> List[Dict[str, Any]]:
-        """Detecta campos comunes basándose en patrones"""
+    def _update_index(self, file_stats: List[Dict[str, Any]], detected_fields: List[Dict[str, Any]]) -> None:
+        """Registra en el índice los encabezados y asignaciones de este análisis"""
+        assigned_fields = {}
+        for field in detected_fields:
+            assigned_fields.setdefault(field['original_column'], field)
+        
+        entries = []
+        for stats in file_stats:
+            assignments = {}
+            column_types = stats.get('column_types', {})
+            
+            for column in stats['columns']:
+                field = assigned_fields.get(column)
+                inferred = column_types.get(column)
+                assignments[column] = {
+                    'field': field['suggested_field'] if field else None,
+                    'data_type': field['data_type'] if field else (inferred or {}).get('data_type'),
+                    'content_type': (inferred or {}).get('content_type')
+                }
+            
+            for match in stats.get('profile_matches', []):
+                assignments[match['column']]['field'] = match['field']
+            
+            try:
+                source_key = f"{self.reader.file_hash(stats['_path'])}:{stats['sheet']}"
+            except Exception as e:
+                print(f"Error updating header index: {e}")
+                continue
+            
+            entries.append({
+                'source_key': source_key,
+                'file_name': stats['file'],
+                'columns': stats['columns'],
+                'assignments': assignments
+            })
+        
+        # Una sola lectura y escritura del índice por análisis
+        try:
+            self.index.update_many(entries)
+        except Exception as e:
+            print(f"Error updating header index: {e}")
+    
+    def _detect_common_fields(self, 
+                              columns: List[str], 
+                              matcher: Optional[HeaderMatcher] = None,
+                              column_types: Optional[Dict[Any, Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+        """
+        Detecta campos comunes basándose en patrones
+        
+        Si se conoce el tipo de contenido de la columna y es uno específico
+        (no texto libre), ese tipo reemplaza al que sugiere el nombre.
+        """
+        matcher = matcher or self.matcher
+        column_types = column_types or {}
         detected = []
         
-        for column in set(columns):
-            col_lower = column.lower()
+        for column in dict.fromkeys(columns):
+            inferred = column_types.get(column)
             
-            for field_type, patterns in self.PATRONES.items():
-                for pattern in patterns:
-                    if re.search(pattern, col_lower):
-                        # Determinar tipo de dato
-                        data_type = self._infer_data_type(field_type)
-                        
-                        detected.append({
-                            'original_column': column,
-                            'suggested_field': field_type,
-                            'data_type': data_type,
-                            'confidence': self._calculate_confidence(column, pattern),
-                            'keywords': [column.lower()]
-                        })
-                        break
+            for match in matcher.match(column):
+                field = {
+                    'original_column': column,
+                    'suggested_field': match['field'],
+                    'data_type': match['data_type'],
+                    'confidence': match['confidence'],
+                    'keywords': [str(column).lower()]
+                }
+                
+                if inferred is not None:
+                    if inferred['content_type'] != 'texto':
+                        field['data_type'] = inferred['data_type']
+                    field['content_type'] = inferred['content_type']
+                    field['type_confidence'] = inferred['confidence']
+                
+                detected.append(field)
         
         return detected
     
+    def _non_null(self, inferred: Dict[str, Any]) -> float:
+        return inferred['sample_size'] * (1 - inferred['null_rate'])
+    
+    def _profile_keywords(self, profile: Dict[str, Any]) -> Dict[str, List[str]]:
+        """Palabras clave de cada campo del perfil, incluido su nombre"""
+        fields = {}
+        for campo in profile.get('campos', []):
+            keywords = [campo['nombre']] + list(campo.get('palabras_clave', []))
+            fields[campo['nombre']] = [kw for kw in keywords if str(kw).strip()]
+        return fields
+    
+    def _build_matcher(self, profile: Optional[Profile] = None) -> HeaderMatcher:
+        """Compila los patrones base más las palabras clave del perfil"""
+        patterns = {field_type: list(field_patterns) for field_type, field_patterns in self.PATRONES.items()}
+        data_types = {field_type: self._infer_data_type(field_type) for field_type in self.PATRONES}
+        
+        if profile is not None:
+            for campo in profile.campos:
+                keywords = [re.escape(str(kw).strip().lower()) for kw in campo.palabras_clave if str(kw).strip()]
+                patterns.setdefault(campo.nombre, []).extend(keywords)
+                data_types[campo.nombre] = campo.tipo_dato
+        
+        return HeaderMatcher(patterns, data_types)
+    
+    def _matcher_for(self, profile: Optional[Dict[str, Any]]) -> HeaderMatcher:
+        """Matcher para un perfil, reutilizado mientras el perfil no cambie"""
+        if not profile:
+            return self.matcher
+        
+        key = (profile.get('id'), profile.get('fecha_actualizacion'))
+        matcher = self._profile_matchers.get(key) if key[0] else None
+        
+        if matcher is None:
+            matcher = self._build_matcher(Profile.from_dict(profile))
+            if key[0]:
+                self._profile_matchers[key] = matcher
+        
+        return matcher
+    
     def _infer_data_type(self, field_type: str) -> str:
         """Infiere el tipo de dato basado en el tipo de campo"""
         type_mapping = {
@@ -114,21 +409,6 @@ class AutoDetectService:
         }
         return type_mapping.get(field_type, 'texto')
     
-    def _calculate_confidence(self, column: str, pattern: str) -> float:
-        """Calcula el nivel de confianza de la detección"""
-        # Coincidencia exacta = 100%
-        if re.fullmatch(pattern, column.lower()):
-            return 1.0
-        
-        # Coincidencia parcial = 70-90%
-        if re.search(pattern, column.lower()):
-            # Más confianza si el patrón está al inicio
-            if re.match(pattern, column.lower()):
-                return 0.9
-            return 0.7
-        
-        return 0.5
-    
     def create_profile_from_detection(self, 
                                      detected_fields: List[Dict[str, Any]], 
                                      profile_name: str,
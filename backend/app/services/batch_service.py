@@ -64,8 +64,11 @@ def process_batch():
                 continue
             
             try:
-                # Leer archivo Excel
-                df = pd.read_excel(input_file)
+                # Leer archivo (CSV o Excel)
+                if Path(input_file).suffix.lower() == '.csv':
+                    df = pd.read_csv(input_file, sep=None, engine='python', encoding_errors='replace')
+                else:
+                    df = pd.read_excel(input_file)
                 
                 # Aplicar transformaciones según perfil
                 # TODO: Agregar lógica de mapeo del perfil
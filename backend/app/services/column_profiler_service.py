@@ -0,0 +1,306 @@
+import pandas as pd
+import numpy as np
+from typing import Dict, Any, Iterable, List, Optional
+from config import Config
+from app.services.reader_service import ReaderService
+
+
+class ColumnStats:
+    """
+    Acumulador de estadísticas de una columna, bloque a bloque
+    
+    Cada bloque se procesa con operaciones vectorizadas y solo se conserva
+    un resumen de tamaño fijo: conteos, suma, mínimo y máximo, un sketch
+    HyperLogLog para estimar valores distintos, un contador acotado de
+    valores frecuentes y un histograma de longitudes de texto.
+    """
+    
+    # 2^HLL_PRECISION registros (error típico ≈ 1.04 / sqrt(4096) ≈ 1,6%)
+    HLL_PRECISION = 12
+    
+    # Valores candidatos que se conservan para el top-k
+    TOP_CAPACITY = 1000
+    
+    # Límites de los rangos del histograma de longitudes
+    LENGTH_BINS = [0, 1, 2, 6, 11, 21, 51, 101, 256]
+    
+    def __init__(self, name: Any):
+        self.name = name
+        self.dtypes = []
+        self.count = 0
+        self.nulls = 0
+        self.blanks = 0
+        self.numeric_count = 0
+        self.numeric_finite = 0
+        self.numeric_sum = 0.0
+        self.numeric_min = None
+        self.numeric_max = None
+        self.date_min = None
+        self.date_max = None
+        self.text_count = 0
+        self.length_sum = 0
+        self.length_min = None
+        self.length_max = None
+        self.length_histogram = np.zeros(len(self.LENGTH_BINS), dtype=np.int64)
+        self.registers = np.zeros(1 << self.HLL_PRECISION, dtype=np.uint8)
+        self.frequent = None
+        self.top_exact = True
+    
+    def update(self, series: pd.Series) -> None:
+        """Incorpora los valores de un bloque"""
+        dtype = str(series.dtype)
+        if dtype not in self.dtypes:
+            self.dtypes.append(dtype)
+        
+        self.count += len(series)
+        null_mask = series.isna().to_numpy()
+        self.nulls += int(null_mask.sum())
+        
+        values = series[~null_mask]
+        if len(values) == 0:
+            return
+        
+        kind = values.dtype.kind
+        
+        # Las operaciones por valor se hacen sobre los valores distintos del
+        # bloque y se ponderan con su frecuencia
+        counts = values.value_counts(sort=False)
+        uniques = counts.index
+        weights = counts.to_numpy()
+        
+        if kind in 'biuf':
+            self._update_numeric(values.astype('float64'))
+            hashed = uniques.astype('float64').to_numpy()
+        elif kind == 'M':
+            self._update_dates(values)
+            hashed = uniques.to_numpy().view('int64')
+        else:
+            hashed = uniques.to_numpy(dtype=object)
+            is_text = np.fromiter((isinstance(v, str) for v in hashed), dtype=bool, count=len(hashed))
+            
+            # En columnas mixtas (object) los números que no son texto
+            # también cuentan para mínimo, máximo y media
+            if not is_text.all():
+                numeric = pd.to_numeric(pd.Series(hashed[~is_text]), errors='coerce').to_numpy(dtype='float64')
+                numeric_weights = weights[~is_text]
+                parsed = ~np.isnan(numeric)
+                self._update_numeric(pd.Series(np.repeat(numeric[parsed], numeric_weights[parsed])))
+            
+            text = pd.Series(hashed).astype(str)
+            lengths = text.str.len().to_numpy()
+            blank = (text.str.strip() == '').to_numpy()
+            self.blanks += int(weights[blank].sum())
+            self.text_count += int(weights[is_text & ~blank].sum())
+            self._update_lengths(lengths[~blank], weights[~blank])
+        
+        self._update_sketch(pd.util.hash_array(hashed))
+        self._update_frequent(counts)
+    
+    def result(self, top_k: Optional[int] = None) -> Dict[str, Any]:
+        """Resumen de la columna"""
+        top_k = top_k or Config.PROFILE_TOP_K
+        non_null = self.count - self.nulls
+        
+        profile = {
+            'column': self.name,
+            'dtype': self.dtypes[0] if len(self.dtypes) == 1 else 'mixed' if self.dtypes else None,
+            'count': self.count,
+            'null_count': self.nulls,
+            'null_percentage': round(self.nulls / self.count * 100, 2) if self.count else 0,
+            'blank_count': self.blanks,
+            'distinct_estimate': self.distinct_estimate() if non_null else 0,
+            'numeric_count': self.numeric_count,
+            'text_count': self.text_count,
+            'min': None,
+            'max': None,
+            'mean': None,
+            'top_values': [
+                {'value': _to_json(value), 'count': int(count)}
+                for value, count in (self.frequent.nlargest(top_k).items() if self.frequent is not None else [])
+            ],
+            'top_values_exact': self.top_exact,
+            'string_length': None
+        }
+        
+        if self.numeric_finite:
+            profile.update({
+                'min': _to_json(self.numeric_min),
+                'max': _to_json(self.numeric_max),
+                'mean': round(self.numeric_sum / self.numeric_finite, 6)
+            })
+        elif self.date_min is not None:
+            profile.update({
+                'min': self.date_min.isoformat(),
+                'max': self.date_max.isoformat()
+            })
+        
+        lengths = int(self.length_histogram.sum())
+        if lengths:
+            edges = self.LENGTH_BINS + [None]
+            profile['string_length'] = {
+                'min': self.length_min,
+                'max': self.length_max,
+                'mean': round(self.length_sum / lengths, 2),
+                'histogram': [
+                    {
+                        'range': f'{edges[i]}+' if edges[i + 1] is None else
+                                 str(edges[i]) if edges[i + 1] - edges[i] == 1 else
+                                 f'{edges[i]}-{edges[i + 1] - 1}',
+                        'count': int(count)
+                    }
+                    for i, count in enumerate(self.length_histogram) if count
+                ]
+            }
+        
+        return profile
+    
+    def distinct_estimate(self) -> int:
+        """Estimación HyperLogLog de valores distintos no nulos"""
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        
+        # Corrección para cardinalidades pequeñas (conteo lineal)
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * np.log(m / zeros)
+        
+        return int(round(estimate))
+    
+    def _update_numeric(self, values: pd.Series) -> None:
+        if len(values) == 0:
+            return
+        
+        finite = values.to_numpy()
+        finite = finite[np.isfinite(finite)]
+        self.numeric_count += len(values)
+        
+        if len(finite) == 0:
+            return
+        
+        self.numeric_finite += len(finite)
+        self.numeric_sum += float(finite.sum())
+        low, high = float(finite.min()), float(finite.max())
+        self.numeric_min = low if self.numeric_min is None else min(self.numeric_min, low)
+        self.numeric_max = high if self.numeric_max is None else max(self.numeric_max, high)
+    
+    def _update_dates(self, values: pd.Series) -> None:
+        low, high = values.min(), values.max()
+        self.date_min = low if self.date_min is None else min(self.date_min, low)
+        self.date_max = high if self.date_max is None else max(self.date_max, high)
+    
+    def _update_lengths(self, lengths: np.ndarray, weights: np.ndarray) -> None:
+        if len(lengths) == 0:
+            return
+        
+        self.length_sum += int((lengths * weights).sum())
+        low, high = int(lengths.min()), int(lengths.max())
+        self.length_min = low if self.length_min is None else min(self.length_min, low)
+        self.length_max = high if self.length_max is None else max(self.length_max, high)
+        
+        bins = np.searchsorted(self.LENGTH_BINS, lengths, side='right') - 1
+        self.length_histogram += np.bincount(bins, weights=weights, minlength=len(self.LENGTH_BINS)).astype(np.int64)
+    
+    def _update_sketch(self, hashes: np.ndarray) -> None:
+        """Registra hashes de 64 bits en los registros HyperLogLog"""
+        p = self.HLL_PRECISION
+        index = (hashes >> np.uint64(64 - p)).astype(np.int64)
+        
+        # Posición del primer bit en 1 de los 32 bits siguientes (33 si no hay)
+        rest = ((hashes << np.uint64(p)) >> np.uint64(32)).astype(np.float64)
+        rank = (33 - np.frexp(rest)[1]).astype(np.uint8)
+        
+        np.maximum.at(self.registers, index, rank)
+    
+    def _update_frequent(self, counts: pd.Series) -> None:
+        """
+        Suma las frecuencias de un bloque al contador acotado
+        
+        Si hay más de TOP_CAPACITY valores distintos se conservan los más
+        frecuentes; desde ese momento los conteos son aproximados (cotas
+        inferiores) y top_values_exact pasa a False.
+        """
+        if self.frequent is None:
+            frequent = counts.astype('int64')
+        else:
+            frequent = self.frequent.add(counts, fill_value=0).astype('int64')
+        
+        if len(frequent) > self.TOP_CAPACITY:
+            frequent = frequent.nlargest(self.TOP_CAPACITY)
+            self.top_exact = False
+        
+        self.frequent = frequent
+
+
+class ColumnProfilerService:
+    """
+    Perfilado de columnas en una sola pasada
+    
+    Por cada columna calcula nulos y vacíos, una estimación de valores
+    distintos (HyperLogLog), mínimo, máximo y media, los valores más
+    frecuentes y la distribución de longitudes de texto. Los archivos se
+    recorren por bloques (ReaderService.iter_chunks), así que la memoria no
+    depende del tamaño del archivo.
+    """
+    
+    def __init__(self):
+        self.reader = ReaderService()
+    
+    def profile_file(self,
+                     file_path: str,
+                     sheet_name: Optional[str] = None,
+                     chunk_size: Optional[int] = None,
+                     top_k: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Perfila una hoja leyéndola por bloques
+        
+        Returns:
+            Diccionario con 'rows', 'columns' (un perfil por columna, en
+            orden) y 'missing_data' (totales de celdas vacías)
+        """
+        return self.profile_chunks(self.reader.iter_chunks(file_path, chunk_size, sheet_name), top_k)
+    
+    def profile_frame(self, df: pd.DataFrame, top_k: Optional[int] = None) -> Dict[str, Any]:
+        """Perfila un DataFrame ya leído"""
+        return self.profile_chunks([df], top_k)
+    
+    def profile_chunks(self, chunks: Iterable[pd.DataFrame], top_k: Optional[int] = None) -> Dict[str, Any]:
+        """Perfila una secuencia de bloques con las mismas columnas"""
+        stats: List[ColumnStats] = []
+        rows = 0
+        
+        for chunk in chunks:
+            if not stats:
+                stats = [ColumnStats(name) for name in chunk.columns]
+            
+            rows += len(chunk)
+            for i, column_stats in enumerate(stats):
+                column_stats.update(chunk.iloc[:, i])
+        
+        columns = [column_stats.result(top_k) for column_stats in stats]
+        total_cells = rows * len(columns)
+        missing_cells = sum(profile['null_count'] for profile in columns)
+        
+        return {
+            'rows': rows,
+            'columns': columns,
+            'missing_data': {
+                'total_cells': total_cells,
+                'missing_cells': missing_cells,
+                'missing_percentage': round(missing_cells / total_cells * 100, 2) if total_cells > 0 else 0
+            }
+        }
+
+
+
+def _to_json(value: Any) -> Any:
+    """Convierte escalares de numpy/pandas a tipos serializables en JSON"""
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return pd.Timestamp(value).isoformat()
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
@@ -0,0 +1,390 @@
+import pandas as pd
+import numpy as np
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional
+from config import Config
+
+
+class ColumnarCacheService:
+    """
+    Caché en disco de hojas parseadas en formato columnar
+    
+    Cada hoja se guarda como un directorio con un schema.json y un archivo
+    .npy por columna. Las columnas numéricas, booleanas y de fecha se
+    recuperan con np.load(mmap_mode='r'), sin copiar los datos; las de
+    texto se guardan como un buffer UTF-8 con offsets y se decodifican de
+    una sola vez al cargarlas. Las de tipos mezclados (texto, números,
+    booleanos y fechas en la misma columna) usan el mismo buffer más una
+    etiqueta de tipo por fila; solo las que traen otros tipos se guardan
+    serializadas con pickle.
+    """
+    
+    SCHEMA_FILE = 'schema.json'
+    FORMAT_VERSION = 1
+    
+    # Etiquetas de las columnas mezcladas y cómo se recupera cada valor de
+    # su texto (0 es texto y se deja tal cual)
+    TAG_TEXT, TAG_INT, TAG_FLOAT, TAG_BOOL, TAG_DATETIME = range(5)
+    TAG_DECODERS = {
+        TAG_INT: int,
+        TAG_FLOAT: float,
+        TAG_BOOL: lambda text: text == 'True',
+        TAG_DATETIME: pd.Timestamp
+    }
+    
+    def __init__(self, cache_dir: Optional[Path] = None):
+        """
+        Args:
+            cache_dir: Directorio propio (almacenamiento persistente, sin
+                poda). Por defecto la caché compartida de Config.
+        """
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else Config.COLUMNAR_CACHE_DIR
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.auto_prune = cache_dir is None
+    
+    def has(self, content_hash: str, sheet_key: Optional[str] = None) -> bool:
+        """Indica si existe la versión columnar de una hoja"""
+        return (self._sheet_dir(content_hash, sheet_key) / self.SCHEMA_FILE).exists()
+    
+    def save(self,
+             content_hash: str,
+             df: pd.DataFrame,
+             sheet_key: Optional[str] = None) -> bool:
+        """
+        Guarda una hoja en formato columnar
+        
+        Args:
+            content_hash: Hash del contenido del archivo original
+            df: DataFrame parseado de la hoja
+            sheet_key: Nombre de la hoja (None para la primera)
+            
+        Returns:
+            True si se guardó, False si el DataFrame no se puede representar
+        """
+        if not isinstance(df.index, pd.RangeIndex) or df.index.start != 0:
+            return False
+        
+        target_dir = self._sheet_dir(content_hash, sheet_key)
+        target_dir.parent.mkdir(parents=True, exist_ok=True)
+        
+        # Se escribe en un directorio temporal y se renombra al final para
+        # que un lector concurrente nunca vea una hoja a medio escribir
+        tmp_dir = Path(tempfile.mkdtemp(dir=target_dir.parent, prefix='.tmp_'))
+        
+        try:
+            columns = []
+            for i, name in enumerate(df.columns):
+                columns.append(self._save_column(tmp_dir, f'col_{i:04d}', name, df.iloc[:, i]))
+            
+            schema = {
+                'version': self.FORMAT_VERSION,
+                'rows': len(df),
+                'columns': columns,
+                'created': datetime.now().isoformat()
+            }
+            
+            with open(tmp_dir / self.SCHEMA_FILE, 'w', encoding='utf-8') as f:
+                json.dump(schema, f, ensure_ascii=False)
+            
+            if target_dir.exists():
+                shutil.rmtree(target_dir, ignore_errors=True)
+            os.replace(tmp_dir, target_dir)
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        
+        if self.auto_prune:
+            self.prune()
+        return True
+    
+    def load(self, content_hash: str, sheet_key: Optional[str] = None) -> Optional[pd.DataFrame]:
+        """
+        Carga una hoja desde su versión columnar
+        
+        Returns:
+            DataFrame (columnas no-texto respaldadas por memoria mapeada, de
+            solo lectura) o None si no existe
+        """
+        schema = self._read_schema(content_hash, sheet_key)
+        if schema is None:
+            return None
+        
+        sheet_dir = self._sheet_dir(content_hash, sheet_key)
+        data = {
+            i: self._load_column(sheet_dir, column, 0, schema['rows'])
+            for i, column in enumerate(schema['columns'])
+        }
+        
+        return self._build_frame(schema, data, schema['rows'])
+    
+    def iter_chunks(self,
+                    content_hash: str,
+                    chunk_size: int,
+                    sheet_key: Optional[str] = None) -> Optional[Iterator[pd.DataFrame]]:
+        """Recorre la versión columnar por bloques, decodificando solo cada bloque"""
+        schema = self._read_schema(content_hash, sheet_key)
+        if schema is None:
+            return None
+        
+        return self._iter_schema_chunks(content_hash, sheet_key, schema, chunk_size)
+    
+    def take(self,
+             content_hash: str,
+             rows: np.ndarray,
+             sheet_key: Optional[str] = None) -> Optional[pd.DataFrame]:
+        """
+        Carga solo algunas filas (por posición) de la versión columnar
+        
+        El costo depende del número de filas pedidas y no del tamaño de la
+        hoja: las columnas numéricas se indexan sobre el mapa de memoria y
+        las de texto decodifican únicamente los tramos de esas filas.
+        """
+        schema = self._read_schema(content_hash, sheet_key)
+        if schema is None:
+            return None
+        
+        sheet_dir = self._sheet_dir(content_hash, sheet_key)
+        rows = np.asarray(rows, dtype=np.int64)
+        data = {
+            i: self._take_column(sheet_dir, column, rows)
+            for i, column in enumerate(schema['columns'])
+        }
+        
+        return self._build_frame(schema, data, len(rows))
+    
+    def rows(self, content_hash: str, sheet_key: Optional[str] = None) -> Optional[int]:
+        """Número de filas guardadas de una hoja, o None si no existe"""
+        schema = self._read_schema(content_hash, sheet_key)
+        return None if schema is None else schema['rows']
+    
+    def prune(self, max_bytes: Optional[int] = None) -> None:
+        """Elimina las entradas usadas hace más tiempo si se supera el límite"""
+        max_bytes = max_bytes if max_bytes is not None else Config.COLUMNAR_CACHE_MAX_MB * 1024 * 1024
+        
+        entries = []
+        total = 0
+        for entry_dir in self.cache_dir.iterdir():
+            if not entry_dir.is_dir() or entry_dir.name.startswith('.'):
+                continue
+            
+            size = sum(f.stat().st_size for f in entry_dir.rglob('*') if f.is_file())
+            entries.append((entry_dir.stat().st_mtime, size, entry_dir))
+            total += size
+        
+        for _, size, entry_dir in sorted(entries):
+            if total <= max_bytes:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size
+    
+    def _iter_schema_chunks(self,
+                            content_hash: str,
+                            sheet_key: Optional[str],
+                            schema: Dict[str, Any],
+                            chunk_size: int) -> Iterator[pd.DataFrame]:
+        sheet_dir = self._sheet_dir(content_hash, sheet_key)
+        rows = schema['rows']
+        
+        # Las columnas serializadas no se pueden mapear: se leen una sola vez
+        pickled = {
+            i: np.load(sheet_dir / f'{column["file"]}.npy', allow_pickle=True)
+            for i, column in enumerate(schema['columns']) if column['kind'] == 'pickle'
+        }
+        
+        if rows == 0:
+            yield self._build_frame(schema, {
+                i: self._load_column(sheet_dir, column, 0, 0)
+                for i, column in enumerate(schema['columns'])
+            }, 0)
+            return
+        
+        for start in range(0, rows, chunk_size):
+            stop = min(start + chunk_size, rows)
+            data = {
+                i: pickled[i][start:stop] if i in pickled else self._load_column(sheet_dir, column, start, stop)
+                for i, column in enumerate(schema['columns'])
+            }
+            yield self._build_frame(schema, data, stop - start)
+    
+    def _build_frame(self, schema: Dict[str, Any], data: Dict[int, Any], rows: int) -> pd.DataFrame:
+        """Arma el DataFrame sin copiar los arreglos mapeados"""
+        df = pd.DataFrame(data, index=pd.RangeIndex(rows), copy=False)
+        df.columns = [column['name'] for column in schema['columns']]
+        return df
+    
+    def _save_column(self, target_dir: Path, prefix: str, name: Any, series: pd.Series) -> Dict[str, Any]:
+        """Guarda una columna y devuelve su descripción para el schema"""
+        column = {'name': name if isinstance(name, (str, int, float)) else str(name), 'file': prefix}
+        values = series.to_numpy()
+        
+        if values.dtype.kind in 'biufcmM':
+            column['kind'] = 'array'
+            np.save(target_dir / f'{prefix}.npy', values, allow_pickle=False)
+            return column
+        
+        mask = series.isna().to_numpy()
+        non_null = values[~mask]
+        
+        if all(isinstance(value, str) for value in non_null):
+            column['kind'] = 'text'
+            self._save_text(target_dir, prefix, np.where(mask, '', values).tolist(), mask)
+            return column
+        
+        tags = [self._mixed_tag(value) for value in non_null]
+        if None not in tags:
+            # Tipos mezclados conocidos: texto de cada valor más su etiqueta
+            row_tags = np.zeros(len(values), dtype=np.uint8)
+            row_tags[~mask] = tags
+            texts = [''] * len(values)
+            for position, value, tag in zip(np.nonzero(~mask)[0].tolist(), non_null, tags):
+                texts[position] = self._mixed_text(value, tag)
+            
+            column['kind'] = 'mixed'
+            self._save_text(target_dir, prefix, texts, mask)
+            np.save(target_dir / f'{prefix}.tags.npy', row_tags)
+            return column
+        
+        # Otros tipos (horas, decimales...): no se pueden mapear, se guardan serializados
+        column['kind'] = 'pickle'
+        np.save(target_dir / f'{prefix}.npy', values.astype(object), allow_pickle=True)
+        return column
+    
+    def _save_text(self, target_dir: Path, prefix: str, texts: List[str], mask: np.ndarray) -> None:
+        """Texto: un único buffer UTF-8 con offsets en bytes y en caracteres"""
+        char_lengths = np.fromiter(map(len, texts), dtype=np.int64, count=len(texts))
+        encoded = [text.encode('utf-8') for text in texts]
+        byte_lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+        
+        np.save(target_dir / f'{prefix}.data.npy', np.frombuffer(b''.join(encoded), dtype=np.uint8))
+        np.save(target_dir / f'{prefix}.bytes.npy', np.concatenate([[0], np.cumsum(byte_lengths)]))
+        np.save(target_dir / f'{prefix}.chars.npy', np.concatenate([[0], np.cumsum(char_lengths)]))
+        np.save(target_dir / f'{prefix}.mask.npy', mask)
+    
+    def _mixed_tag(self, value: Any) -> Optional[int]:
+        """Etiqueta de un valor de una columna mezclada; None si no tiene"""
+        if isinstance(value, str):
+            return self.TAG_TEXT
+        if isinstance(value, (bool, np.bool_)):
+            return self.TAG_BOOL
+        if isinstance(value, (int, np.integer)):
+            return self.TAG_INT
+        if isinstance(value, (float, np.floating)):
+            return self.TAG_FLOAT
+        if isinstance(value, datetime):
+            return self.TAG_DATETIME
+        return None
+    
+    def _mixed_text(self, value: Any, tag: int) -> str:
+        if tag == self.TAG_FLOAT:
+            return repr(float(value))
+        if tag == self.TAG_BOOL:
+            return str(bool(value))
+        if tag == self.TAG_DATETIME:
+            return value.isoformat()
+        return str(value)
+    
+    def _restore_tags(self, values: np.ndarray, tags: np.ndarray) -> np.ndarray:
+        """Convierte de vuelta los valores no textuales de una columna mezclada"""
+        for tag, decode in self.TAG_DECODERS.items():
+            positions = np.nonzero(tags == tag)[0]
+            if len(positions):
+                values[positions] = [decode(text) for text in values[positions]]
+        return values
+    
+    def _load_column(self, sheet_dir: Path, column: Dict[str, Any], start: int, stop: int):
+        """Carga las filas [start, stop) de una columna"""
+        prefix = column['file']
+        
+        if column['kind'] == 'array':
+            return np.load(sheet_dir / f'{prefix}.npy', mmap_mode='r')[start:stop]
+        
+        if column['kind'] == 'pickle':
+            return np.load(sheet_dir / f'{prefix}.npy', allow_pickle=True)[start:stop]
+        
+        values = self._load_text(sheet_dir, prefix, start, stop)
+        if column['kind'] == 'mixed':
+            tags = np.load(sheet_dir / f'{prefix}.tags.npy', mmap_mode='r')[start:stop]
+            return self._restore_tags(values, np.asarray(tags))
+        return values
+    
+    def _load_text(self, sheet_dir: Path, prefix: str, start: int, stop: int) -> np.ndarray:
+        """Decodifica las filas [start, stop) de un buffer de texto"""
+        data = np.load(sheet_dir / f'{prefix}.data.npy', mmap_mode='r')
+        byte_offsets = np.load(sheet_dir / f'{prefix}.bytes.npy', mmap_mode='r')
+        char_offsets = np.load(sheet_dir / f'{prefix}.chars.npy', mmap_mode='r')
+        mask = np.load(sheet_dir / f'{prefix}.mask.npy', mmap_mode='r')[start:stop]
+        
+        # Se decodifica el tramo completo una vez y se corta por caracteres
+        text = data[byte_offsets[start]:byte_offsets[stop]].tobytes().decode('utf-8')
+        bounds = (np.asarray(char_offsets[start:stop + 1]) - char_offsets[start]).tolist()
+        
+        values = np.empty(stop - start, dtype=object)
+        values[:] = [text[a:b] for a, b in zip(bounds[:-1], bounds[1:])]
+        values[np.asarray(mask)] = np.nan
+        return values
+    
+    def _take_column(self, sheet_dir: Path, column: Dict[str, Any], rows: np.ndarray):
+        """Carga las filas indicadas de una columna"""
+        prefix = column['file']
+        
+        if column['kind'] == 'array':
+            return np.asarray(np.load(sheet_dir / f'{prefix}.npy', mmap_mode='r')[rows])
+        
+        if column['kind'] == 'pickle':
+            return np.load(sheet_dir / f'{prefix}.npy', allow_pickle=True)[rows]
+        
+        values = self._take_text(sheet_dir, prefix, rows)
+        if column['kind'] == 'mixed':
+            tags = np.load(sheet_dir / f'{prefix}.tags.npy', mmap_mode='r')[rows]
+            return self._restore_tags(values, np.asarray(tags))
+        return values
+    
+    def _take_text(self, sheet_dir: Path, prefix: str, rows: np.ndarray) -> np.ndarray:
+        """Decodifica solo los tramos de las filas indicadas de un buffer de texto"""
+        data = np.load(sheet_dir / f'{prefix}.data.npy', mmap_mode='r')
+        byte_offsets = np.load(sheet_dir / f'{prefix}.bytes.npy', mmap_mode='r')
+        mask = np.asarray(np.load(sheet_dir / f'{prefix}.mask.npy', mmap_mode='r')[rows])
+        
+        starts = np.asarray(byte_offsets[rows]).tolist()
+        stops = np.asarray(byte_offsets[rows + 1]).tolist()
+        
+        values = np.empty(len(rows), dtype=object)
+        values[:] = [data[a:b].tobytes().decode('utf-8') for a, b in zip(starts, stops)]
+        values[mask] = np.nan
+        return values
+    
+    def _read_schema(self, content_hash: str, sheet_key: Optional[str]) -> Optional[Dict[str, Any]]:
+        sheet_dir = self._sheet_dir(content_hash, sheet_key)
+        schema_path = sheet_dir / self.SCHEMA_FILE
+        
+        if not schema_path.exists():
+            return None
+        
+        with open(schema_path, 'r', encoding='utf-8') as f:
+            schema = json.load(f)
+        
+        if schema.get('version') != self.FORMAT_VERSION:
+            return None
+        
+        # Marca de uso para la poda por antigüedad
+        try:
+            os.utime(sheet_dir.parent)
+        except OSError:
+            pass
+        
+        return schema
+    
+    def _sheet_dir(self, content_hash: str, sheet_key: Optional[str]) -> Path:
+        """Directorio de una hoja: <hash>/<hoja>, con la hoja codificada como hash"""
+        if sheet_key is None:
+            name = 'default'
+        else:
+            name = 'sheet_' + hashlib.sha1(str(sheet_key).encode('utf-8')).hexdigest()[:16]
+        
+        return self.cache_dir / content_hash / name
@@ -1,118 +1,377 @@
 import pandas as pd
+from collections import Counter
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterator, List, Optional, Union
 from config import Config
+from app.services.reader_service import ReaderService
+from app.services.fuzzy_matcher_service import FuzzyMatcherService
+from app.services.column_profiler_service import ColumnProfilerService
+from app.services.report_store_service import ReportStoreService
 import json
 from datetime import datetime
 
 
+def _compare_file_worker(file_path: str,
+                         model: Dict[str, Any],
+                         check_data: bool,
+                         sheets: Union[None, str, List[str]],
+                         fuzzy: bool) -> Dict[str, Any]:
+    """Compara un archivo dentro de un proceso del pool (sin guardar reporte)"""
+    return ComparatorService().compare_file(file_path, model, check_data, sheets, fuzzy)
+
+
 class ComparatorService:
     """Servicio para comparar archivos Excel contra un modelo/perfil"""
     
     def __init__(self):
         self.reports_dir = Config.COMPARISON_REPORTS_DIR
         self.reports_dir.mkdir(parents=True, exist_ok=True)
+        self.reader = ReaderService()
+        self.fuzzy = FuzzyMatcherService()
+        self.profiler = ColumnProfilerService()
+        self.store = ReportStoreService()
     
     def compare_with_model(self, 
                           file_path: str, 
-                          model_columns: List[str]) -> Dict[str, Any]:
+                          model_columns: List[str],
+                          check_data: bool = True,
+                          sheets: Union[None, str, List[str]] = None,
+                          fuzzy: bool = False,
+                          model_name: Optional[str] = None) -> Dict[str, Any]:
         """
         Compara un archivo Excel contra un modelo de columnas esperadas
         
         Args:
             file_path: Ruta al archivo Excel a comparar
             model_columns: Lista de columnas esperadas según el modelo
-            
+            check_data: Si debe leer los datos (por bloques) para verificar
+                valores nulos y perfilar cada columna
+            sheets: Hojas a comparar: None (primera), 'all', un nombre,
+                un patrón tipo glob o una lista de nombres
+            fuzzy: Si empareja columnas por similitud (n-gramas, sin tildes)
+                además de la igualdad exacta; agrega 'column_mapping'
+            model_name: Nombre con el que se registra el modelo en el
+                almacén de reportes (por defecto, un hash de sus columnas)
+                
         Returns:
-            Diccionario con resultados de la comparación
+            Diccionario con resultados de la comparación. Si se indica
+            sheets, incluye 'sheets' con el resultado de cada hoja.
         """
         try:
-            df = pd.read_excel(file_path)
-            file_columns = df.columns.tolist()
+            model = self.prepare_model(model_columns, model_name)
+            comparison = self.compare_file(file_path, model, check_data, sheets, fuzzy)
+            
+            # Guardar reporte
+            report_name = f"comparison_{Path(file_path).stem}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.json"
+            self._save_report(report_name, comparison)
+            comparison['report_id'] = self.store.save(report_name, comparison, model['key'])
+            comparison['report_name'] = report_name
+            
+            return comparison
+        
+        except Exception as e:
+            raise Exception(f"Error comparing file: {str(e)}")
+    
+    def prepare_model(self, model_columns: List[str], model_name: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Normaliza una sola vez las columnas del modelo
+        
+        El resultado se reutiliza en cada hoja y en cada archivo de una
+        comparación masiva.
+        """
+        normalized = [str(col).strip().lower() for col in model_columns]
+        
+        return {
+            'key': model_name or ReportStoreService.model_key(model_columns),
+            'columns': list(model_columns),
+            'normalized': normalized,
+            'lookup': set(normalized),
+            'fuzzy_fields': {col: [col] for col in dict.fromkeys(normalized)}
+        }
+    
+    def compare_file(self,
+                     file_path: str,
+                     model: Dict[str, Any],
+                     check_data: bool = True,
+                     sheets: Union[None, str, List[str]] = None,
+                     fuzzy: bool = False) -> Dict[str, Any]:
+        """
+        Compara un archivo contra un modelo ya preparado, sin guardar reporte
+        
+        Args:
+            model: Resultado de prepare_model
+            (los demás como en compare_with_model)
+        """
+        sheet_names = self.reader.resolve_sheets(file_path, sheets)
+        model_columns = model['columns']
+        
+        # Las hojas que hay que leer completas se parsean en paralelo (en
+        # secuencia si ya estamos en un proceso del pool)
+        frames = {}
+        if check_data and len(sheet_names) > 1:
+            frames = self.reader.read_sheets(file_path, sheet_names)
+        
+        sheet_results = [
+            self._compare_sheet(file_path, name, model, check_data, frames.get(name), fuzzy)
+            for name in sheet_names
+        ]
+        
+        comparison = {
+            'file': Path(file_path).name,
+            'timestamp': datetime.now().isoformat()
+        }
+        
+        if sheets is None:
+            comparison.update(sheet_results[0])
+        else:
+            similarities = [r['similarity_percentage'] for r in sheet_results]
+            comparison.update({
+                'similarity_percentage': round(sum(similarities) / len(similarities), 2) if similarities else 0,
+                'total_model_columns': len(model_columns),
+                'total_sheets': len(sheet_results),
+                'sheets': sheet_results,
+                'status': 'completo' if all(r['status'] == 'completo' for r in sheet_results) else 'incompleto'
+            })
+        
+        return comparison
+    
+    def iter_compare_many(self,
+                          file_paths: List[str],
+                          model_columns: List[str],
+                          check_data: bool = True,
+                          sheets: Union[None, str, List[str]] = None,
+                          fuzzy: bool = False,
+                          model_name: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Compara muchos archivos contra un mismo modelo en el pool de procesos
+        
+        El modelo se normaliza una sola vez. Los resultados se entregan a
+        medida que termina cada archivo (no en el orden de entrada); un
+        archivo que falla produce un resultado con 'error' y 'status'
+        'error' sin detener a los demás. Al final se guarda un único
+        reporte consolidado.
+        
+        Yields:
+            Un elemento con 'type': 'result' por archivo (resultado de
+            compare_file más 'path') y, por último, uno con 'type':
+            'summary' (ver compare_many)
+        """
+        started = datetime.now()
+        model = self.prepare_model(model_columns, model_name)
+        results = [None] * len(file_paths)
+        
+        for i, outcome in self.reader.imap_files(file_paths, _compare_file_worker, model, check_data, sheets, fuzzy):
+            if 'error' in outcome:
+                result = {
+                    'file': Path(outcome['file']).name,
+                    'path': outcome['file'],
+                    'status': 'error',
+                    'error': outcome['error']
+                }
+            else:
+                result = {**outcome['result'], 'path': outcome['file']}
+            
+            results[i] = result
+            yield {'type': 'result', **result}
+        
+        summary = self.summarize(results, model_columns)
+        summary.update({
+            'model': model['key'],
+            'timestamp': started.isoformat(),
+            'duration_seconds': round((datetime.now() - started).total_seconds(), 3)
+        })
+        
+        report_name = f"bulk_comparison_{started.strftime('%Y%m%d_%H%M%S_%f')}.json"
+        summary['report_id'] = self.store.save_bulk(report_name, summary, results, model['key'])
+        summary['report_name'] = report_name
+        summary['results'] = results
+        self._save_report(report_name, summary)
+        
+        yield {'type': 'summary', **summary}
+    
+    def compare_many(self,
+                     file_paths: List[str],
+                     model_columns: List[str],
+                     check_data: bool = True,
+                     sheets: Union[None, str, List[str]] = None,
+                     fuzzy: bool = False,
+                     model_name: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Compara muchos archivos y guarda un único reporte consolidado
+        
+        Returns:
+            Resumen con estadísticas agregadas (similitud, estados, columnas
+            faltantes por archivo, errores), los resultados por archivo en
+            el orden de entrada y 'report_name'
+        """
+        summary = None
+        for item in self.iter_compare_many(file_paths, model_columns, check_data, sheets, fuzzy, model_name):
+            summary = item
+        
+        summary.pop('type')
+        return summary
+    
+    def summarize(self, results: List[Dict[str, Any]], model_columns: List[str]) -> Dict[str, Any]:
+        """Estadísticas agregadas de una comparación masiva"""
+        compared = [r for r in results if r.get('status') != 'error']
+        similarities = [r['similarity_percentage'] for r in compared]
+        
+        # En cuántos archivos falta cada columna del modelo (una vez por archivo)
+        missing = Counter()
+        for result in compared:
+            sheet_results = result.get('sheets', [result])
+            missing.update({col for sheet in sheet_results for col in sheet.get('missing_columns', [])})
+        
+        status_counts = Counter(r['status'] for r in results)
+        
+        return {
+            'total_files': len(results),
+            'files_compared': len(compared),
+            'files_failed': len(results) - len(compared),
+            'total_model_columns': len(model_columns),
+            'status_counts': dict(status_counts),
+            'similarity': {
+                'average': round(sum(similarities) / len(similarities), 2) if similarities else 0,
+                'min': min(similarities) if similarities else 0,
+                'max': max(similarities) if similarities else 0
+            },
+            'missing_columns': [
+                {
+                    'column': col,
+                    'files': count,
+                    'percentage': round(count / len(compared) * 100, 2)
+                }
+                for col, count in missing.most_common()
+            ],
+            'errors': [{'file': r['file'], 'error': r['error']} for r in results if r.get('status') == 'error']
+        }
+    
+    def _compare_sheet(self, 
+                       file_path: str, 
+                       sheet_name: Optional[str],
+                       model: Dict[str, Any],
+                       check_data: bool,
+                       df: Optional[pd.DataFrame] = None,
+                       fuzzy: bool = False) -> Dict[str, Any]:
+        """Compara una hoja contra el modelo (ver prepare_model)"""
+        # La comparación de columnas solo necesita los encabezados
+        probe = self.reader.probe_headers(file_path, sheet_name)
+        file_columns = probe['columns']
+        model_columns = model['columns']
+        
+        # Normalizar nombres para comparación
+        model_norm = model['normalized']
+        file_norm = [str(col).strip().lower() for col in file_columns]
+        
+        column_mapping = None
+        
+        if fuzzy:
+            # Asignación por similitud: cada columna del modelo a lo sumo una vez
+            assignments = self.fuzzy.match(file_norm, model['fuzzy_fields'])
+            matched_file = {a['column'] for a in assignments}
+            matched_model = {a['field'] for a in assignments}
             
-            # Normalizar nombres para comparación
-            model_norm = [col.strip().lower() for col in model_columns]
-            file_norm = [col.strip().lower() for col in file_columns]
+            missing_columns = [col for col in model_norm if col not in matched_model]
+            extra_columns = [col for col in file_norm if col not in matched_file]
+            matching_columns = [col for col in file_norm if col in matched_file]
+            column_mapping = [
+                {'column': a['column'], 'model_column': a['field'], 'score': a['score']}
+                for a in assignments
+            ]
+        else:
+            file_lookup = set(file_norm)
             
             # Columnas faltantes
-            missing_columns = [col for col in model_norm if col not in file_norm]
+            missing_columns = [col for col in model_norm if col not in file_lookup]
             
             # Columnas adicionales
-            extra_columns = [col for col in file_norm if col not in model_norm]
+            extra_columns = [col for col in file_norm if col not in model['lookup']]
             
             # Columnas coincidentes
-            matching_columns = [col for col in file_norm if col in model_norm]
-            
-            # Calcular porcentaje de similitud
-            similarity = (len(matching_columns) / len(model_columns) * 100) if model_columns else 0
+            matching_columns = [col for col in file_norm if col in model['lookup']]
+        
+        # Calcular porcentaje de similitud
+        similarity = (len(matching_columns) / len(model_columns) * 100) if model_columns else 0
+        
+        if check_data:
+            # Un solo recorrido por bloques: perfil de cada columna y totales
+            if df is None:
+                profile = self.profiler.profile_file(file_path, sheet_name)
+            else:
+                profile = self.profiler.profile_frame(df)
             
             # Analizar tipos de datos
-            data_type_issues = self._check_data_types(df, matching_columns)
+            data_type_issues = self._check_data_types(profile['columns'], matching_columns)
             
             # Verificar datos faltantes
-            missing_data = self._check_missing_data(df)
-            
-            comparison = {
-                'file': Path(file_path).name,
-                'timestamp': datetime.now().isoformat(),
-                'similarity_percentage': round(similarity, 2),
-                'total_model_columns': len(model_columns),
-                'total_file_columns': len(file_columns),
-                'matching_columns': matching_columns,
-                'missing_columns': missing_columns,
-                'extra_columns': extra_columns,
-                'data_type_issues': data_type_issues,
-                'missing_data': missing_data,
-                'status': 'completo' if similarity >= 90 else 'incompleto'
-            }
-            
-            # Guardar reporte
-            report_name = f"comparison_{Path(file_path).stem}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-            report_path = self.reports_dir / report_name
-            
-            with open(report_path, 'w', encoding='utf-8') as f:
-                json.dump(comparison, f, ensure_ascii=False, indent=2)
-            
-            comparison['report_path'] = str(report_path)
-            
-            return comparison
+            missing_data = profile['missing_data']
+            column_profiles = profile['columns']
+        else:
+            data_type_issues = []
+            missing_data = None
+            column_profiles = None
         
-        except Exception as e:
-            raise Exception(f"Error comparing file: {str(e)}")
+        result = {
+            'sheet': sheet_name,
+            'similarity_percentage': round(similarity, 2),
+            'total_model_columns': len(model_columns),
+            'total_file_columns': len(file_columns),
+            'total_rows': probe['rows'],
+            'matching_columns': matching_columns,
+            'missing_columns': missing_columns,
+            'extra_columns': extra_columns,
+            'data_type_issues': data_type_issues,
+            'missing_data': missing_data,
+            'column_profiles': column_profiles,
+            'status': 'completo' if similarity >= 90 else 'incompleto'
+        }
+        
+        if column_mapping is not None:
+            result['column_mapping'] = column_mapping
+        
+        return result
     
-    def _check_data_types(self, df: pd.DataFrame, columns: List[str]) -> List[Dict[str, Any]]:
-        """Verifica tipos de datos de las columnas"""
+    def _check_data_types(self, profiles: List[Dict[str, Any]], columns: List[str]) -> List[Dict[str, Any]]:
+        """
+        Verifica tipos de datos de las columnas a partir de sus perfiles
+        
+        Reporta valores faltantes y columnas que mezclan números con texto.
+        """
         issues = []
+        by_name = {str(p['column']).strip().lower(): p for p in profiles}
         
         for col in columns:
-            if col in df.columns:
-                dtype = str(df[col].dtype)
-                
-                # Detectar problemas potenciales
-                if df[col].isnull().any():
-                    null_count = df[col].isnull().sum()
-                    issues.append({
-                        'column': col,
-                        'issue': 'missing_values',
-                        'count': int(null_count),
-                        'percentage': round(null_count / len(df) * 100, 2)
-                    })
+            profile = by_name.get(col)
+            if profile is None:
+                continue
+            
+            # Detectar problemas potenciales
+            if profile['null_count']:
+                issues.append({
+                    'column': col,
+                    'issue': 'missing_values',
+                    'count': profile['null_count'],
+                    'percentage': profile['null_percentage']
+                })
+            
+            if profile['numeric_count'] and profile['text_count']:
+                issues.append({
+                    'column': col,
+                    'issue': 'mixed_types',
+                    'dtype': profile['dtype'],
+                    'numeric_count': profile['numeric_count'],
+                    'text_count': profile['text_count']
+                })
         
         return issues
     
-    def _check_missing_data(self, df: pd.DataFrame) -> Dict[str, Any]:
-        """Verifica datos faltantes en el archivo"""
-        total_cells = df.size
-        missing_cells = df.isnull().sum().sum()
-        
-        return {
-            'total_cells': int(total_cells),
-            'missing_cells': int(missing_cells),
-            'missing_percentage': round(missing_cells / total_cells * 100, 2) if total_cells > 0 else 0
-        }
-    
     def get_comparison_report(self, report_name: str) -> Dict[str, Any]:
         """Obtiene un reporte de comparación guardado"""
+        report = self.store.get(report_name)
+        if report is not None:
+            return report
+        
+        # Reportes JSON anteriores al almacén que aún no se importaron
         report_path = self.reports_dir / report_name
         
         if not report_path.exists():
@@ -120,3 +379,15 @@ class ComparatorService:
         
         with open(report_path, 'r', encoding='utf-8') as f:
             return json.load(f)
+    
+    def _save_report(self, report_name: str, report: Dict[str, Any]) -> None:
+        """Escribe además el reporte como JSON si Config.COMPARISON_REPORTS_JSON"""
+        if not Config.COMPARISON_REPORTS_JSON:
+            return
+        
+        report_path = self.reports_dir / report_name
+        
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2, default=str)
+        
+        report['report_path'] = str(report_path)
@@ -0,0 +1,262 @@
+import pandas as pd
+import numpy as np
+import codecs
+import csv
+import io
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+
+def _cp1252_fallback(error: UnicodeDecodeError) -> Tuple[str, int]:
+    """
+    Manejador de errores de decodificación: los bytes inválidos se leen como
+    cp1252 (filas en Windows-1252 mezcladas en un archivo UTF-8)
+    """
+    return error.object[error.start:error.end].decode('cp1252', errors='replace'), error.end
+
+
+codecs.register_error('csv_cp1252_fallback', _cp1252_fallback)
+
+
+class CsvService:
+    """Motor de lectura de CSV con detección de codificación y delimitador"""
+    
+    # Bytes que se leen para detectar codificación y delimitador
+    SAMPLE_BYTES = 64 * 1024
+    
+    # Codificaciones probadas en orden; latin-1 acepta cualquier byte
+    ENCODINGS = ['utf-8', 'cp1252', 'latin-1']
+    
+    DELIMITERS = [',', ';', '\t', '|']
+    
+    # La codificación sale de una muestra: un byte inválido más adelante no
+    # debe romper la lectura completa
+    DECODE_ERRORS = 'csv_cp1252_fallback'
+    
+    # Dialecto detectado por (ruta, mtime, tamaño), compartido por instancias
+    _dialects: 'OrderedDict[Tuple[str, int, int], Dict[str, str]]' = OrderedDict()
+    _dialects_size = 256
+    _dialects_lock = threading.Lock()
+    
+    def sniff(self, file_path: str) -> Dict[str, str]:
+        """
+        Detecta codificación y delimitador a partir de una muestra del archivo
+        
+        Args:
+            file_path: Ruta al archivo CSV
+            
+        Returns:
+            Diccionario con 'encoding' y 'delimiter'
+        """
+        with open(file_path, 'rb') as f:
+            sample = f.read(self.SAMPLE_BYTES)
+        
+        encoding, text = self._detect_encoding(sample)
+        
+        # Si la muestra no cubre el archivo, su última línea puede estar cortada
+        truncated = len(sample) == self.SAMPLE_BYTES
+        
+        return {
+            'encoding': encoding,
+            'delimiter': self._detect_delimiter(text, truncated)
+        }
+    
+    def read(self,
+             file_path: str,
+             dtype: Optional[Dict[str, Any]] = None,
+             **options) -> pd.DataFrame:
+        """
+        Lee un CSV completo con el motor C de pandas
+        
+        Args:
+            file_path: Ruta al archivo CSV
+            dtype: Tipos explícitos por columna (evita la inferencia)
+            **options: Opciones adicionales para pd.read_csv
+            
+        Returns:
+            DataFrame con los datos
+        """
+        return pd.read_csv(file_path, **self._read_options(file_path, dtype, options))
+    
+    def iter_chunks(self,
+                    file_path: str,
+                    chunk_size: int,
+                    dtype: Optional[Dict[str, Any]] = None,
+                    **options) -> Iterator[pd.DataFrame]:
+        """Lee un CSV en bloques de chunk_size filas"""
+        read_options = self._read_options(file_path, dtype, options)
+        
+        with pd.read_csv(file_path, chunksize=chunk_size, **read_options) as reader:
+            emitted = False
+            
+            for chunk in reader:
+                emitted = True
+                yield chunk
+            
+            # Un CSV solo con encabezados produce un bloque vacío
+            if not emitted:
+                yield pd.read_csv(file_path, nrows=0, **read_options)
+    
+    def probe(self, file_path: str) -> Dict[str, Any]:
+        """
+        Obtiene encabezados y número de filas sin materializar los datos
+        
+        Returns:
+            Diccionario con 'columns' y 'rows'
+        """
+        read_options = self._read_options(file_path, None, {})
+        columns = pd.read_csv(file_path, nrows=0, **read_options).columns.tolist()
+        
+        # Contar filas parseando solo la primera columna
+        rows = 0
+        if columns:
+            with pd.read_csv(file_path, usecols=[0], chunksize=500000, **read_options) as reader:
+                rows = sum(len(chunk) for chunk in reader)
+        
+        return {'columns': columns, 'rows': rows}
+    
+    def sample(self, file_path: str, n: int, seed: int = 0) -> pd.DataFrame:
+        """
+        Muestra aleatoria de filas leyendo solo alrededor de posiciones al azar
+        
+        Se salta a desplazamientos aleatorios del archivo, se descarta la
+        línea cortada y se toma la siguiente, de modo que el costo depende
+        del tamaño de la muestra y no del archivo. Los archivos pequeños se
+        leen completos. Un campo entre comillas con saltos de línea puede
+        desalinear alguna fila de la muestra; esas filas se descartan.
+        """
+        read_options = self._read_options(file_path, None, {})
+        file_size = os.path.getsize(file_path)
+        
+        if file_size <= self.SAMPLE_BYTES * 16:
+            df = pd.read_csv(file_path, **read_options)
+            if len(df) > n:
+                df = df.sample(n, random_state=seed).sort_index()
+            return df.reset_index(drop=True)
+        
+        columns = pd.read_csv(file_path, nrows=0, **read_options).columns
+        encoding = read_options['encoding']
+        
+        rng = np.random.default_rng(seed)
+        lines = {}
+        
+        with open(file_path, 'rb') as f:
+            header_end = len(f.readline())
+            
+            for offset in np.sort(rng.integers(header_end, file_size, size=n)):
+                f.seek(int(offset))
+                f.readline()
+                position = f.tell()
+                line = f.readline()
+                if line.strip():
+                    lines[position] = line
+        
+        text = b''.join(lines[position] for position in sorted(lines)).decode(encoding, errors=self.DECODE_ERRORS)
+        
+        options = dict(read_options, header=None, names=list(columns), on_bad_lines='skip')
+        options.pop('encoding', None)
+        options.pop('encoding_errors', None)
+        return pd.read_csv(io.StringIO(text), **options)
+    
+    def _read_options(self,
+                      file_path: str,
+                      dtype: Optional[Dict[str, Any]],
+                      options: Dict[str, Any]) -> Dict[str, Any]:
+        """Combina el dialecto detectado con las opciones del llamador"""
+        dialect = self._cached_dialect(file_path)
+        
+        read_options = {
+            'sep': dialect['delimiter'],
+            'encoding': dialect['encoding'],
+            'encoding_errors': self.DECODE_ERRORS,
+            'engine': 'c',
+            'low_memory': False
+        }
+        
+        if dtype is not None:
+            read_options['dtype'] = dtype
+        
+        read_options.update(options)
+        return read_options
+    
+    def _cached_dialect(self, file_path: str) -> Dict[str, str]:
+        """sniff memorizado mientras el archivo no cambie (mtime y tamaño)"""
+        stat = os.stat(file_path)
+        key = (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size)
+        
+        with self._dialects_lock:
+            dialect = self._dialects.get(key)
+            if dialect is not None:
+                self._dialects.move_to_end(key)
+                return dict(dialect)
+        
+        dialect = self.sniff(file_path)
+        
+        with self._dialects_lock:
+            self._dialects[key] = dialect
+            while len(self._dialects) > self._dialects_size:
+                self._dialects.popitem(last=False)
+        
+        return dict(dialect)
+    
+    def _detect_encoding(self, sample: bytes) -> tuple:
+        """Devuelve la primera codificación que decodifica la muestra"""
+        if sample.startswith(b'\xef\xbb\xbf'):
+            return 'utf-8-sig', sample[3:].decode('utf-8', errors='ignore')
+        
+        for encoding in self.ENCODINGS:
+            try:
+                return encoding, sample.decode(encoding)
+            except UnicodeDecodeError as e:
+                # La muestra puede cortar un carácter multibyte al final
+                if encoding == 'utf-8' and e.start >= len(sample) - 3:
+                    return encoding, sample[:e.start].decode(encoding)
+        
+        return 'latin-1', sample.decode('latin-1')
+    
+    def _detect_delimiter(self, text: str, truncated: bool = False) -> str:
+        """Detecta el delimitador con csv.Sniffer y, si falla, por consistencia"""
+        lines = text.splitlines()
+        if truncated and len(lines) > 1:
+            lines = lines[:-1]
+        
+        lines = [line for line in lines[:50] if line.strip()]
+        
+        if not lines:
+            return ','
+        
+        try:
+            return csv.Sniffer().sniff('\n'.join(lines), delimiters=''.join(self.DELIMITERS)).delimiter
+        except csv.Error:
+            pass
+        
+        # El delimitador correcto aparece el mismo número de veces en cada línea
+        best, best_score = ',', 0
+        for delimiter in self.DELIMITERS:
+            counts = self._count_outside_quotes(lines, delimiter)
+            if min(counts) == 0:
+                continue
+            
+            score = min(counts) if len(set(counts)) == 1 else min(counts) / 2
+            if score > best_score:
+                best, best_score = delimiter, score
+        
+        return best
+    
+    def _count_outside_quotes(self, lines: List[str], delimiter: str) -> List[int]:
+        """Cuenta apariciones del delimitador fuera de comillas en cada línea"""
+        counts = []
+        
+        for line in lines:
+            count = 0
+            quoted = False
+            for char in line:
+                if char == '"':
+                    quoted = not quoted
+                elif char == delimiter and not quoted:
+                    count += 1
+            counts.append(count)
+        
+        return counts
@@ -0,0 +1,380 @@
+import pandas as pd
+import numpy as np
+import re
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Dict, Any, List, Optional, Tuple
+from config import Config
+from app.services.fuzzy_matcher_service import FuzzyMatcherService
+
+
+class DateNormalizerService:
+    """
+    Normalización de fechas escritas en varios formatos
+    
+    Las columnas mezclan dd/mm/aaaa, aaaa-mm-dd, números de serie de Excel
+    y fechas en texto. En lugar de interpretar valor por valor, se detectan
+    en una muestra los formatos dominantes de la columna y luego se parsea
+    con formato fijo (pd.to_datetime con format), una vez por valor
+    distinto. Solo el residuo que ningún formato reconoce pasa por el
+    parser flexible de pandas.
+    
+    Los formatos detectados se guardan por (campo, origen), donde el origen
+    es un identificador estable entre entregas (la hoja, no el nombre del
+    archivo), junto con el hash del contenido en que se detectaron. Los
+    bloques siguientes del mismo contenido usan la caché sin más; con otro
+    contenido (el archivo del mes siguiente, o uno resubido con el mismo
+    nombre) los formatos se reutilizan solo si interpretan todos los
+    valores sin el parser flexible, y las columnas descartadas se vuelven
+    a evaluar.
+    """
+    
+    DATE_FORMATS = [
+        '%Y-%m-%d', '%d/%m/%Y', '%m/%d/%Y', '%d-%m-%Y', '%Y/%m/%d', '%d.%m.%Y',
+        '%Y-%m-%d %H:%M:%S', '%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M', '%Y-%m-%dT%H:%M:%S'
+    ]
+    
+    # Pseudo-formato de los números de serie de Excel (días desde 1899-12-30)
+    EXCEL_SERIAL = 'excel_serial'
+    EXCEL_EPOCH = pd.Timestamp('1899-12-30')
+    
+    # Seriales que se aceptan como fecha: 1954-10-03 a 2099-12-31
+    EXCEL_SERIAL_RANGE = (20000, 73050)
+    
+    # Un formato secundario se conserva si reconoce al menos esta parte de la muestra
+    MIN_FORMAT_SHARE = 0.05
+    
+    # Con formatos en caché, si el residuo supera esta parte se vuelve a detectar
+    REDETECT_SHARE = 0.5
+    
+    # Solo el texto con dígitos y separadores pasa por el parser flexible
+    # (evita que '2020' o '7' se conviertan en fechas)
+    RESIDUE_PATTERN = r'.*\d.*[\s/\-\.,].*'
+    
+    # Encabezados (ya normalizados) de columnas numéricas que pueden traer
+    # seriales de Excel; sin esta pista un monto en rango pasaría por fecha
+    DATE_HEADER_PATTERN = r'.*\b(?:fecha|fec|date|vencimiento|nacimiento|periodo)\b.*'
+    
+    CACHE_SIZE = 1024
+    
+    _formats_cache = OrderedDict()
+    _cache_lock = threading.Lock()
+    
+    def detect_formats(self, values: pd.Series, sample_size: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Formatos dominantes de una columna a partir de una muestra
+        
+        Se elige el formato que más valores distintos reconoce, luego el
+        que más reconoce de lo que quedó, y así mientras cada uno aporte al
+        menos MIN_FORMAT_SHARE de la muestra.
+        
+        Returns:
+            Diccionario con 'formats' (en orden de aplicación), 'coverage'
+            (parte de la muestra que reconocen, fechas propias incluidas),
+            'resolved' (parte que se interpreta contando además el parser
+            flexible) y 'sample' (valores distintos evaluados)
+        """
+        sample_size = sample_size or Config.DATE_SAMPLE_VALUES
+        
+        uniques = pd.Series(pd.unique(values.dropna().to_numpy()), dtype=object)
+        uniques = uniques[uniques.astype(str).str.strip() != ''].reset_index(drop=True)
+        if len(uniques) > sample_size:
+            uniques = uniques.sample(sample_size, random_state=0).reset_index(drop=True)
+        
+        total = len(uniques)
+        if total == 0:
+            return {'formats': [], 'coverage': 0.0, 'resolved': 0.0, 'sample': 0}
+        
+        is_date, numbers, text = self._split(uniques)
+        valid = is_date.copy()
+        in_range = self._serial_mask(numbers)
+        formats = []
+        
+        candidates = [self.EXCEL_SERIAL] + self.DATE_FORMATS
+        while candidates:
+            pending = np.nonzero(~valid)[0]
+            if len(pending) == 0:
+                break
+            
+            best_format, best_mask = None, None
+            for candidate in candidates:
+                if candidate == self.EXCEL_SERIAL:
+                    mask = in_range[pending]
+                else:
+                    mask = pd.to_datetime(text.iloc[pending], format=candidate, errors='coerce').notna().to_numpy()
+                if best_mask is None or mask.sum() > best_mask.sum():
+                    best_format, best_mask = candidate, mask
+            
+            if best_mask.sum() < max(1, self.MIN_FORMAT_SHARE * total):
+                break
+            
+            formats.append(best_format)
+            candidates.remove(best_format)
+            valid[pending[best_mask]] = True
+        
+        resolved = self._parse(uniques, formats, True)[1]['parsed'] if not valid.all() else total
+        
+        return {
+            'formats': formats,
+            'coverage': round(float(valid.mean()), 4),
+            'resolved': round(resolved / total, 4),
+            'sample': total
+        }
+    
+    def parse(self, values: pd.Series, formats: List[str], fallback: bool = True) -> pd.Series:
+        """
+        Convierte una columna a fechas con los formatos indicados
+        
+        Args:
+            values: Columna (de cualquier tipo)
+            formats: Formatos a aplicar en orden (ver detect_formats)
+            fallback: Si el residuo pasa por el parser flexible de pandas
+            
+        Returns:
+            Serie datetime64 con el mismo índice; NaT donde no hay fecha
+        """
+        return self._parse(values, formats, fallback)[0]
+    
+    def normalize(self,
+                  values: pd.Series,
+                  field: Any,
+                  source: Optional[str] = None,
+                  fallback: bool = True,
+                  content_hash: Optional[str] = None) -> Tuple[pd.Series, Dict[str, Any]]:
+        """
+        Parsea una columna con los formatos en caché para (field, source)
+        
+        Si no hay formatos guardados, o si con ellos más de REDETECT_SHARE
+        de los valores queda para el parser flexible o sin interpretar, se
+        detectan de nuevo y se guardan. Si se guardaron para otro
+        content_hash, basta un valor fuera de los formatos para detectar de
+        nuevo.
+        
+        Returns:
+            Tupla (serie datetime64, información con 'formats', 'cached',
+            'values', 'parsed', 'residue' y 'unparsed')
+        """
+        key = (FuzzyMatcherService.fold(field), source)
+        entry = self._cached(key)
+        cached = entry is not None
+        
+        if cached:
+            formats = entry[0]
+            parsed, stats = self._parse(values, formats, fallback)
+            tolerance = self.REDETECT_SHARE * stats['values'] if self._same_content(entry, content_hash) else 0
+            if stats['residue'] + stats['unparsed'] > tolerance:
+                cached = False
+            elif entry[2] != content_hash:
+                self._remember(key, formats, entry[1], content_hash)
+        
+        if not cached:
+            formats = self.detect_formats(values)['formats']
+            self._remember(key, formats, True, content_hash)
+            parsed, stats = self._parse(values, formats, fallback)
+        
+        return parsed, {'formats': formats, 'cached': cached, **stats}
+    
+    def normalize_frame(self,
+                        df: pd.DataFrame,
+                        source: Optional[str] = None,
+                        min_share: Optional[float] = None,
+                        content_hash: Optional[str] = None) -> Tuple[pd.DataFrame, Dict[Any, List[str]]]:
+        """
+        Convierte a fecha las columnas de texto que son mayormente fechas
+        
+        Una columna se convierte si al menos min_share de su muestra se
+        interpreta como fecha (por defecto Config.DATE_COLUMN_MIN_SHARE).
+        Las columnas descartadas también se recuerdan, así que no se vuelven
+        a evaluar para el mismo origen y contenido. Los valores que no se
+        pudieron interpretar se conservan tal cual.
+        
+        Las columnas numéricas (seriales de Excel guardados como número) se
+        evalúan solo si el encabezado coincide con DATE_HEADER_PATTERN; las
+        demás se dejan como están.
+        
+        Args:
+            df: Bloque a normalizar
+            source: Identificador estable de la fuente (p. ej. la hoja)
+            min_share: Parte mínima de la muestra que debe ser fecha
+            content_hash: Hash del archivo; invalida lo aprendido con otro
+                contenido (ver la descripción de la clase)
+                
+        Returns:
+            Tupla (DataFrame, formatos por columna convertida)
+        """
+        min_share = min_share if min_share is not None else Config.DATE_COLUMN_MIN_SHARE
+        converted = {}
+        result = df
+        
+        for position, column in enumerate(df.columns):
+            series = df.iloc[:, position]
+            folded = FuzzyMatcherService.fold(column)
+            if not self._date_candidate(series, folded):
+                continue
+            
+            key = (folded, source)
+            entry = self._cached(key)
+            parsed = None
+            
+            if entry is not None and not self._same_content(entry, content_hash):
+                # Otro contenido: se reutiliza solo si los formatos lo cubren todo
+                if entry[1]:
+                    parsed, stats = self._parse(series, entry[0], True)
+                if entry[1] and not stats['residue'] + stats['unparsed']:
+                    entry = self._remember(key, entry[0], True, content_hash)
+                else:
+                    entry, parsed = None, None
+            
+            if entry is None:
+                detection = self.detect_formats(series)
+                entry = self._remember(key, detection['formats'], detection['resolved'] >= min_share, content_hash)
+            
+            formats, is_date = entry[:2]
+            if not is_date:
+                continue
+            
+            if parsed is None:
+                parsed, stats = self._parse(series, formats, True)
+            if stats['unparsed']:
+                unparsed = parsed.isna().to_numpy() & series.notna().to_numpy()
+                parsed = parsed.astype(object)
+                parsed[unparsed] = series[unparsed]
+            
+            if result is df:
+                result = df.copy()
+            result.isetitem(position, parsed)
+            converted[column] = formats
+        
+        return result, converted
+    
+    def cached_formats(self, field: Any, source: Optional[str] = None) -> Optional[List[str]]:
+        """Formatos guardados para (field, source); None si no hay"""
+        entry = self._cached((FuzzyMatcherService.fold(field), source))
+        return entry[0] if entry is not None else None
+    
+    def clear_cache(self) -> None:
+        with self._cache_lock:
+            self._formats_cache.clear()
+    
+    def _cached(self, key: Tuple) -> Optional[Tuple[List[str], bool, Optional[str]]]:
+        """Entrada (formatos, es columna de fechas, hash del contenido) guardada para una clave"""
+        with self._cache_lock:
+            entry = self._formats_cache.get(key)
+            if entry is None:
+                return None
+            self._formats_cache.move_to_end(key)
+            return list(entry[0]), entry[1], entry[2]
+    
+    def _remember(self,
+                  key: Tuple,
+                  formats: List[str],
+                  is_date: bool,
+                  content_hash: Optional[str] = None) -> Tuple[List[str], bool, Optional[str]]:
+        with self._cache_lock:
+            self._formats_cache[key] = (list(formats), is_date, content_hash)
+            self._formats_cache.move_to_end(key)
+            while len(self._formats_cache) > self.CACHE_SIZE:
+                self._formats_cache.popitem(last=False)
+        return list(formats), is_date, content_hash
+    
+    @staticmethod
+    def _same_content(entry: Tuple, content_hash: Optional[str]) -> bool:
+        """Si la entrada se aprendió del mismo contenido (sin hash se confía en ella)"""
+        return content_hash is None or entry[2] == content_hash
+    
+    def _date_candidate(self, series: pd.Series, folded: str) -> bool:
+        """Texto siempre; números solo con un encabezado de fecha"""
+        kind = series.dtype.kind
+        if kind == 'O':
+            return True
+        return kind in 'iuf' and re.fullmatch(self.DATE_HEADER_PATTERN, folded) is not None
+    
+    def _parse(self, values: pd.Series, formats: List[str], fallback: bool) -> Tuple[pd.Series, Dict[str, int]]:
+        """Parsea una vez por valor distinto y expande con los códigos"""
+        kind = values.dtype.kind
+        
+        if kind == 'M':
+            parsed = values.dt.tz_localize(None) if getattr(values.dt, 'tz', None) is not None else values
+            present = int(values.notna().sum())
+            return parsed, {'values': present, 'parsed': present, 'residue': 0, 'unparsed': 0}
+        
+        codes, uniques = pd.factorize(values)
+        uniques = pd.Series(uniques, dtype=object)
+        
+        is_date, numbers, text = self._split(uniques)
+        result = np.full(len(uniques), np.datetime64('NaT'), dtype='datetime64[ns]')
+        
+        if is_date.any():
+            result[is_date] = pd.to_datetime(uniques[is_date], errors='coerce').to_numpy(dtype='datetime64[ns]')
+        
+        done = is_date.copy()
+        
+        for date_format in formats:
+            pending = np.nonzero(~done)[0]
+            if len(pending) == 0:
+                break
+            
+            if date_format == self.EXCEL_SERIAL:
+                in_range = self._serial_mask(numbers[pending])
+                positions = pending[in_range]
+                result[positions] = (
+                    self.EXCEL_EPOCH + pd.to_timedelta(numbers[positions], unit='D')
+                ).to_numpy(dtype='datetime64[ns]')
+                done[positions] = True
+                continue
+            
+            parsed = pd.to_datetime(text.iloc[pending], format=date_format, errors='coerce').to_numpy(dtype='datetime64[ns]')
+            hit = ~np.isnat(parsed)
+            result[pending[hit]] = parsed[hit]
+            done[pending[hit]] = True
+        
+        # Residuo: texto que ningún formato fijo reconoció
+        residue = np.zeros(len(uniques), dtype=bool)
+        candidates = np.nonzero(~done & text.str.fullmatch(self.RESIDUE_PATTERN).to_numpy(dtype=bool))[0]
+        if fallback and len(candidates):
+            parsed = pd.to_datetime(
+                text.iloc[candidates], format='mixed', dayfirst=True, errors='coerce'
+            ).to_numpy(dtype='datetime64[ns]')
+            hit = ~np.isnat(parsed)
+            result[candidates[hit]] = parsed[hit]
+            residue[candidates[hit]] = True
+            done |= residue
+        
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        counts[(text == '').to_numpy()] = 0
+        parsed = pd.Series(np.append(result, np.datetime64('NaT'))[codes], index=values.index, name=values.name)
+        
+        # Conteos de filas ('residue': las que resolvió el parser flexible);
+        # los vacíos no cuentan como valores
+        stats = {
+            'values': int(counts.sum()),
+            'parsed': int(counts[done].sum()),
+            'residue': int(counts[residue].sum()),
+            'unparsed': int(counts[~done].sum())
+        }
+        return parsed, stats
+    
+    def _split(self, uniques: pd.Series) -> Tuple[np.ndarray, np.ndarray, pd.Series]:
+        """
+        Separa valores distintos en fechas propias, números y texto
+        
+        Returns:
+            Tupla (máscara de fechas, números como float64 con NaN donde no
+            hay número, texto sin espacios de cada valor)
+        """
+        values = uniques.to_numpy(dtype=object)
+        is_date = np.fromiter((isinstance(v, (datetime, date, np.datetime64)) for v in values),
+                              dtype=bool, count=len(values))
+        
+        # Números propios o texto numérico ('44927' en un CSV)
+        text = uniques.astype(str).str.strip()
+        is_bool = np.fromiter((isinstance(v, (bool, np.bool_)) for v in values), dtype=bool, count=len(values))
+        numbers = pd.to_numeric(text.where(~(is_date | is_bool)), errors='coerce').to_numpy(dtype='float64')
+        
+        return is_date, numbers, text
+    
+    def _serial_mask(self, numbers: np.ndarray) -> np.ndarray:
+        low, high = self.EXCEL_SERIAL_RANGE
+        with np.errstate(invalid='ignore'):
+            return (numbers >= low) & (numbers <= high)
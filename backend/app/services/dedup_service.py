@@ -0,0 +1,280 @@
+import pandas as pd
+import numpy as np
+import pickle
+import shutil
+import tempfile
+from pathlib import Path
+from typing import List, Optional
+from config import Config
+from app.services.reader_service import _estimate_nbytes
+
+
+class DedupService:
+    """
+    Eliminación de filas duplicadas con memoria acotada
+    
+    Las filas se reciben por bloques en el mismo orden en que se escribirán.
+    A cada fila se le calcula un hash de 64 bits (vectorizado por bloque) y
+    se reparte, junto con su número de secuencia, en una de PARTITIONS
+    particiones según el hash. Mientras los bloques pendientes caben en el
+    presupuesto de memoria se mantienen en RAM; al superarlo se vuelcan a
+    archivos temporales por partición.
+    
+    Al resolver, cada partición se procesa por separado: solo las filas cuyo
+    hash se repite son candidatas, y entre ellas se comparan los valores
+    exactos, de modo que una colisión de hash nunca elimina una fila
+    distinta. Se conserva siempre la primera aparición.
+    
+    Uso:
+        with DedupService() as dedup:
+            for chunk in bloques():
+                dedup.add(chunk)
+            dedup.resolve()
+            for chunk in bloques():
+                escribir(dedup.apply(chunk))
+    """
+    
+    PARTITIONS = 64
+    
+    HASH_DTYPE = np.dtype([('hash', '<u8'), ('seq', '<i8')])
+    
+    def __init__(self, memory_budget_mb: Optional[int] = None):
+        budget_mb = memory_budget_mb if memory_budget_mb is not None else Config.DEDUP_MEMORY_MB
+        self.memory_budget = budget_mb * 1024 * 1024
+        
+        self._buffers = [[] for _ in range(self.PARTITIONS)]
+        self._buffered_bytes = 0
+        self._spill_dir = None
+        self._spilled = [False] * self.PARTITIONS
+        self._rows = 0
+        self._dropped = None
+        self._cursor = 0
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+    
+    @property
+    def duplicates_removed(self) -> int:
+        """Filas marcadas como duplicadas (disponible tras resolve)"""
+        return 0 if self._dropped is None else len(self._dropped)
+    
+    @property
+    def spilled(self) -> bool:
+        """Indica si alguna partición se volcó a disco"""
+        return any(self._spilled)
+    
+    def add(self, chunk: pd.DataFrame) -> None:
+        """Registra un bloque de filas en orden de salida"""
+        if self._dropped is not None:
+            raise RuntimeError("No se pueden agregar filas después de resolve()")
+        
+        if len(chunk) == 0:
+            return
+        
+        hashes = self.row_hashes(chunk)
+        seqs = np.arange(self._rows, self._rows + len(chunk), dtype=np.int64)
+        self._rows += len(chunk)
+        
+        partitions = (hashes % self.PARTITIONS).astype(np.int64)
+        order = np.argsort(partitions, kind='stable')
+        bounds = np.searchsorted(partitions[order], np.arange(self.PARTITIONS + 1))
+        
+        frame = chunk.reset_index(drop=True)
+        
+        for partition in range(self.PARTITIONS):
+            start, stop = bounds[partition], bounds[partition + 1]
+            if start == stop:
+                continue
+            
+            positions = order[start:stop]
+            piece = frame.take(positions)
+            self._buffers[partition].append((hashes[positions], seqs[positions], piece))
+            self._buffered_bytes += _estimate_nbytes(piece) + positions.size * 16
+        
+        if self._buffered_bytes > self.memory_budget:
+            self._spill()
+    
+    def resolve(self) -> int:
+        """
+        Determina qué filas son duplicadas
+        
+        Returns:
+            Número de filas duplicadas
+        """
+        dropped = []
+        
+        for partition in range(self.PARTITIONS):
+            dropped.extend(self._resolve_partition(partition))
+            self._buffers[partition] = []
+        
+        self._buffered_bytes = 0
+        self._dropped = np.sort(np.asarray(dropped, dtype=np.int64))
+        self._cursor = 0
+        
+        if self._spill_dir is not None:
+            shutil.rmtree(self._spill_dir, ignore_errors=True)
+            self._spill_dir = None
+        
+        return self.duplicates_removed
+    
+    def apply(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        """
+        Quita de un bloque las filas duplicadas
+        
+        Los bloques deben entregarse en el mismo orden y con el mismo
+        tamaño que en add().
+        """
+        if self._dropped is None:
+            raise RuntimeError("Se debe llamar a resolve() antes de apply()")
+        
+        start = self._cursor
+        self._cursor += len(chunk)
+        
+        lo, hi = np.searchsorted(self._dropped, [start, self._cursor])
+        if lo == hi:
+            return chunk
+        
+        keep = np.ones(len(chunk), dtype=bool)
+        keep[self._dropped[lo:hi] - start] = False
+        return chunk[keep]
+    
+    def close(self) -> None:
+        """Libera los archivos temporales"""
+        if self._spill_dir is not None:
+            shutil.rmtree(self._spill_dir, ignore_errors=True)
+            self._spill_dir = None
+        self._buffers = [[] for _ in range(self.PARTITIONS)]
+        self._buffered_bytes = 0
+    
+    @staticmethod
+    def row_hashes(chunk: pd.DataFrame) -> np.ndarray:
+        """
+        Hash de 64 bits por fila, estable entre bloques y esquemas
+        
+        Las columnas numéricas y booleanas se llevan a float64 y las de fecha
+        a enteros, para que un mismo valor produzca el mismo hash aunque el
+        tipo inferido cambie de un bloque a otro (por ejemplo, int64 en un
+        bloque y float64 con vacíos en el siguiente).
+        
+        Cada celda se combina con el nombre de su columna y las celdas vacías
+        no aportan nada, así que el hash no depende del orden de las columnas
+        ni cambia si el esquema gana columnas que la fila no tiene.
+        """
+        total = np.zeros(len(chunk), dtype=np.uint64)
+        
+        for i, name in enumerate(chunk.columns):
+            series = chunk.iloc[:, i]
+            kind = series.dtype.kind
+            
+            if kind in 'biuf':
+                values = series.astype('float64').to_numpy()
+            elif kind == 'M':
+                values = series.to_numpy().view('int64')
+            else:
+                values = series.to_numpy(dtype=object)
+            
+            salt = pd.util.hash_array(np.array([str(name)], dtype=object))[0]
+            cells = _mix64(pd.util.hash_array(values) ^ salt)
+            cells[series.isna().to_numpy()] = 0
+            total += cells
+        
+        return total
+    
+    def _spill(self) -> None:
+        """Vuelca a disco los bloques pendientes de todas las particiones"""
+        if self._spill_dir is None:
+            self._spill_dir = Path(tempfile.mkdtemp(prefix='dedup_'))
+        
+        for partition, pieces in enumerate(self._buffers):
+            if not pieces:
+                continue
+            
+            hash_path, rows_path = self._partition_paths(partition)
+            
+            with open(hash_path, 'ab') as hash_file, open(rows_path, 'ab') as rows_file:
+                for hashes, seqs, piece in pieces:
+                    records = np.empty(len(hashes), dtype=self.HASH_DTYPE)
+                    records['hash'] = hashes
+                    records['seq'] = seqs
+                    records.tofile(hash_file)
+                    pickle.dump(piece, rows_file, protocol=pickle.HIGHEST_PROTOCOL)
+            
+            self._buffers[partition] = []
+            self._spilled[partition] = True
+        
+        self._buffered_bytes = 0
+    
+    def _resolve_partition(self, partition: int) -> List[int]:
+        """Devuelve las secuencias duplicadas de una partición"""
+        pieces = self._buffers[partition]
+        
+        hash_parts = [hashes for hashes, _, _ in pieces]
+        seq_parts = [seqs for _, seqs, _ in pieces]
+        
+        if self._spilled[partition]:
+            records = np.fromfile(self._partition_paths(partition)[0], dtype=self.HASH_DTYPE)
+            hash_parts.insert(0, records['hash'])
+            seq_parts.insert(0, records['seq'])
+        
+        if not hash_parts:
+            return []
+        
+        hashes = np.concatenate(hash_parts)
+        seqs = np.concatenate(seq_parts)
+        
+        # Solo las filas con hash repetido pueden ser duplicadas
+        unique, counts = np.unique(hashes, return_counts=True)
+        repeated = unique[counts > 1]
+        if repeated.size == 0:
+            return []
+        
+        candidate_mask = np.isin(hashes, repeated)
+        
+        # Comparación exacta de valores entre las candidatas; como object,
+        # 1 y 1.0 son iguales igual que en el hash
+        candidates = []
+        candidate_seqs = []
+        offset = 0
+        for piece in self._iter_partition_rows(partition):
+            mask = candidate_mask[offset:offset + len(piece)]
+            if mask.any():
+                candidates.append(piece[mask].astype(object))
+                candidate_seqs.append(seqs[offset:offset + len(piece)][mask])
+            offset += len(piece)
+        
+        frame = pd.concat(candidates, ignore_index=True)
+        candidate_seqs = np.concatenate(candidate_seqs)
+        
+        order = np.argsort(candidate_seqs, kind='stable')
+        duplicated = frame.take(order).duplicated(keep='first').to_numpy()
+        
+        return candidate_seqs[order][duplicated].tolist()
+    
+    def _iter_partition_rows(self, partition: int):
+        """Recorre los bloques de una partición en el orden en que se guardaron"""
+        if self._spilled[partition]:
+            with open(self._partition_paths(partition)[1], 'rb') as rows_file:
+                while True:
+                    try:
+                        yield pickle.load(rows_file)
+                    except EOFError:
+                        break
+        
+        for _, _, piece in self._buffers[partition]:
+            yield piece
+    
+    def _partition_paths(self, partition: int):
+        return (self._spill_dir / f'part_{partition:03d}.hash',
+                self._spill_dir / f'part_{partition:03d}.rows')
+
+
+def _mix64(values: np.ndarray) -> np.ndarray:
+    """Mezcla de bits (finalizador de splitmix64) sobre un arreglo uint64"""
+    values = values ^ (values >> np.uint64(30))
+    values = values * np.uint64(0xbf58476d1ce4e5b9)
+    values = values ^ (values >> np.uint64(27))
+    values = values * np.uint64(0x94d049bb133111eb)
+    return values ^ (values >> np.uint64(31))
@@ -0,0 +1,384 @@
+import pandas as pd
+import numpy as np
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional, Tuple, Union
+from app.services.reader_service import ReaderService
+from app.services.dedup_service import DedupService
+from app.services.column_profiler_service import _to_json
+
+
+class DiffService:
+    """
+    Diferencias fila a fila entre dos versiones de un libro, por columna clave
+    
+    Las filas se emparejan por el valor de la clave (por ejemplo la cédula),
+    no por su posición. Cada fila se resume con un hash de su clave y un
+    hash de sus valores (DedupService.row_hashes sobre las columnas que
+    ambas versiones comparten), calculados por bloques y vectorizados:
+    
+    1. Se recorre la versión anterior y se guardan solo los hashes
+       (16 bytes por fila), ordenados por clave.
+    2. Se recorre la versión nueva; cada bloque se cruza con búsqueda
+       binaria sobre las claves anteriores y solo se conservan las filas
+       nuevas o cuyo hash cambió.
+    3. Se vuelve a recorrer la versión anterior para recuperar únicamente
+       las filas eliminadas o modificadas.
+       
+    Así la memoria depende de la cantidad de filas que cambiaron y no del
+    tamaño de los archivos. Las filas candidatas se comparan celda por
+    celda, de modo que una diferencia solo de tipo (1 frente a 1.0) no se
+    reporta como cambio.
+    """
+    
+    # Separador de los valores de una clave compuesta
+    KEY_SEPARATOR = '\x1f'
+    
+    # Espacios al inicio o al final y '.0' final de un número como texto
+    KEY_TRIM = r'^\s+|(?:\.0+)?\s*$'
+    
+    def __init__(self):
+        self.reader = ReaderService()
+    
+    def diff_files(self,
+                   old_path: str,
+                   new_path: str,
+                   key_columns: Union[str, List[str]],
+                   old_sheet: Optional[str] = None,
+                   new_sheet: Optional[str] = None,
+                   max_rows: Optional[int] = None,
+                   chunk_size: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Compara dos versiones de una hoja
+        
+        Args:
+            old_path: Versión anterior
+            new_path: Versión nueva
+            key_columns: Columna clave o lista de columnas (clave compuesta);
+                se buscan sin distinguir mayúsculas ni espacios
+            old_sheet, new_sheet: Hojas a comparar (por defecto la primera)
+            max_rows: Máximo de filas que se devuelven por categoría (los
+                conteos siempre son completos)
+            chunk_size: Filas por bloque al leer
+            
+        Returns:
+            Diccionario con 'summary' (conteos), 'columns' (agregadas,
+            eliminadas y comunes), 'added' y 'removed' (filas completas) y
+            'modified' (clave y cambios por celda)
+        """
+        keys = [key_columns] if isinstance(key_columns, str) else list(key_columns)
+        if not keys:
+            raise ValueError("Se requiere al menos una columna clave")
+        
+        old_columns = self._column_map(old_path, old_sheet)
+        new_columns = self._column_map(new_path, new_sheet)
+        key_names = [self._normalize(key) for key in keys]
+        
+        for name, columns, path in ((key, columns, path)
+                                    for key in key_names
+                                    for columns, path in ((old_columns, old_path), (new_columns, new_path))):
+            if name not in columns:
+                raise ValueError(f"La columna clave '{name}' no existe en {Path(path).name}")
+        
+        common = [name for name in new_columns if name in old_columns]
+        
+        # 1. Hashes de la versión anterior, ordenados por clave
+        old_scan = self._scan(old_path, old_sheet, old_columns, key_names, common, chunk_size)
+        old_keys, old_positions, old_hashes = self._first_by_key(
+            old_scan['keys'], old_scan['positions'], old_scan['hashes']
+        )
+        
+        # 2. Versión nueva: solo se guardan las filas nuevas o con hash distinto
+        new_key_parts, new_position_parts = [], []
+        candidates, candidate_keys, candidate_positions = [], [], []
+        new_missing_keys = 0
+        new_rows = 0
+        
+        for frame, key_hashes, row_hashes, has_key in self._iter_hashed(
+                new_path, new_sheet, new_columns, key_names, common, chunk_size):
+            keyed = np.nonzero(has_key)[0]
+            positions = new_rows + keyed
+            new_rows += len(frame)
+            new_missing_keys += len(frame) - len(keyed)
+            
+            key_hashes, row_hashes = key_hashes[keyed], row_hashes[keyed]
+            new_key_parts.append(key_hashes)
+            new_position_parts.append(positions)
+            
+            index = np.searchsorted(old_keys, key_hashes)
+            found = index < len(old_keys)
+            found[found] = old_keys[index[found]] == key_hashes[found]
+            
+            changed = ~found
+            changed[found] = old_hashes[index[found]] != row_hashes[found]
+            
+            if changed.any():
+                candidates.append(frame.iloc[keyed[changed]])
+                candidate_keys.append(key_hashes[changed])
+                candidate_positions.append(positions[changed])
+        
+        new_keys_all = _concat_arrays(new_key_parts, np.uint64)
+        new_keys, new_first_positions, _ = self._first_by_key(
+            new_keys_all, _concat_arrays(new_position_parts, np.int64), new_keys_all
+        )
+        
+        new_candidates = self._concat(candidates, new_columns)
+        candidate_keys = _concat_arrays(candidate_keys, np.uint64)
+        candidate_positions = _concat_arrays(candidate_positions, np.int64)
+        
+        # Solo cuenta la primera aparición de cada clave en la versión nueva
+        first = np.isin(candidate_positions, new_first_positions)
+        new_candidates, candidate_keys = new_candidates[first], candidate_keys[first]
+        
+        index = np.searchsorted(old_keys, candidate_keys)
+        in_old = index < len(old_keys)
+        in_old[in_old] = old_keys[index[in_old]] == candidate_keys[in_old]
+        
+        added_rows = new_candidates[~in_old]
+        modified_new = new_candidates[in_old]
+        modified_old_positions = old_positions[index[in_old]]
+        
+        removed_mask = ~np.isin(old_keys, new_keys, assume_unique=True)
+        removed_positions = np.sort(old_positions[removed_mask])
+        
+        # 3. Segunda lectura de la versión anterior, solo las filas necesarias
+        wanted = np.union1d(removed_positions, modified_old_positions)
+        old_rows = self._collect(old_path, old_sheet, old_columns, wanted, chunk_size)
+        
+        removed_rows = old_rows.loc[removed_positions]
+        modified_old = old_rows.loc[modified_old_positions]
+        
+        modified = self._cell_changes(modified_old, modified_new, common, key_names)
+        
+        unchanged = len(new_keys) - len(added_rows) - len(modified)
+        
+        return {
+            'old_file': Path(old_path).name,
+            'new_file': Path(new_path).name,
+            'key_columns': key_names,
+            'columns': {
+                'added': [name for name in new_columns if name not in old_columns],
+                'removed': [name for name in old_columns if name not in new_columns],
+                'common': common
+            },
+            'summary': {
+                'old_rows': old_scan['rows'],
+                'new_rows': new_rows,
+                'added': len(added_rows),
+                'removed': len(removed_rows),
+                'modified': len(modified),
+                'unchanged': unchanged,
+                'duplicate_keys': {
+                    'old': int(len(old_scan['keys']) - len(old_keys)),
+                    'new': int(len(new_keys_all) - len(new_keys))
+                },
+                'rows_without_key': {
+                    'old': old_scan['missing_keys'],
+                    'new': new_missing_keys
+                }
+            },
+            'added': self._records(added_rows, max_rows),
+            'removed': self._records(removed_rows, max_rows),
+            'modified': modified[:max_rows] if max_rows is not None else modified,
+            'truncated': max_rows is not None and max(len(added_rows), len(removed_rows), len(modified)) > max_rows
+        }
+    
+    def _column_map(self, file_path: str, sheet_name: Optional[str]) -> Dict[str, Any]:
+        """Nombre normalizado -> encabezado original (la primera si se repite)"""
+        columns = {}
+        for column in self.reader.probe_headers(file_path, sheet_name)['columns']:
+            columns.setdefault(self._normalize(column), column)
+        return columns
+    
+    def _normalize(self, column: Any) -> str:
+        return str(column).strip().lower()
+    
+    def _prepare(self, chunk: pd.DataFrame, columns: Dict[str, Any]) -> pd.DataFrame:
+        """Bloque con las columnas renombradas a su nombre normalizado"""
+        names = list(chunk.columns)
+        frame = chunk.iloc[:, [names.index(original) for original in columns.values()]]
+        frame.columns = list(columns)
+        return frame
+    
+    def _iter_hashed(self,
+                     file_path: str,
+                     sheet_name: Optional[str],
+                     columns: Dict[str, Any],
+                     key_names: List[str],
+                     common: List[str],
+                     chunk_size: Optional[int]) -> Iterator[Tuple[pd.DataFrame, np.ndarray, np.ndarray, np.ndarray]]:
+        """Recorre una hoja entregando por bloque los hashes de clave y de fila"""
+        for chunk in self.reader.iter_chunks(file_path, chunk_size, sheet_name):
+            frame = self._prepare(chunk, columns)
+            key_hashes, has_key = self._key_hashes(frame, key_names)
+            row_hashes = DedupService.row_hashes(frame[common])
+            yield frame, key_hashes, row_hashes, has_key
+    
+    def _scan(self,
+              file_path: str,
+              sheet_name: Optional[str],
+              columns: Dict[str, Any],
+              key_names: List[str],
+              common: List[str],
+              chunk_size: Optional[int]) -> Dict[str, Any]:
+        """Hashes de clave y de fila de toda una hoja (sin conservar las filas)"""
+        key_parts, position_parts, hash_parts = [], [], []
+        rows = 0
+        missing_keys = 0
+        
+        for frame, key_hashes, row_hashes, has_key in self._iter_hashed(
+                file_path, sheet_name, columns, key_names, common, chunk_size):
+            # Las filas sin clave no se pueden emparejar
+            keyed = np.nonzero(has_key)[0]
+            key_parts.append(key_hashes[keyed])
+            position_parts.append(rows + keyed)
+            hash_parts.append(row_hashes[keyed])
+            
+            rows += len(frame)
+            missing_keys += len(frame) - len(keyed)
+        
+        return {
+            'keys': _concat_arrays(key_parts, np.uint64),
+            'positions': _concat_arrays(position_parts, np.int64),
+            'hashes': _concat_arrays(hash_parts, np.uint64),
+            'rows': rows,
+            'missing_keys': missing_keys
+        }
+    
+    def _first_by_key(self, keys: np.ndarray, positions: np.ndarray, hashes: np.ndarray):
+        """
+        Primera aparición de cada clave
+        
+        Returns:
+            (claves ordenadas, posición de su primera fila, hash de esa fila)
+        """
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        
+        first = np.ones(len(sorted_keys), dtype=bool)
+        first[1:] = sorted_keys[1:] != sorted_keys[:-1]
+        
+        return sorted_keys[first], positions[order[first]], hashes[order[first]]
+    
+    def _key_hashes(self, frame: pd.DataFrame, key_names: List[str]):
+        """
+        Hash de la clave de cada fila y máscara de filas con clave
+        
+        Los valores se comparan como texto sin espacios y sin el '.0' que
+        agrega una lectura numérica, para que 1234 y '1234' coincidan.
+        """
+        text = None
+        has_key = np.ones(len(frame), dtype=bool)
+        
+        for name in key_names:
+            series = frame[name]
+            has_key &= series.notna().to_numpy()
+            values = self._key_text(series)
+            has_key &= (values != '').to_numpy()
+            text = values if text is None else text + self.KEY_SEPARATOR + values
+        
+        if len(frame) == 0:
+            return np.empty(0, dtype=np.uint64), has_key
+        
+        return pd.util.hash_array(text.to_numpy(dtype=object)), has_key
+    
+    def _key_text(self, series: pd.Series) -> pd.Series:
+        """Valores de una columna clave como texto normalizado"""
+        kind = series.dtype.kind
+        
+        if kind in 'iub':
+            # Int64 (nullable): los vacíos quedan como '' igual que en object
+            return series.astype(str).where(series.notna(), '')
+        
+        if kind == 'f':
+            # Los enteros leídos como float (por tener vacíos) pierden el '.0'
+            integral = np.isfinite(series) & (series == np.floor(series))
+            as_int = series.where(integral, 0).astype('int64').astype(str)
+            return as_int.where(integral, series.astype(str))
+        
+        return series.astype(str).str.replace(self.KEY_TRIM, '', regex=True)
+    
+    def _collect(self,
+                 file_path: str,
+                 sheet_name: Optional[str],
+                 columns: Dict[str, Any],
+                 positions: np.ndarray,
+                 chunk_size: Optional[int]) -> pd.DataFrame:
+        """Filas de una hoja en las posiciones indicadas (ordenadas)"""
+        pieces = []
+        offset = 0
+        
+        if len(positions):
+            for chunk in self.reader.iter_chunks(file_path, chunk_size, sheet_name):
+                lo, hi = np.searchsorted(positions, [offset, offset + len(chunk)])
+                if hi > lo:
+                    piece = self._prepare(chunk, columns).iloc[positions[lo:hi] - offset]
+                    piece.index = positions[lo:hi]
+                    pieces.append(piece)
+                offset += len(chunk)
+                
+                if hi == len(positions):
+                    break
+        
+        frame = self._concat(pieces, columns)
+        if not pieces:
+            frame.index = pd.Index([], dtype=np.int64)
+        return frame
+    
+    def _concat(self, pieces: List[pd.DataFrame], columns: Dict[str, Any]) -> pd.DataFrame:
+        if not pieces:
+            return pd.DataFrame(columns=list(columns))
+        return pd.concat([piece.astype(object) for piece in pieces])
+    
+    def _cell_changes(self,
+                      old: pd.DataFrame,
+                      new: pd.DataFrame,
+                      common: List[str],
+                      key_names: List[str]) -> List[Dict[str, Any]]:
+        """Cambios por celda entre filas emparejadas (misma posición)"""
+        if len(new) == 0:
+            return []
+        
+        changed_cells = []
+        for name in common:
+            a = old[name].to_numpy(dtype=object)
+            b = new[name].to_numpy(dtype=object)
+            both_null = pd.isna(a) & pd.isna(b)
+            changed_cells.append(~((a == b) | both_null))
+        
+        changed = np.column_stack(changed_cells) if changed_cells else np.zeros((len(new), 0), dtype=bool)
+        rows = np.nonzero(changed.any(axis=1))[0]
+        
+        modified = []
+        for row in rows:
+            modified.append({
+                'key': {name: _cell(new[name].iat[row]) for name in key_names},
+                'changes': [
+                    {
+                        'column': common[col],
+                        'old': _cell(old[common[col]].iat[row]),
+                        'new': _cell(new[common[col]].iat[row])
+                    }
+                    for col in np.nonzero(changed[row])[0]
+                ]
+            })
+        
+        return modified
+    
+    def _records(self, frame: pd.DataFrame, max_rows: Optional[int]) -> List[Dict[str, Any]]:
+        if max_rows is not None:
+            frame = frame.iloc[:max_rows]
+        return [
+            {name: _cell(value) for name, value in zip(frame.columns, row)}
+            for row in frame.itertuples(index=False, name=None)
+        ]
+
+
+def _cell(value: Any) -> Any:
+    """Valor de una celda listo para JSON (vacíos como None)"""
+    if value is None or (not isinstance(value, (list, tuple, dict)) and pd.isna(value)):
+        return None
+    return _to_json(value)
+
+
+def _concat_arrays(parts: List[np.ndarray], dtype) -> np.ndarray:
+    return np.concatenate(parts).astype(dtype, copy=False) if parts else np.empty(0, dtype=dtype)
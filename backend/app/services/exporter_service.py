@@ -1,132 +1,537 @@
+import gzip
+import os
 import pandas as pd
+import queue
+import re
+import threading
+import zlib
+from functools import partial
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, Callable, Iterable, Iterator, List, Optional, Union
 from config import Config
+from app.services.reader_service import ReaderService
+from app.services.date_normalizer_service import DateNormalizerService
+from app.services.sql_export_service import SqlExportService
 import json
 
 
 class ExporterService:
     """Servicio para exportar datos a diferentes formatos"""
     
+    # Orientaciones JSON que se pueden escribir bloque a bloque: además de
+    # las de pandas, 'jsonl' (un registro por línea) y 'columnar' (columna ->
+    # arreglo de valores), ambas sin indentación
+    STREAMABLE_JSON_ORIENTS = ['records', 'values', 'jsonl', 'columnar']
+    
+    # Formatos de descarga en streaming: tipo MIME y extensión
+    STREAM_FORMATS = {
+        'csv': ('text/csv', 'csv'),
+        'jsonl': ('application/x-ndjson', 'jsonl'),
+        'sql': ('application/sql', 'sql')
+    }
+    
     def __init__(self):
         self.outputs_dir = Config.OUTPUTS_DIR
         self.outputs_dir.mkdir(parents=True, exist_ok=True)
+        self.reader = ReaderService()
+        self.dates = DateNormalizerService()
+        self.sql = SqlExportService()
     
-    def export_to_csv(self, file_path: str, output_name: str = None, delimiter: str = ',') -> str:
-        """Exporta Excel a CSV"""
-        df = pd.read_excel(file_path)
+    def _iter_chunks(self, file_path: str, sheet_name: Optional[str], normalize_dates: bool):
+        """
+        Bloques de la hoja, con las columnas de fechas normalizadas si se pide
         
+        Los formatos se detectan en el primer bloque y quedan en caché por
+        (columna, hoja) junto con el hash del archivo para el resto.
+        """
+        content_hash = self.reader.file_hash(file_path) if normalize_dates else None
+        
+        for chunk in self.reader.iter_chunks(file_path, sheet_name=sheet_name):
+            if normalize_dates:
+                chunk = self.dates.normalize_frame(chunk, sheet_name or '', content_hash=content_hash)[0]
+            yield chunk
+    
+    def export_to_csv(self, 
+                      file_path: str, 
+                      output_name: str = None, 
+                      delimiter: str = ',',
+                      sheet_name: Optional[str] = None,
+                      normalize_dates: bool = False) -> str:
+        """Exporta Excel a CSV leyendo por bloques"""
         if output_name is None:
             output_name = f"{Path(file_path).stem}.csv"
         
         output_path = self.outputs_dir / output_name
-        df.to_csv(output_path, index=False, sep=delimiter)
+        self._write_csv(self._iter_chunks(file_path, sheet_name, normalize_dates), output_path, delimiter)
         
         return str(output_path)
     
-    def export_to_json(self, file_path: str, output_name: str = None, orient: str = 'records') -> str:
-        """Exporta Excel a JSON"""
-        df = pd.read_excel(file_path)
+    def _write_csv(self, chunks: Iterable[pd.DataFrame], output_path: Path, delimiter: str = ',') -> None:
+        with open(output_path, 'w', encoding='utf-8', newline='') as f:
+            for i, chunk in enumerate(chunks):
+                chunk.to_csv(f, index=False, sep=delimiter, header=(i == 0))
+    
+    def export_to_json(self, 
+                       file_path: str, 
+                       output_name: str = None, 
+                       orient: str = 'records',
+                       sheet_name: Optional[str] = None,
+                       normalize_dates: bool = False,
+                       compress: bool = False) -> str:
+        """
+        Exporta Excel a JSON
+        
+        Con normalize_dates las columnas de fechas se convierten y se
+        escriben en ISO 8601 (sin la opción pandas escribe milisegundos
+        desde 1970).
         
+        orient acepta además 'jsonl' (JSON Lines, un registro por línea) y
+        'columnar' ({"columna": [valores], ...}); las dos se escriben sin
+        indentación y por bloques. Con compress la salida va en gzip.
+        """
         if output_name is None:
-            output_name = f"{Path(file_path).stem}.json"
+            extension = 'jsonl' if orient == 'jsonl' else 'json'
+            output_name = f"{Path(file_path).stem}.{extension}" + ('.gz' if compress else '')
         
         output_path = self.outputs_dir / output_name
-        df.to_json(output_path, orient=orient, force_ascii=False, indent=2)
+        date_format = 'iso' if normalize_dates else None
+        
+        if orient not in self.STREAMABLE_JSON_ORIENTS:
+            # Estas orientaciones necesitan el DataFrame completo
+            df = self.reader.read(file_path, sheet_name=sheet_name)
+            if normalize_dates:
+                df = self.dates.normalize_frame(df, sheet_name or '', content_hash=self.reader.file_hash(file_path))[0]
+            df.to_json(output_path, orient=orient, force_ascii=False, indent=2, date_format=date_format,
+                       compression='gzip' if compress else None)
+            return str(output_path)
+        
+        chunks = self._iter_chunks(file_path, sheet_name, normalize_dates)
+        
+        if orient == 'jsonl':
+            with _open_output(output_path, compress) as f:
+                for chunk in chunks:
+                    f.write(self._to_jsonl(chunk, date_format))
+        elif orient == 'columnar':
+            self._write_columnar_json(chunks, output_path, date_format, compress)
+        else:
+            self._write_json(chunks, output_path, orient, date_format, compress)
         
         return str(output_path)
     
+    def _write_json(self,
+                    chunks: Iterable[pd.DataFrame],
+                    output_path: Path,
+                    orient: str = 'records',
+                    date_format: Optional[str] = None,
+                    compress: bool = False) -> None:
+        """
+        Escribe un arreglo JSON (records/values) bloque a bloque, con el
+        mismo formato que to_json sobre el DataFrame completo
+        """
+        with _open_output(output_path, compress) as f:
+            f.write('[\n')
+            first = True
+            
+            for chunk in chunks:
+                body = chunk.to_json(orient=orient, force_ascii=False, indent=2, date_format=date_format)[2:-2]
+                
+                if not body:
+                    continue
+                
+                if not first:
+                    f.write(',\n')
+                f.write(body)
+                first = False
+            
+            f.write('\n]')
+    
+    def _write_columnar_json(self,
+                             chunks: Iterable[pd.DataFrame],
+                             output_path: Path,
+                             date_format: Optional[str] = None,
+                             compress: bool = False) -> None:
+        """
+        Escribe {"columna": [valores], ...} sin tener las columnas completas en memoria
+        
+        Los valores de cada columna de cada bloque se serializan y se
+        anexan a un archivo temporal, anotando dónde quedó cada tramo; al
+        final se arma el objeto copiando los tramos de cada columna en
+        orden.
+        """
+        output_path = Path(output_path)
+        spool_path = output_path.with_name(output_path.name + '.part')
+        columns = None
+        segments = []
+        
+        try:
+            with open(spool_path, 'w+b') as spool:
+                for chunk in chunks:
+                    if columns is None:
+                        columns = list(chunk.columns)
+                        segments = [[] for _ in columns]
+                    
+                    if len(chunk) == 0:
+                        continue
+                    
+                    for i in range(len(columns)):
+                        values = chunk.iloc[:, i].to_json(orient='values', force_ascii=False,
+                                                          date_format=date_format)[1:-1].encode('utf-8')
+                        segments[i].append((spool.tell(), len(values)))
+                        spool.write(values)
+                
+                with _open_output(output_path, compress) as f:
+                    f.write('{')
+                    for i, column in enumerate(columns or []):
+                        f.write((',' if i else '') + json.dumps(str(column), ensure_ascii=False) + ':[')
+                        for j, (offset, length) in enumerate(segments[i]):
+                            spool.seek(offset)
+                            f.write((',' if j else '') + spool.read(length).decode('utf-8'))
+                        f.write(']')
+                    f.write('}')
+        finally:
+            if spool_path.exists():
+                os.remove(spool_path)
+    
     def export_to_sql(self, 
                      file_path: str, 
                      table_name: str,
                      database_type: str = 'postgresql',
-                     output_name: str = None) -> str:
+                     output_name: str = None,
+                     sheet_name: Optional[str] = None,
+                     normalize_dates: bool = False,
+                     batch_size: Optional[int] = None,
+                     use_copy: bool = True) -> str:
         """
-        Genera script SQL desde Excel
+        Genera script SQL de carga masiva desde Excel
         
         Args:
             file_path: Ruta al archivo Excel
             table_name: Nombre de la tabla en la BD
             database_type: Tipo de base de datos (postgresql, mysql, sqlite)
             output_name: Nombre del archivo SQL de salida
+            sheet_name: Hoja a exportar (por defecto la primera)
+            normalize_dates: Si convierte las columnas de fechas en texto
+                para que se creen como TIMESTAMP
+            batch_size: Filas por INSERT (por defecto Config.SQL_BATCH_ROWS)
+            use_copy: En PostgreSQL, cargar con COPY en lugar de INSERT
             
         Returns:
             Ruta del archivo SQL generado
         """
-        df = pd.read_excel(file_path)
-        
         if output_name is None:
             output_name = f"{table_name}.sql"
         
         output_path = self.outputs_dir / output_name
         
-        with open(output_path, 'w', encoding='utf-8') as f:
-            # Generar CREATE TABLE
-            f.write(f"-- Tabla: {table_name}\n")
-            f.write(f"CREATE TABLE IF NOT EXISTS {table_name} (\n")
-            
-            columns = []
-            for col in df.columns:
-                # Inferir tipo de dato
-                dtype = df[col].dtype
-                
-                if dtype == 'int64':
-                    sql_type = 'INTEGER'
-                elif dtype == 'float64':
-                    sql_type = 'DECIMAL(10,2)'
-                elif dtype == 'datetime64[ns]':
-                    sql_type = 'TIMESTAMP'
-                else:
-                    sql_type = 'VARCHAR(255)'
-                
-                columns.append(f"    {col} {sql_type}")
-            
-            f.write(',\n'.join(columns))
-            f.write("\n);\n\n")
-            
-            # Generar INSERTs
-            f.write(f"-- Inserts para {table_name}\n")
+        self.sql.write_script(
+            self._iter_chunks(file_path, sheet_name, normalize_dates),
+            output_path,
+            table_name,
+            database_type,
+            batch_size,
+            use_copy
+        )
+        
+        return str(output_path)
+    
+    def export_to_sqlite(self,
+                         file_paths: Union[str, List[str]],
+                         output_name: str = None,
+                         table_names: Optional[List[str]] = None,
+                         sheet_name: Optional[str] = None,
+                         normalize_dates: bool = False,
+                         batch_size: Optional[int] = None,
+                         index_columns: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Exporta uno o más archivos a una base SQLite lista para consultar
+        
+        Cada archivo se lee por bloques y queda en su propia tabla de la
+        misma base.
+        
+        Args:
+            file_paths: Ruta o lista de rutas
+            output_name: Nombre de la base (por defecto el del archivo, o
+                export.sqlite si son varios)
+            table_names: Nombre de la tabla de cada archivo (por defecto el
+                nombre del archivo; los repetidos llevan sufijo)
+            sheet_name: Hoja a exportar de cada archivo (por defecto la primera)
+            normalize_dates: Si convierte las columnas de fechas en texto
+            batch_size: Filas por transacción (por defecto Config.SQLITE_BATCH_ROWS)
+            index_columns: Columnas a indexar después de la carga
             
-            for idx, row in df.iterrows():
-                values = []
-                for val in row:
-                    if pd.isna(val):
-                        values.append('NULL')
-                    elif isinstance(val, str):
-                        # Escapar comillas simples
-                        val_escaped = val.replace("'", "''")
-                        values.append(f"'{val_escaped}'")
-                    else:
-                        values.append(str(val))
+        Returns:
+            Diccionario con 'sqlite_path' y 'tables' (filas, columnas e
+            índices de cada tabla)
+        """
+        if isinstance(file_paths, str):
+            file_paths = [file_paths]
+        
+        if table_names and len(table_names) != len(file_paths):
+            raise ValueError("Se necesita un nombre de tabla por archivo")
+        
+        names = []
+        for i, file_path in enumerate(file_paths):
+            name = table_names[i] if table_names else self._safe_name(Path(file_path).stem).replace('-', '_')
+            name = name or 'data'
+            unique, n = name, 2
+            while unique.lower() in (existing.lower() for existing in names):
+                unique, n = f"{name}_{n}", n + 1
+            names.append(unique)
+        
+        if output_name is None:
+            output_name = f"{Path(file_paths[0]).stem}.sqlite" if len(file_paths) == 1 else 'export.sqlite'
+        
+        output_path = self.outputs_dir / output_name
+        
+        tables = self.sql.write_database(
+            ((name, self._iter_chunks(file_path, sheet_name, normalize_dates))
+             for name, file_path in zip(names, file_paths)),
+            output_path,
+            batch_size,
+            index_columns
+        )
+        
+        return {'sqlite_path': str(output_path), 'tables': tables}
+    
+    def stream_export(self,
+                      file_path: str,
+                      fmt: str = 'csv',
+                      sheet_name: Optional[str] = None,
+                      normalize_dates: bool = False,
+                      compress: bool = False,
+                      delimiter: str = ',',
+                      table_name: str = 'data',
+                      database_type: str = 'postgresql',
+                      batch_size: Optional[int] = None,
+                      use_copy: bool = True) -> Iterator[bytes]:
+        """
+        Exporta en partes para enviarlas directamente en la respuesta HTTP
+        
+        Cada bloque leído se convierte y se entrega en cuanto está listo,
+        sin archivo de salida: el primer byte sale tras leer el primer
+        bloque y la memoria no depende del tamaño del archivo.
+        
+        Args:
+            file_path: Ruta al archivo
+            fmt: csv, jsonl (un registro JSON por línea) o sql
+            sheet_name: Hoja a exportar (por defecto la primera)
+            normalize_dates: Si normaliza las columnas de fechas en texto
+            compress: Si comprime la salida con gzip sobre la marcha
+            delimiter: Separador del CSV
+            table_name, database_type, batch_size, use_copy: Opciones del
+                script SQL (ver SqlExportService.stream_script)
                 
-                insert_sql = f"INSERT INTO {table_name} VALUES ({', '.join(values)});\n"
-                f.write(insert_sql)
+        Yields:
+            Partes del archivo en UTF-8 (o del .gz si compress)
+        """
+        if fmt not in self.STREAM_FORMATS:
+            raise ValueError(f"Formato no soportado: {fmt}")
         
-        return str(output_path)
+        chunks = self._iter_chunks(file_path, sheet_name, normalize_dates)
+        date_format = 'iso' if normalize_dates else None
+        
+        if fmt == 'csv':
+            parts = (chunk.to_csv(index=False, sep=delimiter, header=(i == 0)) for i, chunk in enumerate(chunks))
+        elif fmt == 'jsonl':
+            parts = (self._to_jsonl(chunk, date_format) for chunk in chunks)
+        else:
+            parts = self.sql.stream_script(chunks, table_name, database_type, batch_size, use_copy)
+        
+        encoded = (part.encode('utf-8') for part in parts if part)
+        return _gzip_parts(encoded) if compress else encoded
+    
+    def _to_jsonl(self, chunk: pd.DataFrame, date_format: Optional[str] = None) -> str:
+        """Registros de un bloque, uno por línea (JSON Lines)"""
+        if len(chunk) == 0:
+            return ''
+        return chunk.to_json(orient='records', lines=True, force_ascii=False, date_format=date_format)
     
     def export_multiple_formats(self, 
                                file_path: str, 
-                               formats: List[str] = ['csv', 'json']) -> Dict[str, str]:
-        """Exporta a múltiples formatos"""
+                               formats: List[str] = ['csv', 'json'],
+                               sheets: Union[None, str, List[str]] = None,
+                               normalize_dates: bool = False,
+                               database_type: str = 'postgresql') -> Dict[str, Any]:
+        """
+        Exporta a múltiples formatos
+        
+        Args:
+            file_path: Ruta al archivo Excel
+            formats: Formatos a generar (csv, json, sql, sqlite)
+            sheets: Hojas a exportar: None (primera), 'all', un nombre, un
+                patrón tipo glob o una lista de nombres. Si se indica, el
+                resultado tiene una entrada por hoja en 'sheets'.
+            normalize_dates: Si normaliza las columnas de fechas en texto
+            database_type: Dialecto del script SQL (postgresql, mysql, sqlite)
+            
+        Returns:
+            Rutas generadas por formato (y errores por formato, si los hay)
+        """
+        stem = Path(file_path).stem
+        
+        if sheets is None:
+            return self._export_formats(file_path, formats, stem, None, normalize_dates, database_type)
+        
+        sheet_names = self.reader.resolve_sheets(file_path, sheets)
+        
+        # Parsear en paralelo las hojas antes de exportarlas una a una
+        if len(sheet_names) > 1:
+            self.reader.read_sheets(file_path, sheet_names)
+        
+        return {
+            'sheets': {
+                sheet_name: self._export_formats(
+                    file_path, 
+                    formats, 
+                    f"{stem}_{self._safe_name(sheet_name)}" if sheet_name else stem,
+                    sheet_name,
+                    normalize_dates,
+                    database_type
+                )
+                for sheet_name in sheet_names
+            }
+        }
+    
+    def _safe_name(self, name: str) -> str:
+        """Convierte un nombre de hoja en algo válido para archivos y tablas"""
+        return re.sub(r'[^\w\-]+', '_', name).strip('_')
+    
+    def _export_formats(self, 
+                        file_path: str, 
+                        formats: List[str],
+                        base_name: str,
+                        sheet_name: Optional[str] = None,
+                        normalize_dates: bool = False,
+                        database_type: str = 'postgresql') -> Dict[str, str]:
+        """
+        Exporta una hoja a cada formato pedido con una sola lectura
+        
+        Los bloques de la lectura se reparten a los escritores de todos los
+        formatos, que corren a la vez (ver _fan_out); el error de un formato
+        no detiene a los demás.
+        """
+        table_name = base_name.replace('-', '_').replace(' ', '_')
+        date_format = 'iso' if normalize_dates else None
+        
+        targets = {
+            'csv': self.outputs_dir / f"{base_name}.csv",
+            'json': self.outputs_dir / f"{base_name}.json",
+            'sql': self.outputs_dir / f"{table_name}.sql",
+            'sqlite': self.outputs_dir / f"{base_name}.sqlite"
+        }
+        writers = {
+            'csv': partial(self._write_csv, output_path=targets['csv']),
+            'json': partial(self._write_json, output_path=targets['json'], date_format=date_format),
+            'sql': partial(self.sql.write_script, output_path=targets['sql'], table_name=table_name,
+                           database_type=database_type),
+            'sqlite': lambda chunks: self.sql.write_database([(table_name, chunks)], targets['sqlite'])
+        }
+        writers = {fmt: writer for fmt, writer in writers.items() if fmt in formats}
+        
+        if not writers:
+            return {}
+        
+        errors = self._fan_out(self._iter_chunks(file_path, sheet_name, normalize_dates), writers)
+        
         results = {}
+        for fmt, error in errors.items():
+            if error is None:
+                results[fmt] = str(targets[fmt])
+            else:
+                results[f'{fmt}_error'] = str(error)
         
-        if 'csv' in formats:
-            try:
-                results['csv'] = self.export_to_csv(file_path)
-            except Exception as e:
-                results['csv_error'] = str(e)
+        return results
+    
+    def _fan_out(self,
+                 chunks: Iterable[pd.DataFrame],
+                 writers: Dict[str, Callable[[Iterable[pd.DataFrame]], Any]]) -> Dict[str, Optional[Exception]]:
+        """
+        Reparte los bloques de una lectura entre varios escritores
         
-        if 'json' in formats:
+        Cada escritor corre en su hilo y recibe los bloques por una cola
+        acotada (Config.EXPORT_QUEUE_CHUNKS), así la lectura no se adelanta
+        más de unos pocos bloques al escritor más lento. Los bloques se
+        comparten entre escritores y no se deben modificar.
+        
+        Si un escritor falla, su hilo sigue vaciando la cola para no frenar
+        a los demás; si falla la lectura, todos reciben el error.
+        
+        Returns:
+            Diccionario formato -> excepción (None si terminó bien)
+        """
+        if len(writers) == 1:
+            fmt, writer = next(iter(writers.items()))
             try:
-                results['json'] = self.export_to_json(file_path)
+                writer(chunks)
+                return {fmt: None}
             except Exception as e:
-                results['json_error'] = str(e)
+                return {fmt: e}
+        
+        queues = {fmt: queue.Queue(maxsize=Config.EXPORT_QUEUE_CHUNKS) for fmt in writers}
+        errors = {fmt: None for fmt in writers}
         
-        if 'sql' in formats:
+        def run(fmt: str, writer: Callable[[Iterable[pd.DataFrame]], Any]) -> None:
+            feed = _iter_queue(queues[fmt])
             try:
-                table_name = Path(file_path).stem.replace('-', '_').replace(' ', '_')
-                results['sql'] = self.export_to_sql(file_path, table_name)
+                writer(feed)
             except Exception as e:
-                results['sql_error'] = str(e)
+                errors[fmt] = e
+            finally:
+                for _ in feed:
+                    pass
         
-        return results
+        threads = [
+            threading.Thread(target=run, args=(fmt, writer), name=f'export-{fmt}', daemon=True)
+            for fmt, writer in writers.items()
+        ]
+        for thread in threads:
+            thread.start()
+        
+        end = _END_OF_CHUNKS
+        try:
+            for chunk in chunks:
+                for q in queues.values():
+                    q.put(chunk)
+        except Exception as e:
+            end = e
+        finally:
+            for q in queues.values():
+                q.put(end)
+            for thread in threads:
+                thread.join()
+        
+        return errors
+
+
+def _open_output(output_path: Path, compress: bool = False):
+    """Archivo de texto de salida en UTF-8, comprimido con gzip si se pide"""
+    if compress:
+        return gzip.open(output_path, 'wt', encoding='utf-8', compresslevel=6)
+    return open(output_path, 'w', encoding='utf-8')
+
+
+def _gzip_parts(parts: Iterable[bytes]) -> Iterator[bytes]:
+    """Comprime con gzip un flujo de partes, entregando lo comprimido a medida que sale"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    
+    for part in parts:
+        compressed = compressor.compress(part)
+        if compressed:
+            yield compressed
+    
+    yield compressor.flush()
+
+
+# Marca de fin de la lectura en las colas de _fan_out
+_END_OF_CHUNKS = object()
+
+
+def _iter_queue(q: queue.Queue) -> Iterator[pd.DataFrame]:
+    """Bloques de una cola hasta la marca de fin; relanza el error de lectura"""
+    while True:
+        item = q.get()
+        if item is _END_OF_CHUNKS:
+            return
+        if isinstance(item, BaseException):
+            raise item
+        yield item
@@ -0,0 +1,207 @@
+import numpy as np
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+
+class FuzzyMatcherService:
+    """
+    Emparejamiento aproximado de encabezados por n-gramas de caracteres
+    
+    Los textos se pliegan (minúsculas, sin tildes ni signos) y se
+    representan como el conjunto de sus n-gramas. La similitud entre un
+    encabezado y una palabra clave es el coseno entre esos conjuntos:
+    |A ∩ B| / sqrt(|A| · |B|).
+    
+    Todo el cálculo es vectorizado: los n-gramas se obtienen como códigos
+    enteros a partir de la matriz de caracteres, las intersecciones se
+    cuentan con un índice invertido de los n-gramas de las palabras clave
+    y la matriz completa encabezados × palabras clave sale de un único
+    np.bincount. Después se asigna a cada campo como máximo una columna,
+    tomando primero los pares de mayor similitud.
+    """
+    
+    NGRAM = 3
+    
+    # Similitud mínima para considerar que una columna corresponde a un campo
+    DEFAULT_THRESHOLD = 0.5
+    
+    # Bits por carácter al empaquetar un n-grama en un entero
+    CHAR_BITS = 21
+    
+    def __init__(self, threshold: Optional[float] = None):
+        self.threshold = threshold if threshold is not None else self.DEFAULT_THRESHOLD
+    
+    @staticmethod
+    def fold(text: Any) -> str:
+        """Normaliza un texto: minúsculas, sin tildes y sin signos"""
+        return _fold(str(text))
+    
+    def similarity_matrix(self, headers: List[Any], keywords: List[Any]) -> np.ndarray:
+        """
+        Matriz de similitud (len(headers) × len(keywords)) con valores en [0, 1]
+        """
+        similarity, header_inverse, keyword_inverse = self._unique_similarity(headers, keywords)
+        return similarity[keyword_inverse][:, header_inverse].T
+    
+    def match(self,
+              headers: List[Any],
+              fields: Dict[str, List[Any]],
+              threshold: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Asigna columnas a campos
+        
+        Args:
+            headers: Encabezados de las columnas
+            fields: Palabras clave por campo (por ejemplo, las palabras_clave
+                de un perfil, o el propio nombre del campo)
+            threshold: Similitud mínima (por defecto la del servicio)
+            
+        Returns:
+            Lista de asignaciones en el orden de las columnas, cada una con
+            'column', 'field', 'keyword' y 'score'. Cada columna y cada
+            campo aparecen como máximo una vez.
+        """
+        threshold = threshold if threshold is not None else self.threshold
+        
+        field_names = [name for name, keywords in fields.items() if keywords]
+        keywords = [keyword for name in field_names for keyword in fields[name]]
+        
+        if not headers or not keywords:
+            return []
+        
+        similarity, header_inverse, keyword_inverse = self._unique_similarity(headers, keywords)
+        
+        # Puntaje de cada campo = su mejor palabra clave
+        bounds = np.cumsum([0] + [len(fields[name]) for name in field_names])
+        field_rows = [keyword_inverse[bounds[i]:bounds[i + 1]] for i in range(len(field_names))]
+        field_scores = np.vstack([similarity[rows].max(axis=0) for rows in field_rows])
+        
+        # Los encabezados repetidos compiten como columnas distintas
+        scores = field_scores.T[header_inverse]
+        
+        rows, cols = np.nonzero(scores >= threshold)
+        order = np.argsort(-scores[rows, cols], kind='stable')
+        
+        used_rows = set()
+        used_fields = set()
+        assignments = []
+        
+        for position in order:
+            row, col = int(rows[position]), int(cols[position])
+            if row in used_rows or col in used_fields:
+                continue
+            
+            used_rows.add(row)
+            used_fields.add(col)
+            
+            best = bounds[col] + int(np.argmax(similarity[field_rows[col], header_inverse[row]]))
+            
+            assignments.append((row, {
+                'column': headers[row],
+                'field': field_names[col],
+                'keyword': keywords[best],
+                'score': round(float(scores[row, col]), 4)
+            }))
+            
+            if len(used_fields) == len(field_names):
+                break
+        
+        return [assignment for _, assignment in sorted(assignments, key=lambda item: item[0])]
+    
+    def _unique_similarity(self, headers: List[Any], keywords: List[Any]):
+        """
+        Similitud entre los textos distintos (ya plegados)
+        
+        Returns:
+            (matriz palabras clave distintas × encabezados distintos,
+            columna de cada encabezado, fila de cada palabra clave)
+        """
+        unique_headers, header_inverse = self._unique_folded(headers)
+        unique_keywords, keyword_inverse = self._unique_folded(keywords)
+        
+        n_headers, n_keywords = len(unique_headers), len(unique_keywords)
+        if not n_headers or not n_keywords:
+            return np.zeros((n_keywords, n_headers), dtype=np.float32), header_inverse, keyword_inverse
+        
+        header_rows, header_codes, header_sizes = self._gram_sets(unique_headers)
+        keyword_rows, keyword_codes, keyword_sizes = self._gram_sets(unique_keywords)
+        
+        # Índice invertido: n-gramas de las palabras clave ordenados por código
+        order = np.argsort(keyword_codes, kind='stable')
+        keyword_codes = keyword_codes[order]
+        keyword_rows = keyword_rows[order]
+        
+        left = np.searchsorted(keyword_codes, header_codes, side='left')
+        right = np.searchsorted(keyword_codes, header_codes, side='right')
+        counts = right - left
+        
+        # Cada n-grama de un encabezado se expande a las palabras clave que lo contienen
+        total = int(counts.sum())
+        pair_headers = np.repeat(header_rows, counts)
+        offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        pair_keywords = keyword_rows[np.repeat(left, counts) + offsets]
+        
+        # Intersecciones de todos los pares en una sola pasada
+        intersection = np.bincount(
+            pair_keywords * n_headers + pair_headers,
+            minlength=n_keywords * n_headers
+        ).reshape(n_keywords, n_headers)
+        
+        header_norms = np.sqrt(header_sizes, dtype=np.float32)
+        keyword_norms = np.sqrt(keyword_sizes, dtype=np.float32)
+        header_norms[header_norms == 0] = np.inf
+        keyword_norms[keyword_norms == 0] = np.inf
+        
+        similarity = intersection.astype(np.float32)
+        similarity /= keyword_norms[:, None]
+        similarity /= header_norms[None, :]
+        
+        return similarity, header_inverse, keyword_inverse
+    
+    def _unique_folded(self, texts: List[Any]):
+        """Textos plegados sin repetir y la posición de cada original"""
+        positions = {}
+        inverse = np.fromiter((positions.setdefault(_fold(str(text)), len(positions)) for text in texts),
+                              dtype=np.int64, count=len(texts))
+        return list(positions), inverse
+    
+    def _gram_sets(self, texts: List[str]):
+        """
+        Conjuntos de n-gramas de varios textos
+        
+        Returns:
+            (filas, códigos, tamaños): una entrada por n-grama distinto de
+            cada texto y el número de n-gramas distintos de cada texto
+        """
+        n = self.NGRAM
+        padded = [f' {text} ' for text in texts]
+        width = max(n, max(len(text) for text in padded))
+        
+        chars = np.array(padded, dtype=f'<U{width}').view(np.uint32)
+        chars = chars.reshape(len(padded), width).astype(np.int64)
+        
+        span = width - n + 1
+        codes = chars[:, :span]
+        for k in range(1, n):
+            codes = (codes << self.CHAR_BITS) | chars[:, k:k + span]
+        
+        # Un n-grama es válido si su último carácter no es relleno
+        codes = np.where(chars[:, n - 1:] != 0, codes, -1)
+        codes.sort(axis=1)
+        
+        distinct = codes != -1
+        distinct[:, 1:] &= codes[:, 1:] != codes[:, :-1]
+        
+        rows = np.nonzero(distinct)[0]
+        return rows, codes[distinct], distinct.sum(axis=1)
+
+
+@lru_cache(maxsize=65536)
+def _fold(text: str) -> str:
+    text = text.lower()
+    if not text.isascii():
+        text = unicodedata.normalize('NFKD', text)
+        text = ''.join(char for char in text if not unicodedata.combining(char))
+    return re.sub(r'[\W_]+', ' ', text).strip()
@@ -0,0 +1,274 @@
+import json
+import os
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional
+from config import Config
+from app.services.fuzzy_matcher_service import FuzzyMatcherService
+
+try:
+    import fcntl
+except ImportError:  # Windows: solo se serializa dentro del proceso
+    fcntl = None
+
+
+class HeaderIndexService:
+    """
+    Índice persistente de encabezados vistos en todos los archivos analizados
+    
+    Por cada encabezado normalizado (minúsculas, sin tildes ni signos)
+    guarda cuántas veces apareció, en cuántos archivos distintos, con qué
+    otros encabezados suele aparecer y el último campo y tipo asignados.
+    Se actualiza de forma incremental con cada análisis; un archivo ya
+    indexado (mismo hash de contenido) no vuelve a sumar apariciones.
+    
+    El índice es un JSON en Config.DATA_DIR que se reescribe de forma
+    atómica y se mantiene en memoria mientras no cambie en disco. Las
+    actualizaciones toman además un bloqueo de archivo, así que varios
+    procesos del servidor no se pisan los cambios. De las hojas indexadas
+    se recuerdan las Config.HEADER_INDEX_MAX_FILES más recientes.
+    """
+    
+    VERSION = 1
+    
+    # Encabezados co-ocurrentes que se conservan por entrada
+    MAX_COOCCURRENCE = 50
+    
+    _lock = threading.Lock()
+    _loaded = None
+    _loaded_mtime = None
+    
+    def __init__(self, index_path: Optional[Path] = None):
+        self.index_path = Path(index_path) if index_path is not None else Config.HEADER_INDEX_FILE
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+    
+    @staticmethod
+    def normalize(header: Any) -> str:
+        """Clave del índice para un encabezado"""
+        return FuzzyMatcherService.fold(header)
+    
+    def update(self,
+               source_key: str,
+               file_name: str,
+               columns: List[Any],
+               assignments: Optional[Dict[Any, Dict[str, Any]]] = None) -> bool:
+        """
+        Incorpora los encabezados de una hoja al índice
+        
+        Args:
+            source_key: Identificador del contenido, p. ej. hash del archivo
+                más hoja (evita contar dos veces la misma hoja)
+            file_name: Nombre del archivo, solo informativo
+            columns: Encabezados de la hoja
+            assignments: Por columna, lo asignado en el análisis: 'field',
+                'data_type' y/o 'content_type'
+                
+        Returns:
+            True si la hoja era nueva para el índice
+        """
+        return self.update_many([{
+            'source_key': source_key,
+            'file_name': file_name,
+            'columns': columns,
+            'assignments': assignments
+        }])[0]
+    
+    def update_many(self, entries: List[Dict[str, Any]]) -> List[bool]:
+        """
+        Incorpora varias hojas con una sola lectura y escritura del índice
+        
+        Args:
+            entries: Por hoja, 'source_key', 'file_name', 'columns' y
+                opcionalmente 'assignments' (como en update)
+                
+        Returns:
+            Por hoja, True si era nueva para el índice
+        """
+        if not entries:
+            return []
+        
+        with self._lock, self._file_lock():
+            # Lectura fresca: otro proceso pudo escribir desde la última carga
+            index = self._load(fresh=True)
+            now = datetime.now().isoformat()
+            
+            added = [
+                self._apply(index, entry['source_key'], entry['file_name'], entry['columns'],
+                            entry.get('assignments') or {}, now)
+                for entry in entries
+            ]
+            
+            self._trim_files(index)
+            index['updated'] = now
+            self._save(index)
+        
+        return added
+    
+    def _apply(self,
+               index: Dict[str, Any],
+               source_key: str,
+               file_name: str,
+               columns: List[Any],
+               assignments: Dict[Any, Dict[str, Any]],
+               now: str) -> bool:
+        headers = index['headers']
+        keys = list(dict.fromkeys(k for k in (self.normalize(col) for col in columns) if k))
+        is_new = source_key not in index['files']
+        
+        if is_new:
+            index['files'][source_key] = {'file': file_name, 'seen': now}
+            
+            counts = Counter(self.normalize(col) for col in columns)
+            for key in keys:
+                entry = headers.setdefault(key, self._new_entry())
+                entry['count'] += counts[key]
+                entry['files'] += 1
+                
+                cooccurrence = Counter(entry['cooccurrence'])
+                cooccurrence.update(other for other in keys if other != key)
+                entry['cooccurrence'] = dict(cooccurrence.most_common(self.MAX_COOCCURRENCE))
+        
+        for column, assigned in assignments.items():
+            key = self.normalize(column)
+            if not key:
+                continue
+            
+            entry = headers.setdefault(key, self._new_entry())
+            for name in ('field', 'data_type', 'content_type'):
+                if assigned.get(name):
+                    entry[f'last_{name}'] = assigned[name]
+            entry['updated'] = now
+        
+        return is_new
+    
+    def _trim_files(self, index: Dict[str, Any]) -> None:
+        """
+        Conserva solo las hojas vistas más recientemente
+        
+        Los conteos de encabezados no se descuentan; una hoja olvidada que
+        vuelva a analizarse se cuenta de nuevo.
+        """
+        files = index['files']
+        excess = len(files) - max(Config.HEADER_INDEX_MAX_FILES, 1)
+        if excess <= 0:
+            return
+        
+        oldest = sorted(files, key=lambda key: files[key].get('seen') or '')[:excess]
+        for key in oldest:
+            del files[key]
+    
+    def lookup(self, header: Any) -> Optional[Dict[str, Any]]:
+        """Entrada del índice para un encabezado (None si nunca se vio)"""
+        with self._lock:
+            entry = self._load()['headers'].get(self.normalize(header))
+            return dict(entry) if entry is not None else None
+    
+    def lookup_many(self, headers: List[Any]) -> Dict[Any, Optional[Dict[str, Any]]]:
+        """Entradas de varios encabezados con una sola carga del índice"""
+        with self._lock:
+            index_headers = self._load()['headers']
+            return {header: index_headers.get(self.normalize(header)) for header in headers}
+    
+    def summary(self, top: int = 50) -> Dict[str, Any]:
+        """Resumen del índice con los encabezados más frecuentes"""
+        with self._lock:
+            index = self._load()
+        
+        ranked = sorted(index['headers'].items(), key=lambda item: item[1]['count'], reverse=True)
+        
+        return {
+            'total_headers': len(index['headers']),
+            'total_sheets': len(index['files']),
+            'updated': index.get('updated'),
+            'top_headers': [
+                {
+                    'header': key,
+                    'count': entry['count'],
+                    'files': entry['files'],
+                    'last_field': entry.get('last_field'),
+                    'last_data_type': entry.get('last_data_type')
+                }
+                for key, entry in ranked[:top]
+            ]
+        }
+    
+    def clear(self) -> None:
+        """Vacía el índice"""
+        with self._lock, self._file_lock():
+            self._save(self._empty_index())
+    
+    def _new_entry(self) -> Dict[str, Any]:
+        return {
+            'count': 0,
+            'files': 0,
+            'cooccurrence': {},
+            'last_field': None,
+            'last_data_type': None,
+            'last_content_type': None
+        }
+    
+    def _empty_index(self) -> Dict[str, Any]:
+        return {'version': self.VERSION, 'updated': None, 'files': {}, 'headers': {}}
+    
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """Bloqueo exclusivo entre procesos sobre un archivo junto al índice"""
+        if fcntl is None:
+            yield
+            return
+        
+        with open(self.index_path.with_suffix('.lock'), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def _load(self, fresh: bool = False) -> Dict[str, Any]:
+        """
+        Carga el índice (se reutiliza la copia en memoria si no cambió)
+        
+        Con fresh se lee siempre del disco: el mtime puede no distinguir dos
+        escrituras muy seguidas de procesos distintos.
+        """
+        cls = type(self)
+        
+        try:
+            mtime = os.stat(self.index_path).st_mtime_ns
+        except FileNotFoundError:
+            return cls._remember(self.index_path, self._empty_index(), None)
+        
+        cached = cls._loaded
+        if not fresh and cached is not None and cached[0] == self.index_path and cls._loaded_mtime == mtime:
+            return cached[1]
+        
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error loading header index {self.index_path}: {e}")
+            index = self._empty_index()
+        
+        if index.get('version') != self.VERSION:
+            index = self._empty_index()
+        
+        return cls._remember(self.index_path, index, mtime)
+    
+    def _save(self, index: Dict[str, Any]) -> None:
+        """Escribe el índice de forma atómica"""
+        tmp_path = self.index_path.with_suffix('.tmp')
+        
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False)
+        
+        os.replace(tmp_path, self.index_path)
+        type(self)._remember(self.index_path, index, os.stat(self.index_path).st_mtime_ns)
+    
+    @classmethod
+    def _remember(cls, path: Path, index: Dict[str, Any], mtime: Optional[int]) -> Dict[str, Any]:
+        cls._loaded = (path, index)
+        cls._loaded_mtime = mtime
+        return index
@@ -0,0 +1,994 @@
+import pandas as pd
+import numpy as np
+import hashlib
+import json
+import os
+import threading
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from fnmatch import fnmatchcase
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional, Tuple, Union
+from xml.etree import ElementTree
+from openpyxl import load_workbook
+from pandas.io.parsers import TextParser
+from config import Config
+from app.services.csv_service import CsvService
+from app.services.columnar_cache_service import ColumnarCacheService
+
+
+class FrameCache:
+    """Caché LRU en memoria de DataFrames, limitada por tamaño en bytes"""
+    
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[Tuple, Tuple[pd.DataFrame, int]]' = OrderedDict()
+        self._current_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key: Tuple, count_miss: bool = True) -> Optional[pd.DataFrame]:
+        """Obtiene un DataFrame de la caché y lo marca como usado recientemente"""
+        with self._lock:
+            entry = self._entries.get(key)
+            
+            if entry is None:
+                if count_miss:
+                    self.misses += 1
+                return None
+            
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+    
+    def put(self, key: Tuple, df: pd.DataFrame) -> None:
+        """Guarda un DataFrame, desalojando los menos usados si no hay espacio"""
+        nbytes = _estimate_nbytes(df)
+        
+        # Un DataFrame más grande que toda la caché no se guarda
+        if nbytes > self.max_bytes:
+            return
+        
+        with self._lock:
+            if key in self._entries:
+                self._current_bytes -= self._entries.pop(key)[1]
+            
+            self._entries[key] = (df, nbytes)
+            self._current_bytes += nbytes
+            
+            while self._current_bytes > self.max_bytes and self._entries:
+                _, (_, evicted_bytes) = self._entries.popitem(last=False)
+                self._current_bytes -= evicted_bytes
+                self.evictions += 1
+    
+    def clear(self) -> None:
+        """Vacía la caché sin reiniciar los contadores"""
+        with self._lock:
+            self._entries.clear()
+            self._current_bytes = 0
+    
+    def stats(self) -> Dict[str, Any]:
+        """Devuelve estadísticas de uso de la caché"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'size_mb': round(self._current_bytes / (1024 * 1024), 2),
+                'max_size_mb': round(self.max_bytes / (1024 * 1024), 2),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / total * 100, 2) if total > 0 else 0
+            }
+
+
+def _estimate_nbytes(df: pd.DataFrame, sample_size: int = 1000) -> int:
+    """Estima la memoria de un DataFrame sin recorrer todas las cadenas"""
+    shallow = int(df.memory_usage(index=True, deep=False).sum())
+    
+    if len(df) <= sample_size:
+        return int(df.memory_usage(index=True, deep=True).sum())
+    
+    # Para columnas object se extrapola el tamaño medido en una muestra
+    object_columns = df.select_dtypes(include=['object']).columns
+    if len(object_columns) == 0:
+        return shallow
+    
+    sample = df[object_columns].head(sample_size)
+    deep_sample = sample.memory_usage(index=False, deep=True).sum()
+    shallow_sample = sample.memory_usage(index=False, deep=False).sum()
+    extra_per_row = (deep_sample - shallow_sample) / len(sample)
+    
+    return int(shallow + extra_per_row * len(df))
+
+
+def _header_names(values: Tuple[Any, ...]) -> List[Any]:
+    """Convierte una fila de encabezados en nombres de columna como lo hace pandas"""
+    values = list(values)
+    
+    # Las celdas vacías al final de la fila no forman columnas
+    while values and values[-1] is None:
+        values.pop()
+    
+    names = []
+    seen = set()
+    for i, value in enumerate(values):
+        name = f'Unnamed: {i}' if value is None or value == '' else value
+        
+        # Duplicados: 'col', 'col.1', 'col.2', ...
+        if name in seen:
+            suffix = 1
+            while f'{name}.{suffix}' in seen:
+                suffix += 1
+            name = f'{name}.{suffix}'
+        
+        seen.add(name)
+        names.append(name)
+    
+    return names
+
+
+def _read_sheet_worker(file_path: str, sheet_name: str) -> pd.DataFrame:
+    """Parsea una hoja en un proceso del pool (debe ser una función de módulo)"""
+    return pd.read_excel(file_path, sheet_name=sheet_name)
+
+
+def _read_file_worker(file_path: str, sheets: Union[None, str, List[str]]) -> Dict[Optional[str], pd.DataFrame]:
+    """
+    Lee las hojas seleccionadas de un archivo dentro de un proceso del pool
+    
+    No pasa por las cachés en memoria del proceso del pool (el proceso
+    principal guarda el resultado en la suya); la copia columnar en disco
+    sí se usa y se crea.
+    """
+    reader = ReaderService()
+    return {
+        name: reader._load_or_parse(file_path, reader._sheet_options(file_path, name))
+        for name in reader.resolve_sheets(file_path, sheets)
+    }
+
+
+def _probe_file_worker(file_path: str, sheets: Union[None, str, List[str]]) -> Dict[Optional[str], Dict[str, Any]]:
+    """Obtiene los encabezados de las hojas seleccionadas dentro de un proceso del pool (sin caché)"""
+    reader = ReaderService()
+    return {
+        name: reader._parse_probe(file_path, name, cache_frame=False)
+        for name in reader.resolve_sheets(file_path, sheets)
+    }
+
+
+def _init_pool_worker() -> None:
+    """Marca el proceso como trabajador del pool: ahí no se crean pools anidados"""
+    ReaderService._in_pool_worker = True
+
+
+def _run_file_task(worker, file_path: str, *args) -> Dict[str, Any]:
+    """Ejecuta una tarea por archivo y convierte su excepción en un resultado"""
+    try:
+        return {'file': file_path, 'result': worker(file_path, *args)}
+    except Exception as e:
+        return {'file': file_path, 'error': str(e)}
+
+
+class ReaderService:
+    """Servicio central de lectura de archivos Excel/CSV con caché por contenido"""
+    
+    # Firmas de archivo: xlsx/xlsm son ZIP, xls es un documento OLE
+    ZIP_MAGIC = b'PK\x03\x04'
+    OLE_MAGIC = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+    
+    # Extensiones ZIP que openpyxl no sabe abrir
+    NON_OPENPYXL_ZIP_EXTENSIONS = ['.xlsb', '.ods']
+    
+    SPREADSHEET_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+    
+    # Caché compartida por todas las instancias del proceso
+    _cache = FrameCache(Config.FRAME_CACHE_MAX_MB * 1024 * 1024)
+    # Memos LRU (sondeos, hashes y hojas), con Config.READER_MEMO_ENTRIES
+    # entradas cada uno, para que un servidor de larga vida no crezca sin fin
+    _probe_cache: 'OrderedDict[Tuple[str, Optional[str]], Dict[str, Any]]' = OrderedDict()
+    _hash_memo: 'OrderedDict[Tuple[str, int, int], str]' = OrderedDict()
+    _sheets_memo: 'OrderedDict[str, List[Optional[str]]]' = OrderedDict()
+    _memo_size = Config.READER_MEMO_ENTRIES
+    _hash_lock = threading.Lock()
+    
+    # Pool de procesos compartido, creado al primer uso (uno por proceso)
+    _pool: Optional[ProcessPoolExecutor] = None
+    _pool_pid: Optional[int] = None
+    _pool_lock = threading.Lock()
+    
+    # True dentro de los procesos del pool: las lecturas paralelas
+    # (read_sheets, imap_files) se hacen secuencialmente en el mismo proceso
+    _in_pool_worker = False
+    
+    def __init__(self):
+        self.csv = CsvService()
+        self.columnar = ColumnarCacheService()
+    
+    def detect_format(self, file_path: str) -> str:
+        """
+        Detecta el formato por su firma de bytes, no por la extensión
+        
+        Returns:
+            'xlsx' (legible por openpyxl), 'excel' (otros formatos de
+            pd.read_excel) o 'csv' (texto delimitado)
+        """
+        with open(file_path, 'rb') as f:
+            head = f.read(8)
+        
+        if head.startswith(self.ZIP_MAGIC):
+            if Path(file_path).suffix.lower() in self.NON_OPENPYXL_ZIP_EXTENSIONS:
+                return 'excel'
+            return 'xlsx'
+        
+        if head.startswith(self.OLE_MAGIC):
+            return 'excel'
+        
+        return 'csv'
+    
+    def read(self, file_path: str, **options) -> pd.DataFrame:
+        """
+        Lee un archivo Excel o CSV reutilizando el resultado si ya fue parseado
+        
+        Args:
+            file_path: Ruta al archivo Excel o CSV
+            **options: Opciones de lectura pasadas a pd.read_excel, o a
+                CsvService.read para CSV (por ejemplo dtype)
+                
+        Returns:
+            DataFrame con los datos. Es una copia superficial del que está
+            en caché: se pueden agregar o renombrar columnas sin afectarla,
+            pero no se deben modificar los valores en sitio.
+        """
+        if 'sheet_name' in options:
+            options.update(self._sheet_options(file_path, options.pop('sheet_name')))
+        
+        key = self._cache_key(file_path, options)
+        df = self._cache.get(key)
+        
+        if df is None:
+            df = self._load_or_parse(file_path, options)
+            # En los procesos del pool la caché no se reutiliza: solo ocuparía memoria
+            if not self._in_pool_worker:
+                self._cache.put(key, df)
+        
+        return df.copy(deep=False)
+    
+    def _load_or_parse(self, file_path: str, options: Dict[str, Any]) -> pd.DataFrame:
+        """Carga la copia columnar en disco o, si no existe, parsea y la crea"""
+        use_columnar = self._use_columnar(options)
+        
+        if use_columnar:
+            df = self.columnar.load(self.file_hash(file_path), options.get('sheet_name'))
+            if df is not None:
+                return df
+        
+        if self.detect_format(file_path) == 'csv':
+            if 'sheet_name' in options:
+                raise ValueError("Los archivos CSV no tienen hojas")
+            df = self.csv.read(file_path, **options)
+        else:
+            df = pd.read_excel(file_path, **options)
+        
+        if use_columnar:
+            self._save_columnar(file_path, df, options.get('sheet_name'))
+        
+        return df
+    
+    def _use_columnar(self, options: Dict[str, Any]) -> bool:
+        """La copia columnar solo representa lecturas sin opciones extra"""
+        return Config.COLUMNAR_CACHE_ENABLED and set(options) <= {'sheet_name'}
+    
+    def _save_columnar(self, file_path: str, df: pd.DataFrame, sheet_name: Optional[str]) -> None:
+        """Guarda la copia columnar; un fallo aquí no debe romper la lectura"""
+        try:
+            self.columnar.save(self.file_hash(file_path), df, sheet_name)
+        except Exception as e:
+            print(f"Error saving columnar cache for {file_path}: {e}")
+    
+    def list_sheets(self, file_path: str) -> List[Optional[str]]:
+        """
+        Lista las hojas de un libro
+        
+        Returns:
+            Nombres de las hojas en orden. Para CSV devuelve [None], que
+            representa su única hoja implícita.
+        """
+        content_hash = self.file_hash(file_path)
+        
+        with self._hash_lock:
+            names = self._memo_get(self._sheets_memo, content_hash)
+        if names is not None:
+            return list(names)
+        
+        file_format = self.detect_format(file_path)
+        
+        if file_format == 'csv':
+            names = [None]
+        elif file_format == 'xlsx':
+            # workbook.xml basta para los nombres; evita cargar el libro
+            with zipfile.ZipFile(file_path) as archive:
+                root = ElementTree.fromstring(archive.read('xl/workbook.xml'))
+            names = [sheet.get('name') for sheet in root.iter(f'{{{self.SPREADSHEET_NS}}}sheet')]
+        else:
+            with pd.ExcelFile(file_path) as excel_file:
+                names = list(excel_file.sheet_names)
+        
+        with self._hash_lock:
+            self._memo_put(self._sheets_memo, content_hash, names)
+        
+        return list(names)
+    
+    def resolve_sheets(self, 
+                       file_path: str, 
+                       sheets: Union[None, str, List[str]] = None) -> List[Optional[str]]:
+        """
+        Resuelve una selección de hojas a la lista de nombres concretos
+        
+        Args:
+            file_path: Ruta al archivo
+            sheets: None (primera hoja), 'all' / '*' (todas), un nombre,
+                un patrón tipo glob ('Region_*') o una lista de nombres
+                
+        Returns:
+            Lista de nombres de hoja en el orden del libro
+        """
+        available = self.list_sheets(file_path)
+        
+        if available == [None] or sheets is None:
+            return available[:1]
+        
+        if isinstance(sheets, str):
+            if sheets.lower() in ('all', '*'):
+                return available
+            
+            if sheets in available:
+                return [sheets]
+            
+            selected = [name for name in available if fnmatchcase(name, sheets)]
+            if not selected:
+                raise ValueError(f"Ninguna hoja coincide con '{sheets}' en {Path(file_path).name}")
+            return selected
+        
+        missing = [name for name in sheets if name not in available]
+        if missing:
+            raise ValueError(f"Hojas no encontradas en {Path(file_path).name}: {missing}")
+        
+        return [name for name in available if name in sheets]
+    
+    @staticmethod
+    def parse_sheet_selection(value: Optional[str]) -> Union[None, str, List[str]]:
+        """Interpreta el parámetro 'sheets' de un formulario (texto o lista JSON)"""
+        if value is None or value.strip() == '':
+            return None
+        
+        value = value.strip()
+        if value.startswith('['):
+            return json.loads(value)
+        
+        return value
+    
+    def read_sheets(self, 
+                    file_path: str, 
+                    sheet_names: List[Optional[str]]) -> Dict[Optional[str], pd.DataFrame]:
+        """
+        Lee varias hojas de un libro, parseando en paralelo las que no están en caché
+        
+        Cada hoja se parsea en un proceso del pool, de modo que el tiempo
+        total se acerca al de la hoja más grande y no a la suma de todas.
+        Dentro de un proceso del pool (por ejemplo al comparar un archivo en
+        compare_many) las hojas se leen una tras otra.
+        
+        Args:
+            file_path: Ruta al archivo
+            sheet_names: Hojas a leer (por ejemplo el resultado de resolve_sheets)
+            
+        Returns:
+            Diccionario hoja -> DataFrame, en el mismo orden que sheet_names
+        """
+        frames = {}
+        pending = []
+        
+        for name in sheet_names:
+            options = self._sheet_options(file_path, name)
+            key = self._cache_key(file_path, options)
+            cached = self._cache.get(key)
+            
+            if cached is None and self._use_columnar(options):
+                cached = self.columnar.load(self.file_hash(file_path), options.get('sheet_name'))
+                if cached is not None:
+                    self._cache.put(key, cached)
+            
+            if cached is not None:
+                frames[name] = cached.copy(deep=False)
+            else:
+                pending.append(name)
+        
+        if len(pending) > 1 and not self._in_pool_worker:
+            try:
+                futures = {
+                    name: self._get_pool().submit(_read_sheet_worker, file_path, name)
+                    for name in pending
+                }
+                
+                for name, future in futures.items():
+                    df = future.result()
+                    options = self._sheet_options(file_path, name)
+                    self._cache.put(self._cache_key(file_path, options), df)
+                    if self._use_columnar(options):
+                        self._save_columnar(file_path, df, options.get('sheet_name'))
+                    frames[name] = df.copy(deep=False)
+                
+                pending = []
+            except BrokenProcessPool:
+                # Si el pool se rompe se descarta y se sigue en este proceso
+                self._reset_pool()
+                pending = [name for name in pending if name not in frames]
+        
+        for name in pending:
+            frames[name] = self.read(file_path, sheet_name=name)
+        
+        return {name: frames[name] for name in sheet_names}
+    
+    def read_many(self, 
+                  file_paths: List[str], 
+                  sheets: Union[None, str, List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Lee varios archivos en paralelo en el pool de procesos
+        
+        Los archivos que ya están en caché (memoria o copia columnar) se
+        resuelven en este proceso sin pasar por el pool.
+        
+        Args:
+            file_paths: Rutas a los archivos
+            sheets: Selección de hojas aplicada a cada archivo
+            
+        Returns:
+            Lista en el mismo orden que file_paths. Cada elemento tiene
+            'file' y, según el caso, 'frames' (hoja -> DataFrame) o 'error'.
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(file_paths)
+        to_parse = []
+        
+        for i, file_path in enumerate(file_paths):
+            try:
+                frames = self._cached_frames(file_path, sheets)
+            except Exception as e:
+                results[i] = {'file': file_path, 'error': str(e)}
+                continue
+            
+            if frames is not None:
+                results[i] = {'file': file_path, 'frames': frames}
+            else:
+                to_parse.append(i)
+        
+        parsed = self._map_files([file_paths[i] for i in to_parse], _read_file_worker, sheets)
+        
+        for i, outcome in zip(to_parse, parsed):
+            if 'error' in outcome:
+                results[i] = outcome
+                continue
+            
+            for name, df in outcome['result'].items():
+                self._cache.put(self._cache_key(outcome['file'], self._sheet_options(outcome['file'], name)), df)
+            
+            results[i] = {
+                'file': outcome['file'],
+                'frames': {name: df.copy(deep=False) for name, df in outcome['result'].items()}
+            }
+        
+        return results
+    
+    def probe_many(self, 
+                   file_paths: List[str], 
+                   sheets: Union[None, str, List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Obtiene los encabezados de varios archivos en paralelo
+        
+        Returns:
+            Lista en el mismo orden que file_paths con 'file' y 'probes'
+            (hoja -> {'columns', 'rows'}) o 'error'
+        """
+        results = []
+        
+        for outcome in self._map_files(file_paths, _probe_file_worker, sheets):
+            if 'error' in outcome:
+                results.append(outcome)
+                continue
+            
+            for name, probe in outcome['result'].items():
+                probe_key = (self.file_hash(outcome['file']), self._sheet_options(outcome['file'], name).get('sheet_name'))
+                with self._hash_lock:
+                    self._memo_put(self._probe_cache, probe_key, probe)
+            
+            results.append({'file': outcome['file'], 'probes': outcome['result']})
+        
+        return results
+    
+    def _cached_frames(self, 
+                       file_path: str, 
+                       sheets: Union[None, str, List[str]]) -> Optional[Dict[Optional[str], pd.DataFrame]]:
+        """Devuelve las hojas pedidas si todas están en caché, o None"""
+        frames = {}
+        
+        for name in self.resolve_sheets(file_path, sheets):
+            options = self._sheet_options(file_path, name)
+            key = self._cache_key(file_path, options)
+            df = self._cache.get(key, count_miss=False)
+            
+            if df is None and self._use_columnar(options):
+                df = self.columnar.load(self.file_hash(file_path), options.get('sheet_name'))
+                if df is not None:
+                    self._cache.put(key, df)
+            
+            if df is None:
+                return None
+            
+            frames[name] = df.copy(deep=False)
+        
+        return frames
+    
+    def _map_files(self, file_paths: List[str], worker, *args) -> List[Dict[str, Any]]:
+        """
+        Ejecuta worker(file_path, *args) por archivo en el pool de procesos
+        
+        Igual que imap_files, pero devuelve los resultados en el orden de
+        entrada.
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(file_paths)
+        
+        for i, outcome in self.imap_files(file_paths, worker, *args):
+            results[i] = outcome
+        
+        return results
+    
+    def imap_files(self, file_paths: List[str], worker, *args) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """
+        Ejecuta worker(file_path, *args) por archivo en el pool de procesos
+        y entrega cada resultado apenas termina
+        
+        Limita la cantidad de bytes de archivo en proceso a la vez
+        (Config.READER_MAX_INFLIGHT_MB) y convierte los fallos de cada
+        archivo en un resultado con 'error'. worker debe ser una función de
+        módulo para poder enviarse al pool.
+        
+        Yields:
+            (posición en file_paths, {'file', 'result'} o {'file', 'error'})
+        """
+        if len(file_paths) <= 1 or Config.READER_MAX_WORKERS <= 1 or self._in_pool_worker:
+            for i, file_path in enumerate(file_paths):
+                yield i, _run_file_task(worker, file_path, *args)
+            return
+        
+        sizes = [os.path.getsize(p) if os.path.exists(p) else 0 for p in file_paths]
+        max_inflight = Config.READER_MAX_INFLIGHT_MB * 1024 * 1024
+        max_pending = Config.READER_MAX_WORKERS * 2
+        
+        finished = set()
+        pending = {}
+        inflight = 0
+        next_index = 0
+        
+        try:
+            pool = self._get_pool()
+            
+            while next_index < len(file_paths) or pending:
+                # Siempre se admite al menos un archivo, aunque supere el límite
+                while next_index < len(file_paths) and len(pending) < max_pending and (
+                        not pending or inflight + sizes[next_index] <= max_inflight):
+                    future = pool.submit(_run_file_task, worker, file_paths[next_index], *args)
+                    pending[future] = next_index
+                    inflight += sizes[next_index]
+                    next_index += 1
+                
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                
+                for future in done:
+                    i = pending.pop(future)
+                    inflight -= sizes[i]
+                    outcome = future.result()
+                    finished.add(i)
+                    yield i, outcome
+        
+        except BrokenProcessPool:
+            # Si el pool se rompe se descarta y lo que falte se procesa aquí
+            self._reset_pool()
+        
+        finally:
+            # Si quien consume deja de iterar, no se procesan los pendientes
+            for future in pending:
+                future.cancel()
+        
+        for i, file_path in enumerate(file_paths):
+            if i not in finished:
+                yield i, _run_file_task(worker, file_path, *args)
+    
+    def _sheet_options(self, file_path: str, sheet_name: Any) -> Dict[str, Any]:
+        """
+        Opciones de lectura para una hoja
+        
+        La primera hoja se lee sin sheet_name para que 'sin indicar hoja',
+        None, 0 y su nombre compartan la misma entrada de caché.
+        """
+        if sheet_name in (None, 0):
+            return {}
+        
+        if isinstance(sheet_name, str) and self.list_sheets(file_path)[:1] == [sheet_name]:
+            return {}
+        
+        return {'sheet_name': sheet_name}
+    
+    @classmethod
+    def _get_pool(cls) -> ProcessPoolExecutor:
+        """Devuelve el pool de procesos compartido"""
+        with cls._pool_lock:
+            # Un proceso hijo hereda la referencia al pool del padre, pero no puede usarlo
+            if cls._pool is None or cls._pool_pid != os.getpid():
+                cls._pool = ProcessPoolExecutor(max_workers=max(Config.READER_MAX_WORKERS, 1),
+                                                initializer=_init_pool_worker)
+                cls._pool_pid = os.getpid()
+            return cls._pool
+    
+    @classmethod
+    def _reset_pool(cls) -> None:
+        """Descarta el pool de procesos para que se cree uno nuevo"""
+        with cls._pool_lock:
+            if cls._pool is not None and cls._pool_pid == os.getpid():
+                cls._pool.shutdown(wait=False, cancel_futures=True)
+            cls._pool = None
+    
+    def iter_chunks(self, 
+                    file_path: str, 
+                    chunk_size: Optional[int] = None,
+                    sheet_name: Optional[str] = None) -> Iterator[pd.DataFrame]:
+        """
+        Recorre un archivo en bloques de filas con memoria acotada
+        
+        Los .xlsx/.xlsm se leen con openpyxl en modo solo lectura y los CSV
+        con el lector por bloques de pandas, de modo que nunca se mantiene
+        en memoria más de un bloque de filas. Si el archivo ya está en la
+        caché se reparte el DataFrame existente, y si tiene copia columnar
+        en disco se lee de ella.
+        
+        Args:
+            file_path: Ruta al archivo
+            chunk_size: Filas por bloque (por defecto Config.READ_CHUNK_ROWS)
+            sheet_name: Hoja a leer (por defecto la primera)
+            
+        Cada bloque se infiere por separado, así que los tipos se mantienen
+        entre bloques con _stabilize_dtypes: una columna entera con vacíos
+        es Int64 (nullable) en todos los bloques desde el primero que los
+        tiene, en lugar de alternar entre int64 y float64.
+        
+        Yields:
+            DataFrames con las mismas columnas que daría pd.read_excel. Siempre
+            se produce al menos un bloque, aunque esté vacío.
+        """
+        chunk_size = chunk_size or Config.READ_CHUNK_ROWS
+        yield from self._stabilize_dtypes(self._iter_raw_chunks(file_path, chunk_size, sheet_name))
+    
+    def _iter_raw_chunks(self, file_path: str, chunk_size: int, sheet_name: Optional[str]) -> Iterator[pd.DataFrame]:
+        """Bloques tal como salen de cada fuente (caché, columnar, openpyxl, CSV)"""
+        file_format = self.detect_format(file_path)
+        
+        options = self._sheet_options(file_path, sheet_name)
+        
+        # Consulta sin contar fallo: leer por bloques no llena la caché
+        cached = self._cache.get(self._cache_key(file_path, options), count_miss=False)
+        columnar_chunks = None
+        if cached is None and Config.COLUMNAR_CACHE_ENABLED:
+            columnar_chunks = self.columnar.iter_chunks(
+                self.file_hash(file_path), chunk_size, options.get('sheet_name')
+            )
+        
+        if cached is not None:
+            yield from self._slice_frame(cached, chunk_size)
+        elif columnar_chunks is not None:
+            yield from columnar_chunks
+        elif file_format == 'xlsx':
+            yield from self._iter_openpyxl(file_path, chunk_size, sheet_name)
+        elif file_format == 'csv':
+            yield from self.csv.iter_chunks(file_path, chunk_size)
+        else:
+            yield from self._slice_frame(self.read(file_path, **options), chunk_size)
+    
+    def _stabilize_dtypes(self, chunks: Iterator[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+        """
+        Mantiene el tipo de cada columna numérica entre bloques
+        
+        pandas lee como float64 una columna entera solo porque el bloque
+        tiene vacíos, y como int64 la misma columna en un bloque sin ellos;
+        exportados, el mismo dato sale como 20 en un bloque y 20.0 en otro.
+        Por posición de columna se lleva un plan:
+        
+        - 'int': hasta ahora enteros sin vacíos (int64, sin cambios).
+        - 'nullable': enteros con vacíos vistos; float64 entero e int64 se
+          convierten a Int64 desde ese bloque en adelante.
+        - 'float': apareció un decimal real; los int64 siguientes pasan a
+          float64.
+        """
+        plan: Dict[int, str] = {}
+        
+        for chunk in chunks:
+            changes = {}
+            
+            for i in range(chunk.shape[1]):
+                series = chunk.iloc[:, i]
+                state = plan.get(i)
+                
+                if isinstance(series.dtype, np.dtype) and series.dtype.kind == 'f':
+                    if state == 'float':
+                        continue
+                    
+                    values = series.to_numpy()
+                    missing = np.isnan(values)
+                    present = values[~missing]
+                    
+                    if not missing.any():
+                        plan[i] = 'float'
+                    elif not len(present):
+                        # Bloque sin valores: solo se ajusta si ya se sabe que es entera
+                        if state in ('int', 'nullable'):
+                            changes[i], plan[i] = 'Int64', 'nullable'
+                    elif (np.isfinite(present).all() and (present == np.floor(present)).all()
+                          and np.abs(present).max() < 2 ** 53):
+                        changes[i], plan[i] = 'Int64', 'nullable'
+                    else:
+                        plan[i] = 'float'
+                
+                elif isinstance(series.dtype, np.dtype) and series.dtype.kind in 'iu':
+                    if state == 'nullable':
+                        changes[i] = 'Int64'
+                    elif state == 'float':
+                        changes[i] = 'float64'
+                    else:
+                        plan[i] = 'int'
+            
+            if changes:
+                chunk = chunk.copy(deep=False)
+                for i, dtype in changes.items():
+                    chunk.isetitem(i, chunk.iloc[:, i].astype(dtype))
+            
+            yield chunk
+    
+    def _slice_frame(self, df: pd.DataFrame, chunk_size: int) -> Iterator[pd.DataFrame]:
+        """Reparte un DataFrame ya cargado en bloques"""
+        if len(df) == 0:
+            yield df.copy(deep=False)
+            return
+        
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start:start + chunk_size].reset_index(drop=True)
+    
+    def _iter_openpyxl(self, 
+                       file_path: str, 
+                       chunk_size: int, 
+                       sheet_name: Optional[str] = None) -> Iterator[pd.DataFrame]:
+        """Lee una hoja con iter_rows sin cargar el libro completo"""
+        with self._open_workbook(file_path) as wb:
+            ws = wb[sheet_name] if sheet_name is not None else wb.worksheets[0]
+            rows_iter = ws.iter_rows(values_only=True)
+            columns = _header_names(next(rows_iter, ()))
+            width = len(columns)
+            
+            buffer = []
+            pending_empty = 0
+            emitted = False
+            
+            for row in rows_iter:
+                row = tuple(row[:width]) + (None,) * (width - len(row))
+                
+                # Las filas vacías solo se conservan si luego hay datos
+                # (pandas descarta las filas vacías del final)
+                if all(value is None for value in row):
+                    pending_empty += 1
+                    continue
+                
+                if pending_empty:
+                    buffer.extend([(None,) * width] * pending_empty)
+                    pending_empty = 0
+                
+                buffer.append(row)
+                
+                while len(buffer) >= chunk_size:
+                    yield self._rows_to_frame(buffer[:chunk_size], columns)
+                    buffer = buffer[chunk_size:]
+                    emitted = True
+            
+            if buffer or not emitted:
+                yield self._rows_to_frame(buffer, columns)
+    
+    def _rows_to_frame(self, rows: List[Tuple], columns: List[Any]) -> pd.DataFrame:
+        """Convierte filas crudas en DataFrame con la misma inferencia que read_excel"""
+        if not rows:
+            return pd.DataFrame(columns=columns)
+        
+        # TextParser es el mismo parser que usa pd.read_excel sobre las celdas
+        return TextParser([list(row) for row in rows], names=columns, header=None).read()
+    
+    def sample_rows(self, 
+                    file_path: str, 
+                    n: Optional[int] = None,
+                    sheet_name: Optional[str] = None,
+                    seed: int = 0) -> pd.DataFrame:
+        """
+        Obtiene una muestra acotada de filas sin leer la hoja completa
+        
+        - En caché (memoria o columnar): filas al azar, tomadas por posición.
+        - CSV: filas al azar leyendo alrededor de desplazamientos aleatorios.
+        - .xlsx/.xlsm: las primeras n filas en streaming (el XML de la hoja
+          solo se puede recorrer en orden, así que una muestra al azar
+          obligaría a leerla entera).
+        - Otros formatos: lectura completa (cacheada) y muestra al azar.
+        
+        Args:
+            file_path: Ruta al archivo
+            n: Filas de la muestra (por defecto Config.SAMPLE_ROWS)
+            sheet_name: Hoja (por defecto la primera)
+            seed: Semilla para que la muestra sea reproducible
+            
+        Returns:
+            DataFrame con las columnas de la hoja y como máximo n filas
+        """
+        n = n or Config.SAMPLE_ROWS
+        file_format = self.detect_format(file_path)
+        options = self._sheet_options(file_path, sheet_name)
+        
+        cached = self._cache.get(self._cache_key(file_path, options), count_miss=False)
+        if cached is not None:
+            return self._sample_frame(cached, n, seed)
+        
+        if Config.COLUMNAR_CACHE_ENABLED:
+            content_hash = self.file_hash(file_path)
+            total = self.columnar.rows(content_hash, options.get('sheet_name'))
+            if total is not None:
+                rng = np.random.default_rng(seed)
+                rows = np.sort(rng.choice(total, size=min(n, total), replace=False))
+                return self.columnar.take(content_hash, rows, options.get('sheet_name'))
+        
+        if file_format == 'csv':
+            return self.csv.sample(file_path, n, seed)
+        
+        if file_format == 'xlsx':
+            return next(self._iter_openpyxl(file_path, n, sheet_name))
+        
+        return self._sample_frame(self.read(file_path, **options), n, seed)
+    
+    def _sample_frame(self, df: pd.DataFrame, n: int, seed: int) -> pd.DataFrame:
+        if len(df) <= n:
+            return df.copy(deep=False)
+        return df.sample(n, random_state=seed).sort_index().reset_index(drop=True)
+    
+    def probe_headers(self, file_path: str, sheet_name: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Obtiene encabezados y número de filas sin materializar los datos
+        
+        Abre el libro en modo solo lectura, toma únicamente la primera fila
+        de la hoja y usa la dimensión declarada de la hoja para calcular el
+        número de filas.
+        
+        Args:
+            file_path: Ruta al archivo Excel
+            sheet_name: Hoja a inspeccionar (por defecto la primera)
+            
+        Returns:
+            Diccionario con 'columns' (mismos nombres que daría pd.read_excel)
+            y 'rows' (filas de datos, sin contar el encabezado)
+        """
+        probe_key = (self.file_hash(file_path), self._sheet_options(file_path, sheet_name).get('sheet_name'))
+        
+        with self._hash_lock:
+            probe = self._memo_get(self._probe_cache, probe_key)
+        if probe is not None:
+            return {'columns': list(probe['columns']), 'rows': probe['rows']}
+        
+        probe = self._parse_probe(file_path, sheet_name)
+        
+        with self._hash_lock:
+            self._memo_put(self._probe_cache, probe_key, probe)
+        
+        return {'columns': list(probe['columns']), 'rows': probe['rows']}
+    
+    def _parse_probe(self, file_path: str, sheet_name: Optional[str] = None, cache_frame: bool = True) -> Dict[str, Any]:
+        """
+        Encabezados y filas sin consultar la caché de sondeos
+        
+        Con cache_frame=False los formatos que requieren la lectura completa
+        no guardan el DataFrame en la caché del proceso (p. ej. en el pool).
+        """
+        file_format = self.detect_format(file_path)
+        
+        if file_format == 'xlsx':
+            return self._probe_openpyxl(file_path, sheet_name)
+        if file_format == 'csv':
+            return self.csv.probe(file_path)
+        
+        # Formatos sin lectura en streaming: se usa la lectura completa
+        if cache_frame:
+            df = self.read(file_path, sheet_name=sheet_name)
+        else:
+            df = self._load_or_parse(file_path, self._sheet_options(file_path, sheet_name))
+        return {'columns': df.columns.tolist(), 'rows': len(df)}
+    
+    def _probe_openpyxl(self, file_path: str, sheet_name: Optional[str] = None) -> Dict[str, Any]:
+        """Lee encabezados y dimensión con openpyxl en modo solo lectura"""
+        with self._open_workbook(file_path) as wb:
+            ws = wb[sheet_name] if sheet_name is not None else wb.worksheets[0]
+            header = next(ws.iter_rows(min_row=1, max_row=1, values_only=True), ())
+            
+            max_row = ws.max_row
+            if max_row is None:
+                # La hoja no declara su dimensión: se cuentan las filas
+                ws.reset_dimensions()
+                max_row = sum(1 for _ in ws.iter_rows(values_only=True))
+            
+            return {
+                'columns': _header_names(header),
+                'rows': max(max_row - 1, 0)
+            }
+    
+    @contextmanager
+    def _open_workbook(self, file_path: str):
+        """Abre un libro en modo solo lectura sin depender de la extensión"""
+        # openpyxl rechaza rutas con extensiones desconocidas, no así archivos abiertos
+        with open(file_path, 'rb') as f:
+            wb = load_workbook(f, read_only=True, data_only=True)
+            
+            try:
+                yield wb
+            finally:
+                wb.close()
+    
+    def file_hash(self, file_path: str) -> str:
+        """Calcula (y memoriza) el hash SHA-256 del contenido de un archivo"""
+        stat = os.stat(file_path)
+        memo_key = (str(Path(file_path).resolve()), stat.st_size, stat.st_mtime_ns)
+        
+        with self._hash_lock:
+            cached = self._memo_get(self._hash_memo, memo_key)
+        if cached is not None:
+            return cached
+        
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        
+        content_hash = digest.hexdigest()
+        
+        with self._hash_lock:
+            self._memo_put(self._hash_memo, memo_key, content_hash)
+        
+        return content_hash
+    
+    @staticmethod
+    def _memo_get(memo: OrderedDict, key: Any) -> Any:
+        """Consulta un memo LRU (con _hash_lock tomado)"""
+        value = memo.get(key)
+        if value is not None:
+            memo.move_to_end(key)
+        return value
+    
+    def _memo_put(self, memo: OrderedDict, key: Any, value: Any) -> None:
+        """Guarda en un memo LRU (con _hash_lock tomado) y descarta lo más antiguo"""
+        memo[key] = value
+        memo.move_to_end(key)
+        while len(memo) > self._memo_size:
+            memo.popitem(last=False)
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Estadísticas de la caché compartida"""
+        return self._cache.stats()
+    
+    def clear_cache(self) -> None:
+        """Vacía la caché compartida"""
+        self._cache.clear()
+    
+    def _cache_key(self, file_path: str, options: Dict[str, Any]) -> Tuple:
+        """Clave de caché: hash del contenido + opciones de lectura"""
+        return (self.file_hash(file_path), repr(sorted(options.items())))
@@ -0,0 +1,444 @@
+import hashlib
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional
+from config import Config
+
+
+class ReportStoreService:
+    """
+    Almacén consultable de reportes de comparación (SQLite en modo WAL)
+    
+    Cada comparación de un archivo es una fila de 'reports' con las columnas
+    por las que se filtra (archivo, modelo, fecha, estado, similitud) y el
+    reporte completo en JSON compacto. Una comparación masiva guarda una
+    fila de resumen (kind = 'bulk') y una fila por archivo que apunta a
+    ella. Las columnas faltantes van en una tabla aparte para poder
+    consultar qué columnas faltan más.
+    
+    Los filtros usan índices sobre (archivo, fecha), (modelo, fecha),
+    (estado, fecha) y fecha, de modo que las consultas de historial no
+    recorren la tabla completa.
+    """
+    
+    SCHEMA = [
+        '''CREATE TABLE IF NOT EXISTS reports (
+            id INTEGER PRIMARY KEY,
+            report_name TEXT NOT NULL UNIQUE,
+            kind TEXT NOT NULL,
+            parent_id INTEGER REFERENCES reports(id) ON DELETE CASCADE,
+            position INTEGER,
+            file TEXT,
+            model TEXT,
+            timestamp TEXT NOT NULL,
+            status TEXT,
+            similarity REAL,
+            total_rows INTEGER,
+            missing_count INTEGER,
+            payload TEXT NOT NULL
+        )''',
+        '''CREATE TABLE IF NOT EXISTS report_missing_columns (
+            report_id INTEGER NOT NULL REFERENCES reports(id) ON DELETE CASCADE,
+            column_name TEXT NOT NULL
+        )''',
+        'CREATE INDEX IF NOT EXISTS idx_reports_timestamp ON reports (timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_reports_file ON reports (file, timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_reports_model ON reports (model, timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_reports_status ON reports (status, timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_reports_parent ON reports (parent_id, position)',
+        'CREATE INDEX IF NOT EXISTS idx_missing_column ON report_missing_columns (column_name, report_id)',
+        'CREATE INDEX IF NOT EXISTS idx_missing_report ON report_missing_columns (report_id)'
+    ]
+    
+    # Columnas que devuelven las consultas (sin el reporte completo)
+    SUMMARY_COLUMNS = ['id', 'report_name', 'kind', 'parent_id', 'file', 'model',
+                       'timestamp', 'status', 'similarity', 'total_rows', 'missing_count']
+    
+    # Agrupación de las tendencias -> expresión SQL sobre timestamp
+    INTERVALS = {
+        'day': 'substr(timestamp, 1, 10)',
+        'week': "strftime('%Y-W%W', substr(timestamp, 1, 19))",
+        'month': 'substr(timestamp, 1, 7)',
+        'year': 'substr(timestamp, 1, 4)'
+    }
+    
+    MAX_PAGE_SIZE = 1000
+    
+    # Rutas cuyo esquema ya se creó en este proceso
+    _initialized = set()
+    _init_lock = threading.Lock()
+    
+    def __init__(self, db_path: Optional[Path] = None):
+        self.db_path = Path(db_path) if db_path is not None else Config.REPORTS_DB_FILE
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+    
+    @staticmethod
+    def model_key(model_columns: List[Any]) -> str:
+        """Identificador de un modelo: hash de sus columnas normalizadas"""
+        normalized = sorted({str(col).strip().lower() for col in model_columns})
+        digest = hashlib.sha1('\n'.join(normalized).encode('utf-8')).hexdigest()
+        return f'cols:{digest[:12]}'
+    
+    def save(self, report_name: str, comparison: Dict[str, Any], model: Optional[str] = None) -> int:
+        """
+        Guarda el reporte de la comparación de un archivo
+        
+        Returns:
+            id del reporte
+        """
+        with self._connect() as conn:
+            return self._insert_comparison(conn, report_name, comparison, model)
+    
+    def save_bulk(self,
+                  report_name: str,
+                  summary: Dict[str, Any],
+                  results: List[Dict[str, Any]],
+                  model: Optional[str] = None) -> int:
+        """
+        Guarda el resumen de una comparación masiva y el resultado de cada
+        archivo en una sola transacción
+        
+        Returns:
+            id del resumen
+        """
+        with self._connect() as conn:
+            return self._insert_bulk(conn, report_name, summary, results, model)
+    
+    def get(self, report_name: str) -> Optional[Dict[str, Any]]:
+        """
+        Reporte completo por nombre (None si no existe)
+        
+        Para una comparación masiva se reconstruye 'results' a partir de las
+        filas de cada archivo, en su orden original.
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT id, kind, payload FROM reports WHERE report_name = ?', (report_name,)
+            ).fetchone()
+            
+            if row is None:
+                return None
+            
+            report = json.loads(row['payload'])
+            
+            if row['kind'] == 'bulk':
+                children = conn.execute(
+                    'SELECT payload FROM reports WHERE parent_id = ? ORDER BY position', (row['id'],)
+                )
+                report['results'] = [json.loads(child['payload']) for child in children]
+            
+            return report
+    
+    def query(self,
+              file: Optional[str] = None,
+              model: Optional[str] = None,
+              status: Optional[str] = None,
+              since: Optional[str] = None,
+              until: Optional[str] = None,
+              min_similarity: Optional[float] = None,
+              max_similarity: Optional[float] = None,
+              missing_column: Optional[str] = None,
+              kind: Optional[str] = 'file',
+              limit: int = 50,
+              offset: int = 0,
+              ascending: bool = False) -> Dict[str, Any]:
+        """
+        Busca reportes con filtros y paginación
+        
+        Args:
+            file: Nombre de archivo exacto, o patrón con * y ?
+            model: Identificador del modelo (ver model_key)
+            status: 'completo', 'incompleto' o 'error'
+            since, until: Rango de fechas ISO (until es exclusivo)
+            min_similarity, max_similarity: Rango de similitud (%)
+            missing_column: Solo reportes a los que les falta esa columna
+            kind: 'file' (comparación de un archivo), 'bulk' (resúmenes)
+                o None (ambos)
+            limit, offset: Paginación
+            ascending: Orden por fecha ascendente (por defecto, los más
+                recientes primero)
+                
+        Returns:
+            Diccionario con 'total', 'limit', 'offset' e 'items' (sin el
+            reporte completo; se obtiene con get)
+        """
+        where, params = self._filters(file, model, status, since, until, kind)
+        
+        if min_similarity is not None:
+            where.append('similarity >= ?')
+            params.append(min_similarity)
+        if max_similarity is not None:
+            where.append('similarity <= ?')
+            params.append(max_similarity)
+        if missing_column is not None:
+            where.append('id IN (SELECT report_id FROM report_missing_columns WHERE column_name = ?)')
+            params.append(str(missing_column).strip().lower())
+        
+        clause = f"WHERE {' AND '.join(where)}" if where else ''
+        limit = max(1, min(int(limit), self.MAX_PAGE_SIZE))
+        offset = max(0, int(offset))
+        order = 'ASC' if ascending else 'DESC'
+        
+        with self._connect() as conn:
+            total = conn.execute(f'SELECT COUNT(*) FROM reports {clause}', params).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT {', '.join(self.SUMMARY_COLUMNS)} FROM reports {clause} "
+                f'ORDER BY timestamp {order}, id {order} LIMIT ? OFFSET ?',
+                params + [limit, offset]
+            ).fetchall()
+        
+        return {
+            'total': total,
+            'limit': limit,
+            'offset': offset,
+            'items': [dict(row) for row in rows]
+        }
+    
+    def trends(self,
+               model: Optional[str] = None,
+               file: Optional[str] = None,
+               since: Optional[str] = None,
+               until: Optional[str] = None,
+               interval: str = 'day') -> List[Dict[str, Any]]:
+        """
+        Agregados por período: cantidad de comparaciones, similitud media y
+        conteo por estado
+        """
+        if interval not in self.INTERVALS:
+            raise ValueError(f"Intervalo inválido: {interval}")
+        
+        where, params = self._filters(file, model, None, since, until, 'file')
+        clause = f"WHERE {' AND '.join(where)}" if where else ''
+        period = self.INTERVALS[interval]
+        
+        with self._connect() as conn:
+            rows = conn.execute(
+                f'''SELECT {period} AS period,
+                           COUNT(*) AS total,
+                           ROUND(AVG(similarity), 2) AS average_similarity,
+                           MIN(similarity) AS min_similarity,
+                           MAX(similarity) AS max_similarity,
+                           SUM(status = 'completo') AS completo,
+                           SUM(status = 'incompleto') AS incompleto,
+                           SUM(status = 'error') AS error
+                    FROM reports {clause}
+                    GROUP BY period ORDER BY period''',
+                params
+            ).fetchall()
+        
+        return [dict(row) for row in rows]
+    
+    def missing_columns(self,
+                        model: Optional[str] = None,
+                        since: Optional[str] = None,
+                        until: Optional[str] = None,
+                        limit: int = 50) -> List[Dict[str, Any]]:
+        """Columnas del modelo que faltan con más frecuencia"""
+        where, params = self._filters(None, model, None, since, until, 'file')
+        clause = f"WHERE {' AND '.join(where)}" if where else ''
+        
+        with self._connect() as conn:
+            rows = conn.execute(
+                f'''SELECT m.column_name AS column, COUNT(*) AS reports
+                    FROM report_missing_columns m
+                    JOIN (SELECT id FROM reports {clause}) r ON r.id = m.report_id
+                    GROUP BY m.column_name ORDER BY reports DESC, m.column_name
+                    LIMIT ?''',
+                params + [max(1, int(limit))]
+            ).fetchall()
+        
+        return [dict(row) for row in rows]
+    
+    def import_json_reports(self, directory: Optional[Path] = None) -> Dict[str, Any]:
+        """
+        Importa los reportes JSON existentes (uno por archivo) al almacén
+        
+        Los reportes ya importados (mismo nombre) se omiten, así que se
+        puede ejecutar varias veces. Todo se inserta en una transacción.
+        
+        Returns:
+            Diccionario con 'imported', 'skipped' y 'errors'
+        """
+        directory = Path(directory) if directory is not None else Config.COMPARISON_REPORTS_DIR
+        imported = 0
+        skipped = 0
+        errors = []
+        
+        with self._connect() as conn:
+            existing = {row[0] for row in conn.execute('SELECT report_name FROM reports WHERE parent_id IS NULL')}
+            
+            for path in sorted(directory.glob('*.json')):
+                if path.name in existing:
+                    skipped += 1
+                    continue
+                
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        report = json.load(f)
+                    
+                    if isinstance(report.get('results'), list):
+                        results = report.pop('results')
+                        self._insert_bulk(conn, path.name, report, results, None)
+                    else:
+                        self._insert_comparison(conn, path.name, report, self._infer_model(report))
+                    imported += 1
+                except Exception as e:
+                    errors.append({'file': path.name, 'error': str(e)})
+        
+        return {'imported': imported, 'skipped': skipped, 'errors': errors}
+    
+    def delete(self, report_name: str) -> bool:
+        """Elimina un reporte (y, si es masivo, los de cada archivo)"""
+        with self._connect() as conn:
+            cursor = conn.execute('DELETE FROM reports WHERE report_name = ?', (report_name,))
+            return cursor.rowcount > 0
+    
+    def _insert_comparison(self,
+                           conn: sqlite3.Connection,
+                           report_name: str,
+                           comparison: Dict[str, Any],
+                           model: Optional[str],
+                           parent_id: Optional[int] = None,
+                           position: Optional[int] = None) -> int:
+        sheets = comparison.get('sheets') or [comparison]
+        missing = sorted({col for sheet in sheets for col in sheet.get('missing_columns') or []})
+        total_rows = sum(sheet.get('total_rows') or 0 for sheet in sheets)
+        
+        cursor = conn.execute(
+            '''INSERT INTO reports (report_name, kind, parent_id, position, file, model, timestamp,
+                                    status, similarity, total_rows, missing_count, payload)
+               VALUES (?, 'file', ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+            (
+                report_name, parent_id, position,
+                comparison.get('file'), model,
+                comparison.get('timestamp') or '',
+                comparison.get('status'),
+                comparison.get('similarity_percentage'),
+                total_rows, len(missing),
+                json.dumps(comparison, ensure_ascii=False, default=str)
+            )
+        )
+        report_id = cursor.lastrowid
+        
+        conn.executemany(
+            'INSERT INTO report_missing_columns (report_id, column_name) VALUES (?, ?)',
+            [(report_id, col) for col in missing]
+        )
+        
+        return report_id
+    
+    def _insert_bulk(self,
+                     conn: sqlite3.Connection,
+                     report_name: str,
+                     summary: Dict[str, Any],
+                     results: List[Dict[str, Any]],
+                     model: Optional[str]) -> int:
+        payload = {key: value for key, value in summary.items() if key != 'results'}
+        status_counts = payload.get('status_counts') or {}
+        
+        cursor = conn.execute(
+            '''INSERT INTO reports (report_name, kind, model, timestamp, status, similarity, total_rows,
+                                    missing_count, payload)
+               VALUES (?, 'bulk', ?, ?, ?, ?, ?, ?, ?)''',
+            (
+                report_name, model, payload.get('timestamp') or '',
+                'completo' if results and status_counts.get('completo') == len(results) else 'incompleto',
+                (payload.get('similarity') or {}).get('average'),
+                len(results),
+                len(payload.get('missing_columns') or []),
+                json.dumps(payload, ensure_ascii=False, default=str)
+            )
+        )
+        bulk_id = cursor.lastrowid
+        
+        for position, result in enumerate(results):
+            # Los archivos que fallaron no tienen fecha propia
+            if not result.get('timestamp'):
+                result = {**result, 'timestamp': payload.get('timestamp')}
+            
+            result_model = model or (self._infer_model(result) if result.get('status') != 'error' else None)
+            self._insert_comparison(conn, f'{report_name}#{position}', result, result_model, bulk_id, position)
+        
+        return bulk_id
+    
+    def _infer_model(self, comparison: Dict[str, Any]) -> Optional[str]:
+        """
+        Modelo de un reporte importado (no guardaba el modelo): se
+        reconstruye con las columnas coincidentes y las faltantes
+        """
+        sheet = (comparison.get('sheets') or [comparison])[0]
+        
+        if sheet.get('column_mapping') is not None:
+            found = [m['model_column'] for m in sheet['column_mapping']]
+        else:
+            found = sheet.get('matching_columns') or []
+        
+        columns = found + (sheet.get('missing_columns') or [])
+        return self.model_key(columns) if columns else None
+    
+    def _filters(self,
+                 file: Optional[str],
+                 model: Optional[str],
+                 status: Optional[str],
+                 since: Optional[str],
+                 until: Optional[str],
+                 kind: Optional[str]):
+        where, params = [], []
+        
+        if file is not None:
+            # GLOB respeta mayúsculas y usa el índice cuando el patrón tiene prefijo fijo
+            where.append('file GLOB ?' if any(c in file for c in '*?[') else 'file = ?')
+            params.append(file)
+        if model is not None:
+            where.append('model = ?')
+            params.append(model)
+        if status is not None:
+            where.append('status = ?')
+            params.append(status)
+        if since is not None:
+            where.append('timestamp >= ?')
+            params.append(since)
+        if until is not None:
+            where.append('timestamp < ?')
+            params.append(until)
+        if kind is not None:
+            where.append('kind = ?')
+            params.append(kind)
+        
+        return where, params
+    
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Conexión con el esquema creado; confirma la transacción al salir"""
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        conn.row_factory = sqlite3.Row
+        
+        try:
+            conn.execute('PRAGMA foreign_keys = ON')
+            conn.execute('PRAGMA synchronous = NORMAL')
+            self._ensure_schema(conn)
+            
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+    
+    def _ensure_schema(self, conn: sqlite3.Connection) -> None:
+        key = str(self.db_path)
+        if key in self._initialized:
+            return
+        
+        with self._init_lock:
+            if key in self._initialized:
+                return
+            
+            # WAL: las lecturas no se bloquean mientras se escribe un reporte
+            conn.execute('PRAGMA journal_mode = WAL')
+            with conn:
+                for statement in self.SCHEMA:
+                    conn.execute(statement)
+            
+            self._initialized.add(key)
@@ -0,0 +1,623 @@
+import pandas as pd
+import numpy as np
+import os
+import shutil
+import sqlite3
+from pathlib import Path
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+from config import Config
+
+
+class SqlColumn:
+    """
+    Tipo SQL de una columna, inferido bloque a bloque
+    
+    Registra qué clases de valores aparecieron (booleanos, enteros,
+    decimales, fechas, texto), el rango de los enteros y el largo máximo del
+    texto. Si una columna mezcla clases se ensancha: enteros y decimales
+    quedan como decimales y cualquier otra mezcla como texto.
+    """
+    
+    INT32_RANGE = (-2 ** 31, 2 ** 31 - 1)
+    
+    def __init__(self, name: Any):
+        self.name = name
+        self.kinds = set()
+        self.int_min = None
+        self.int_max = None
+        self.max_length = 0
+    
+    def observe(self, kind: Optional[str], int_range: Optional[Tuple[int, int]] = None, max_length: int = 0) -> None:
+        if kind is None:
+            return
+        
+        self.kinds.add(kind)
+        if int_range is not None:
+            low, high = int_range
+            self.int_min = low if self.int_min is None else min(self.int_min, low)
+            self.int_max = high if self.int_max is None else max(self.int_max, high)
+        self.max_length = max(self.max_length, max_length)
+    
+    @property
+    def kind(self) -> Optional[str]:
+        """Clase final de la columna (None si solo hubo vacíos)"""
+        if not self.kinds:
+            return None
+        if len(self.kinds) == 1:
+            return next(iter(self.kinds))
+        if self.kinds <= {'integer', 'float'}:
+            return 'float'
+        return 'text'
+    
+    def sql_type(self, dialect: str, measure_text: bool = True) -> str:
+        """
+        Tipo SQL en el dialecto; con measure_text=False el texto es siempre
+        TEXT (para cuando los tipos se declaran antes de ver todos los datos)
+        """
+        kind = self.kind
+        
+        if kind == 'integer':
+            fits = self.int_min >= self.INT32_RANGE[0] and self.int_max <= self.INT32_RANGE[1]
+            if dialect == 'sqlite':
+                return 'INTEGER'
+            if dialect == 'mysql':
+                return 'INT' if fits else 'BIGINT'
+            return 'INTEGER' if fits else 'BIGINT'
+        
+        if kind == 'float':
+            return {'postgresql': 'DOUBLE PRECISION', 'mysql': 'DOUBLE', 'sqlite': 'REAL'}[dialect]
+        
+        if kind == 'boolean':
+            return 'INTEGER' if dialect == 'sqlite' else 'BOOLEAN'
+        
+        if kind == 'datetime':
+            return {'postgresql': 'TIMESTAMP', 'mysql': 'DATETIME', 'sqlite': 'TEXT'}[dialect]
+        
+        if dialect == 'sqlite' or kind is None or not measure_text or self.max_length > Config.SQL_VARCHAR_MAX:
+            return 'TEXT'
+        return f'VARCHAR({max(1, self.max_length)})'
+
+
+class SqlTableWriter:
+    """
+    Genera el script SQL de una tabla bloque a bloque
+    
+    Cada columna de un bloque se convierte a literales SQL con operaciones
+    vectorizadas (en columnas de texto, una vez por valor distinto) y las
+    filas se arman con un solo join. Según el dialecto los datos salen como
+    PostgreSQL COPY ... FROM stdin, o como INSERT de varias filas (en lotes
+    de batch_size) dentro de una transacción, que es lo que usan MySQL y
+    SQLite para cargas masivas.
+    
+    Los tipos se infieren de los datos ya renderizados: create_table()
+    refleja todos los bloques vistos hasta ese momento.
+    """
+    
+    DIALECTS = ['postgresql', 'mysql', 'sqlite']
+    
+    # False en las subclases que producen valores Python en lugar de texto SQL
+    LITERALS = True
+    
+    def __init__(self,
+                 table_name: str,
+                 database_type: str = 'postgresql',
+                 batch_size: Optional[int] = None,
+                 use_copy: bool = True):
+        database_type = (database_type or 'postgresql').lower()
+        if database_type not in self.DIALECTS:
+            raise ValueError(f"Tipo de base de datos no soportado: {database_type}")
+        
+        self.table_name = table_name
+        self.dialect = database_type
+        self.batch_size = max(1, batch_size or Config.SQL_BATCH_ROWS)
+        self.copy = use_copy and database_type == 'postgresql'
+        self.columns: List[SqlColumn] = []
+        self.rows = 0
+    
+    def quote(self, identifier: Any) -> str:
+        """Identificador entre comillas del dialecto"""
+        if self.dialect == 'mysql':
+            return '`' + str(identifier).replace('`', '``') + '`'
+        return '"' + str(identifier).replace('"', '""') + '"'
+    
+    def column_types(self, measure_text: bool = True) -> List[str]:
+        return [column.sql_type(self.dialect, measure_text) for column in self.columns]
+    
+    def create_table(self, measure_text: bool = True) -> str:
+        lines = [f"    {self.quote(column.name)} {sql_type}"
+                 for column, sql_type in zip(self.columns, self.column_types(measure_text))]
+        return (
+            f"-- Tabla: {self.table_name}\n"
+            f"CREATE TABLE IF NOT EXISTS {self.quote(self.table_name)} (\n"
+            + ',\n'.join(lines)
+            + "\n);\n\n"
+        )
+    
+    def begin(self) -> str:
+        """Apertura de la carga de datos (después del CREATE TABLE)"""
+        if self.copy:
+            return f"COPY {self.quote(self.table_name)} ({self._column_list()}) FROM stdin;\n"
+        return 'START TRANSACTION;\n' if self.dialect == 'mysql' else 'BEGIN;\n'
+    
+    def end(self) -> str:
+        return '\\.\n' if self.copy else 'COMMIT;\n'
+    
+    def alter_columns(self, old_types: List[str], new_types: List[str]) -> str:
+        """
+        Sentencias que cambian el tipo de las columnas que se ensancharon
+        
+        SQLite no cambia tipos de columnas, pero guarda cualquier valor en
+        cualquier columna, así que ahí no hace falta.
+        """
+        if self.dialect == 'sqlite':
+            return ''
+        
+        table = self.quote(self.table_name)
+        statements = []
+        for column, old, new in zip(self.columns, old_types, new_types):
+            if old == new:
+                continue
+            name = self.quote(column.name)
+            if self.dialect == 'mysql':
+                statements.append(f"ALTER TABLE {table} MODIFY COLUMN {name} {new};\n")
+            else:
+                statements.append(f"ALTER TABLE {table} ALTER COLUMN {name} TYPE {new} USING {name}::{new};\n")
+        
+        return ''.join(statements)
+    
+    def render(self, chunk: pd.DataFrame) -> str:
+        """Datos de un bloque en el formato de carga del dialecto"""
+        rendered = self._render_columns(chunk)
+        if not rendered:
+            return ''
+        
+        if self.copy:
+            return ''.join(line + '\n' for line in map('\t'.join, zip(*rendered)))
+        
+        rows = ['(' + row + ')' for row in map(', '.join, zip(*rendered))]
+        prefix = f"INSERT INTO {self.quote(self.table_name)} ({self._column_list()}) VALUES\n"
+        
+        return ''.join(
+            prefix + ',\n'.join(rows[start:start + self.batch_size]) + ';\n'
+            for start in range(0, len(rows), self.batch_size)
+        )
+    
+    def _render_columns(self, chunk: pd.DataFrame) -> List[List[Any]]:
+        """Valores de cada columna del bloque; actualiza los tipos inferidos"""
+        if not self.columns:
+            self.columns = [SqlColumn(name) for name in chunk.columns]
+        
+        if len(chunk) == 0:
+            return []
+        
+        rendered = []
+        for i, column in enumerate(self.columns):
+            values, kind, int_range, max_length = self._render_column(chunk.iloc[:, i])
+            column.observe(kind, int_range, max_length)
+            rendered.append(values)
+        
+        self.rows += len(chunk)
+        return rendered
+    
+    def _column_list(self) -> str:
+        return ', '.join(self.quote(column.name) for column in self.columns)
+    
+    def _render_column(self, series: pd.Series):
+        """
+        Literales de una columna
+        
+        Returns:
+            Tupla (lista de literales, clase de la columna en el bloque,
+            rango de enteros, largo máximo de los valores como texto, que
+            da el ancho si la columna termina siendo de texto)
+        """
+        null = self._null_literal()
+        kind = series.dtype.kind
+        mask = series.isna().to_numpy()
+        count = len(series) - int(mask.sum())
+        
+        if count == 0:
+            return [null] * len(series), None, None, 0
+        
+        if kind == 'b':
+            return self._booleans(series.to_numpy(), mask), 'boolean', None, 5
+        
+        if kind in 'iu':
+            # Int64 (nullable) trae vacíos: se escriben sólo los presentes
+            values = series[~mask].to_numpy(dtype='int64') if mask.any() else series.to_numpy()
+            int_range = (int(values.min()), int(values.max()))
+            rendered = self._fill(self._integers(values.tolist()), mask)
+            return rendered, 'integer', int_range, self._int_length(int_range)
+        
+        if kind == 'f':
+            return self._floats(series.to_numpy(dtype='float64'))
+        
+        if kind == 'M':
+            values = series.dt.tz_localize(None) if series.dt.tz is not None else series
+            return self._fill(self._datetimes(values[~mask].to_numpy()), mask), 'datetime', None, 19
+        
+        return self._objects(series, mask)
+    
+    # Clases de pd.api.types.infer_dtype que se escriben como números o fechas
+    NUMBER_TYPES = {'integer', 'floating', 'mixed-integer-float', 'decimal'}
+    DATE_TYPES = {'datetime', 'datetime64', 'date'}
+    
+    def _objects(self, series: pd.Series, mask: np.ndarray):
+        """Columnas object: se trabaja sobre los valores distintos"""
+        codes, uniques = pd.factorize(series)
+        values = np.asarray(uniques, dtype=object)
+        inferred = pd.api.types.infer_dtype(values, skipna=True)
+        
+        rendered = None
+        int_range, max_length = None, 0
+        
+        if inferred == 'boolean':
+            rendered, kind, max_length = self._booleans(values.astype(bool), np.zeros(len(values), dtype=bool)), 'boolean', 5
+        elif inferred in self.NUMBER_TYPES:
+            rendered, kind, int_range, max_length = self._floats(values.astype('float64'))
+        elif inferred in self.DATE_TYPES:
+            try:
+                rendered, kind, max_length = self._datetimes(pd.to_datetime(values).to_numpy()), 'datetime', 19
+            except (ValueError, TypeError, OverflowError):
+                # Fechas fuera del rango de pandas o con zonas horarias mezcladas
+                rendered = None
+        
+        if rendered is None:
+            text = values.tolist() if inferred == 'string' else list(map(str, values.tolist()))
+            max_length = max(map(len, text))
+            rendered, kind = self._strings(text), 'text'
+        
+        rendered = np.append(np.asarray(rendered, dtype=object), self._null_literal())
+        return rendered[codes].tolist(), kind, int_range, max_length
+    
+    def _floats(self, values: np.ndarray):
+        """Decimales; si todos son enteros se escriben (y tipan) como enteros"""
+        finite = np.isfinite(values)
+        present = values[finite]
+        null = ~finite
+        
+        if len(present) and (present == np.floor(present)).all() and np.abs(present).max() < 2 ** 53:
+            as_int = present.astype('int64')
+            int_range = (int(as_int.min()), int(as_int.max()))
+            rendered = self._fill(self._integers(as_int.tolist()), null)
+            return rendered, 'integer', int_range, self._int_length(int_range)
+        
+        # NaN e infinitos quedan como NULL
+        text = self._decimals(present.tolist())
+        max_length = max(map(len, text)) if text and self.LITERALS else 0
+        return self._fill(text, null), ('float' if text else None), None, max_length
+    
+    def _integers(self, values: List[int]) -> List[Any]:
+        return list(map(str, values)) if self.LITERALS else values
+    
+    def _decimals(self, values: List[float]) -> List[Any]:
+        return list(map(repr, values)) if self.LITERALS else values
+    
+    @staticmethod
+    def _int_length(int_range: Tuple[int, int]) -> int:
+        return max(len(str(int_range[0])), len(str(int_range[1])))
+    
+    def _booleans(self, values: np.ndarray, mask: np.ndarray) -> List[Any]:
+        if not self.LITERALS:
+            true, false = 1, 0
+        elif self.copy:
+            true, false = 't', 'f'
+        elif self.dialect == 'sqlite':
+            true, false = '1', '0'
+        else:
+            true, false = 'TRUE', 'FALSE'
+        rendered = np.where(values.astype(bool), true, false).astype(object)
+        rendered[mask] = self._null_literal()
+        return rendered.tolist()
+    
+    def _datetimes(self, values: np.ndarray) -> List[str]:
+        """Fechas como 'AAAA-MM-DD HH:MM:SS', una vez por valor distinto"""
+        codes, uniques = pd.factorize(values.astype('datetime64[s]'))
+        text = np.char.replace(np.datetime_as_string(np.asarray(uniques, dtype='datetime64[s]'), unit='s'), 'T', ' ')
+        if self.LITERALS and not self.copy:
+            text = np.char.add(np.char.add("'", text), "'")
+        return text.astype(object)[codes].tolist()
+    
+    def _strings(self, text: List[str]) -> List[str]:
+        """Texto escapado; los reemplazos solo se hacen si el carácter aparece"""
+        if not self.LITERALS:
+            return text
+        
+        joined = '\x00'.join(text)
+        
+        if self.copy:
+            # Formato de texto de COPY: barra invertida, tabulador y saltos escapados
+            escapes = [('\\', '\\\\'), ('\t', '\\t'), ('\n', '\\n'), ('\r', '\\r')]
+            quote = ''
+        else:
+            escapes = [('\\', '\\\\')] if self.dialect == 'mysql' else []
+            escapes.append(("'", "''"))
+            quote = "'"
+        
+        escapes = [(old, new) for old, new in escapes if old in joined]
+        if escapes:
+            series = pd.Series(text, dtype=object)
+            for old, new in escapes:
+                series = series.str.replace(old, new, regex=False)
+            text = series.tolist()
+        
+        if not quote:
+            return text
+        return [quote + value + quote for value in text]
+    
+    def _fill(self, present: List[Any], mask: np.ndarray) -> List[Any]:
+        """Expande los literales de los valores presentes con NULL en los vacíos"""
+        if not mask.any():
+            return present
+        rendered = np.full(len(mask), self._null_literal(), dtype=object)
+        rendered[~mask] = present
+        return rendered.tolist()
+    
+    def _null_literal(self) -> Optional[str]:
+        if not self.LITERALS:
+            return None
+        return '\\N' if self.copy else 'NULL'
+
+
+class SqliteTableLoader(SqlTableWriter):
+    """
+    Variante de SqlTableWriter que produce filas para executemany
+    
+    Usa la misma inferencia de tipos y el mismo recorrido por columnas, pero
+    los valores quedan como objetos Python (int, float, str o None) que
+    sqlite3 enlaza directamente, sin texto SQL intermedio. Los booleanos
+    son 0/1 y las fechas texto 'AAAA-MM-DD HH:MM:SS', que entienden las
+    funciones de fecha de SQLite.
+    """
+    
+    LITERALS = False
+    
+    def __init__(self, table_name: str):
+        super().__init__(table_name, 'sqlite', use_copy=False)
+    
+    def row_values(self, chunk: pd.DataFrame) -> List[tuple]:
+        """Filas del bloque como tuplas de parámetros"""
+        rendered = self._render_columns(chunk)
+        return list(zip(*rendered)) if rendered else []
+    
+    def column_types(self, measure_text: bool = True) -> List[str]:
+        """
+        Tipos actuales de las columnas
+        
+        Las columnas que aún no tuvieron valores quedan sin tipo declarado:
+        así SQLite guarda lo que llegue sin convertirlo (una columna TEXT
+        convertiría los números a texto).
+        """
+        return [column.sql_type(self.dialect) if column.kind else '' for column in self.columns]
+    
+    def create_statement(self, table_name: str, types: List[str]) -> str:
+        columns = ', '.join(f'{self.quote(column.name)} {sql_type}'.rstrip()
+                            for column, sql_type in zip(self.columns, types))
+        return f'CREATE TABLE {self.quote(table_name)} ({columns})'
+    
+    def insert_statement(self) -> str:
+        placeholders = ', '.join('?' * len(self.columns))
+        return f'INSERT INTO {self.quote(self.table_name)} ({self._column_list()}) VALUES ({placeholders})'
+
+
+class SqlExportService:
+    """
+    Exportación de bloques de datos a scripts SQL de carga masiva o
+    directamente a una base SQLite
+    
+    Los datos se escriben primero a un archivo temporal mientras se infieren
+    los tipos (así los VARCHAR llevan el largo medido en todo el archivo) y
+    al final se arma el script: CREATE TABLE, apertura de la carga, datos y
+    cierre.
+    """
+    
+    def write_script(self,
+                     chunks: Iterable[pd.DataFrame],
+                     output_path: Path,
+                     table_name: str,
+                     database_type: str = 'postgresql',
+                     batch_size: Optional[int] = None,
+                     use_copy: bool = True) -> Dict[str, Any]:
+        """
+        Escribe el script SQL de una tabla
+        
+        Args:
+            chunks: Bloques de datos con las mismas columnas
+            output_path: Archivo de salida
+            table_name: Nombre de la tabla
+            database_type: postgresql, mysql o sqlite
+            batch_size: Filas por INSERT (por defecto Config.SQL_BATCH_ROWS)
+            use_copy: En PostgreSQL, usar COPY en lugar de INSERT
+            
+        Returns:
+            Diccionario con 'rows' y 'columns' (nombre y tipo SQL)
+        """
+        writer = SqlTableWriter(table_name, database_type, batch_size, use_copy)
+        output_path = Path(output_path)
+        body_path = output_path.with_name(output_path.name + '.part')
+        
+        try:
+            with open(body_path, 'w', encoding='utf-8', newline='') as body:
+                for chunk in chunks:
+                    body.write(writer.render(chunk))
+            
+            with open(output_path, 'w', encoding='utf-8', newline='') as f:
+                f.write(writer.create_table())
+                f.write(f"-- Datos de {table_name}\n")
+                f.write(writer.begin())
+                with open(body_path, 'r', encoding='utf-8', newline='') as body:
+                    shutil.copyfileobj(body, f, 1024 * 1024)
+                f.write(writer.end())
+        finally:
+            if body_path.exists():
+                os.remove(body_path)
+        
+        return {
+            'rows': writer.rows,
+            'columns': [
+                {'name': column.name, 'type': column.sql_type(writer.dialect)}
+                for column in writer.columns
+            ]
+        }
+    
+    def stream_script(self,
+                      chunks: Iterable[pd.DataFrame],
+                      table_name: str,
+                      database_type: str = 'postgresql',
+                      batch_size: Optional[int] = None,
+                      use_copy: bool = True) -> Iterator[str]:
+        """
+        Script SQL de una tabla en partes, sin archivo intermedio
+        
+        El CREATE TABLE sale con los tipos del primer bloque (el texto como
+        TEXT, porque todavía no se conoce su largo máximo) y a partir de ahí
+        cada bloque se produce en cuanto se renderiza. Si un bloque ensancha
+        el tipo de alguna columna, antes de sus datos se cierra la carga, se
+        emiten los ALTER TABLE y se vuelve a abrir.
+        
+        Yields:
+            Partes del script en el orden en que deben ejecutarse
+        """
+        writer = SqlTableWriter(table_name, database_type, batch_size, use_copy)
+        declared = None
+        
+        for chunk in chunks:
+            body = writer.render(chunk)
+            types = writer.column_types(measure_text=False)
+            
+            if declared is None:
+                yield writer.create_table(measure_text=False) + f"-- Datos de {table_name}\n" + writer.begin()
+            elif types != declared:
+                yield writer.end() + writer.alter_columns(declared, types) + writer.begin()
+            declared = types
+            
+            if body:
+                yield body
+        
+        if declared is not None:
+            yield writer.end()
+    
+    def write_database(self,
+                       tables: Iterable[Tuple[str, Iterable[pd.DataFrame]]],
+                       output_path: Path,
+                       batch_size: Optional[int] = None,
+                       index_columns: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Escribe una base SQLite con una tabla por cada fuente
+        
+        Los bloques se insertan con executemany en transacciones de
+        batch_size filas. Cada tabla se crea con los tipos del primer bloque
+        y, si un bloque posterior los ensancha (enteros que pasan a
+        decimales, números que pasan a texto), se reconstruye antes de
+        insertarlo. Los índices se crean al final de la carga de cada tabla.
+        
+        La base se arma en un archivo temporal sin diario ni sincronización
+        a disco y se mueve a output_path solo si la carga termina; un error
+        deja el archivo de salida anterior intacto.
+        
+        Args:
+            tables: Pares (nombre de la tabla, bloques de datos)
+            output_path: Archivo .sqlite de salida (se reemplaza)
+            batch_size: Filas por transacción (por defecto
+                Config.SQLITE_BATCH_ROWS)
+            index_columns: Columnas a indexar en las tablas que las tengan
+            
+        Returns:
+            Por tabla: 'table', 'rows', 'columns' (nombre y tipo) e 'indexes'
+        """
+        batch_size = max(1, batch_size or Config.SQLITE_BATCH_ROWS)
+        output_path = Path(output_path)
+        part_path = output_path.with_name(output_path.name + '.part')
+        if part_path.exists():
+            os.remove(part_path)
+        
+        conn = sqlite3.connect(str(part_path), isolation_level=None)
+        
+        try:
+            conn.execute('PRAGMA journal_mode = OFF')
+            conn.execute('PRAGMA synchronous = OFF')
+            
+            results = [
+                self._load_table(conn, table_name, chunks, batch_size, index_columns or [])
+                for table_name, chunks in tables
+            ]
+            
+            conn.close()
+            os.replace(part_path, output_path)
+        finally:
+            conn.close()
+            if part_path.exists():
+                os.remove(part_path)
+        
+        return results
+    
+    def _load_table(self,
+                    conn: sqlite3.Connection,
+                    table_name: str,
+                    chunks: Iterable[pd.DataFrame],
+                    batch_size: int,
+                    index_columns: List[str]) -> Dict[str, Any]:
+        loader = SqliteTableLoader(table_name)
+        declared = None
+        insert = None
+        pending = 0
+        
+        conn.execute('BEGIN')
+        
+        for chunk in chunks:
+            rows = loader.row_values(chunk)
+            types = loader.column_types()
+            
+            if declared is None:
+                conn.execute(loader.create_statement(table_name, types))
+                insert = loader.insert_statement()
+            elif types != declared:
+                self._retype(conn, loader, types)
+            declared = types
+            
+            start = 0
+            while start < len(rows):
+                batch = rows[start:start + batch_size - pending]
+                conn.executemany(insert, batch)
+                start += len(batch)
+                pending += len(batch)
+                
+                if pending >= batch_size:
+                    conn.execute('COMMIT')
+                    conn.execute('BEGIN')
+                    pending = 0
+        
+        if declared is None:
+            conn.execute('ROLLBACK')
+            raise ValueError(f"No hay columnas para la tabla {table_name}")
+        
+        # Índices después de la carga: se construyen una vez, ordenando
+        indexes = []
+        for column in loader.columns:
+            if str(column.name) in index_columns:
+                index_name = f'{table_name}_{column.name}_idx'
+                conn.execute(f'CREATE INDEX {loader.quote(index_name)} '
+                             f'ON {loader.quote(table_name)} ({loader.quote(column.name)})')
+                indexes.append(index_name)
+        
+        conn.execute('COMMIT')
+        
+        return {
+            'table': table_name,
+            'rows': loader.rows,
+            'columns': [
+                {'name': column.name, 'type': sql_type or None}
+                for column, sql_type in zip(loader.columns, declared)
+            ],
+            'indexes': indexes
+        }
+    
+    def _retype(self, conn: sqlite3.Connection, loader: SqliteTableLoader, types: List[str]) -> None:
+        """Reconstruye la tabla con tipos más anchos, copiando lo ya cargado"""
+        table = loader.quote(loader.table_name)
+        temp_name = f'{loader.table_name}__retype'
+        
+        conn.execute(loader.create_statement(temp_name, types))
+        conn.execute(f'INSERT INTO {loader.quote(temp_name)} SELECT * FROM {table}')
+        conn.execute(f'DROP TABLE {table}')
+        conn.execute(f'ALTER TABLE {loader.quote(temp_name)} RENAME TO {table}')
@@ -0,0 +1,180 @@
+import pandas as pd
+import numpy as np
+from typing import Dict, Any, Optional
+from app.services.reader_service import ReaderService
+from app.services.date_normalizer_service import DateNormalizerService
+
+
+class TypeInferenceService:
+    """
+    Inferencia del tipo de contenido de columnas a partir de una muestra
+    
+    Cada columna se evalúa sobre una muestra acotada de filas (ver
+    ReaderService.sample_rows) con clasificadores vectorizados: tasa de
+    valores numéricos, de fechas (con los formatos dominantes de la
+    columna, ver DateNormalizerService), de correos, de teléfonos y de
+    cédulas/RUC válidos (dígito verificador incluido). El costo depende del tamaño de la muestra, no del archivo.
+    """
+    
+    # Tasa mínima para asignar un tipo específico
+    MIN_CONFIDENCE = 0.8
+    
+    # Orden de preferencia cuando varios tipos superan el mínimo
+    PRIORITY = ['cedula', 'telefono', 'email', 'fecha', 'numero']
+    
+    # Tipo de contenido -> tipo_dato de un campo de perfil
+    DATA_TYPES = {
+        'cedula': 'texto',
+        'telefono': 'texto',
+        'email': 'email',
+        'fecha': 'fecha',
+        'numero': 'numero',
+        'texto': 'texto'
+    }
+    
+    DATE_FORMATS = DateNormalizerService.DATE_FORMATS
+    
+    EMAIL_PATTERN = r'[^@\s]+@[^@\s]+\.[A-Za-z]{2,}'
+    
+    # Fijo (9 dígitos) o celular (10), con prefijo 0 o código de país 593
+    PHONE_PATTERN = r'(?:593|0)[2-9]\d{7,8}'
+    
+    # Cédula (10 dígitos) o RUC de persona natural (cédula + 001)
+    CEDULA_PATTERN = r'\d{10}(?:001)?'
+    
+    def __init__(self):
+        self.reader = ReaderService()
+        self.dates = DateNormalizerService()
+    
+    def infer_file(self,
+                   file_path: str,
+                   sheet_name: Optional[str] = None,
+                   sample_size: Optional[int] = None) -> Dict[Any, Dict[str, Any]]:
+        """
+        Infiere el tipo de contenido de cada columna de una hoja
+        
+        Returns:
+            Diccionario columna -> resultado de infer_series
+        """
+        sample = self.reader.sample_rows(file_path, sample_size, sheet_name)
+        return {column: self.infer_series(sample.iloc[:, i]) for i, column in enumerate(sample.columns)}
+    
+    def infer_series(self, series: pd.Series) -> Dict[str, Any]:
+        """
+        Infiere el tipo de contenido de una columna (ya muestreada)
+        
+        Returns:
+            Diccionario con 'data_type' (tipo_dato de perfil), 'content_type',
+            'confidence', 'scores' (tasa por tipo), 'date_format',
+            'sample_size' y 'null_rate'
+        """
+        total = len(series)
+        values = series.dropna()
+        
+        if values.dtype == object:
+            values = values[values.astype(str).str.strip() != '']
+        
+        result = {
+            'data_type': 'texto',
+            'content_type': 'texto',
+            'confidence': 0.0,
+            'scores': {},
+            'date_format': None,
+            'sample_size': total,
+            'null_rate': round(1 - len(values) / total, 4) if total else 0.0
+        }
+        
+        if len(values) == 0:
+            return result
+        
+        scores, date_format = self._score(values)
+        result['scores'] = {k: round(float(v), 4) for k, v in scores.items()}
+        result['date_format'] = date_format
+        
+        for content_type in self.PRIORITY:
+            if scores[content_type] >= self.MIN_CONFIDENCE:
+                result.update({
+                    'data_type': self.DATA_TYPES[content_type],
+                    'content_type': content_type,
+                    'confidence': round(float(scores[content_type]), 4)
+                })
+                return result
+        
+        result['confidence'] = round(1 - float(max(scores.values())), 4)
+        return result
+    
+    def _score(self, values: pd.Series):
+        """Tasa de aciertos de cada clasificador sobre los valores no vacíos"""
+        kind = values.dtype.kind
+        
+        if kind == 'M':
+            scores = dict.fromkeys(self.PRIORITY, 0.0)
+            scores['fecha'] = 1.0
+            return scores, None
+        
+        if kind in 'iuf':
+            numeric = values.astype('float64')
+            is_integer = np.isfinite(numeric) & (numeric == np.round(numeric))
+            as_integer = numeric.where(is_integer, 0).astype('int64').astype(str)
+            text = as_integer.where(is_integer, numeric.astype(str))
+            # Los identificadores numéricos pierden el 0 inicial
+            text = text.where(text.str.len() != 9, text.str.zfill(10))
+            numeric_mask = np.ones(len(values), dtype=bool)
+            date_mask, date_format = np.zeros(len(values), dtype=bool), None
+        else:
+            text = values.astype(str).str.strip()
+            numeric_mask = self._numeric_mask(text)
+            date_mask, date_format = self._date_mask(values)
+        
+        digits = text.str.replace(r'[\s\-\(\)\.\+]', '', regex=True)
+        
+        scores = {
+            'cedula': self._cedula_mask(digits).mean(),
+            'telefono': digits.str.fullmatch(self.PHONE_PATTERN).to_numpy(dtype=bool).mean(),
+            'email': text.str.fullmatch(self.EMAIL_PATTERN).to_numpy(dtype=bool).mean(),
+            'fecha': date_mask.mean(),
+            'numero': numeric_mask.mean()
+        }
+        return scores, date_format
+    
+    def _numeric_mask(self, text: pd.Series) -> np.ndarray:
+        """Valores numéricos con punto o con coma decimal (1.234,56)"""
+        plain = pd.to_numeric(text, errors='coerce').notna().to_numpy()
+        comma = pd.to_numeric(
+            text.str.replace('.', '', regex=False).str.replace(',', '.', regex=False),
+            errors='coerce'
+        ).notna().to_numpy()
+        return plain | comma
+    
+    def _date_mask(self, values: pd.Series):
+        """
+        Valores que ya son fechas o que se parsean con los formatos dominantes
+        
+        Los seriales de Excel y el parser flexible no se usan aquí: cualquier
+        columna de enteros o de años parecería de fechas.
+        """
+        formats = [f for f in self.dates.detect_formats(values)['formats'] if f != DateNormalizerService.EXCEL_SERIAL]
+        date_mask = self.dates.parse(values, formats, fallback=False).notna().to_numpy()
+        return date_mask, formats[0] if formats else None
+    
+    def _cedula_mask(self, digits: pd.Series) -> np.ndarray:
+        """Cédulas/RUC con provincia, tercer dígito y dígito verificador válidos"""
+        mask = digits.str.fullmatch(self.CEDULA_PATTERN).to_numpy(dtype=bool)
+        if not mask.any():
+            return mask
+        
+        candidates = np.array(digits[mask].str.slice(0, 10).tolist(), dtype='<U10')
+        d = candidates.view(np.uint32).reshape(-1, 10).astype(np.int64) - ord('0')
+        
+        province = d[:, 0] * 10 + d[:, 1]
+        valid = ((province >= 1) & (province <= 24)) | (province == 30)
+        valid &= d[:, 2] < 6
+        
+        # Módulo 10 con coeficientes 2,1,2,1,...; productos > 9 restan 9
+        products = d[:, :9] * np.array([2, 1, 2, 1, 2, 1, 2, 1, 2])
+        products = np.where(products > 9, products - 9, products)
+        check = (10 - products.sum(axis=1) % 10) % 10
+        valid &= check == d[:, 9]
+        
+        mask[mask] = valid
+        return mask
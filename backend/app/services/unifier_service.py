@@ -1,21 +1,54 @@
 import pandas as pd
+import numpy as np
+import json
+import os
+import re
+import shutil
+import threading
+from contextlib import contextmanager
+from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional, Tuple, Union
+from openpyxl import Workbook
 from config import Config
+from app.services.reader_service import ReaderService
+from app.services.dedup_service import DedupService
+from app.services.columnar_cache_service import ColumnarCacheService
+from app.services.date_normalizer_service import DateNormalizerService
+
+try:
+    import fcntl
+except ImportError:  # Windows: solo se serializa dentro del proceso
+    fcntl = None
 
 
 class UnifierService:
     """Servicio para unificar múltiples archivos Excel en uno solo"""
     
+    MANIFEST_FILE = 'manifest.json'
+    HASH_INDEX_FILE = 'hash_index.npy'
+    HASH_INDEX_DTYPE = np.dtype([('hash', '<u8'), ('part', '<i4'), ('row', '<i8')])
+    
+    # Serializa las cargas sobre los destinos persistentes dentro del
+    # proceso; entre procesos se usa además un lock de archivo por destino
+    _targets_lock = threading.Lock()
+    
     def __init__(self):
         self.outputs_dir = Config.OUTPUTS_DIR
         self.outputs_dir.mkdir(parents=True, exist_ok=True)
+        self.targets_dir = Config.UNIFY_TARGETS_DIR
+        self.targets_dir.mkdir(parents=True, exist_ok=True)
+        self.reader = ReaderService()
+        self.dates = DateNormalizerService()
     
     def unify_files(self, 
                    file_paths: List[str], 
                    output_name: str = 'unificado.xlsx',
                    remove_duplicates: bool = False,
-                   add_source_column: bool = True) -> Dict[str, Any]:
+                   add_source_column: bool = True,
+                   sheets: Union[None, str, List[str]] = None,
+                   out_of_core: Optional[bool] = None,
+                   normalize_dates: bool = False) -> Dict[str, Any]:
         """
         Unifica múltiples archivos Excel en uno solo
         
@@ -24,27 +57,56 @@ class UnifierService:
             output_name: Nombre del archivo de salida
             remove_duplicates: Si debe eliminar filas duplicadas
             add_source_column: Si debe agregar columna con el archivo origen
-            
+            sheets: Hojas a unificar de cada archivo: None (primera), 'all',
+                un nombre, un patrón tipo glob o una lista de nombres. Si se
+                indica, se agrega también la columna hoja_origen.
+            out_of_core: Si debe escribir en streaming sin cargar los archivos
+                en memoria. None lo decide según el tamaño total de entrada
+                (Config.UNIFY_OUT_OF_CORE_MB).
+            normalize_dates: Si convierte a fecha las columnas de texto que
+                son mayormente fechas (ver DateNormalizerService)
+                
         Returns:
             Diccionario con información del proceso
         """
+        if out_of_core is None:
+            total_bytes = sum(os.path.getsize(p) for p in file_paths if os.path.exists(p))
+            out_of_core = total_bytes > Config.UNIFY_OUT_OF_CORE_MB * 1024 * 1024
+        
+        if out_of_core:
+            return self._unify_streaming(file_paths, output_name, remove_duplicates, 
+                                         add_source_column, sheets, normalize_dates)
+        
         all_data = []
+        errors = []
+        date_columns = {}
+        sheets_processed = 0
         
-        for file_path in file_paths:
-            try:
-                df = pd.read_excel(file_path)
+        # Lectura en paralelo; el orden de los archivos se conserva
+        for outcome in self.reader.read_many(file_paths, sheets):
+            file_name = Path(outcome['file']).name
+            
+            if 'error' in outcome:
+                errors.append({'file': file_name, 'error': outcome['error']})
+                continue
+            
+            for sheet_name, df in outcome['frames'].items():
+                if normalize_dates:
+                    df, converted = self.dates.normalize_frame(
+                        df, sheet_name or '', content_hash=self.reader.file_hash(outcome['file'])
+                    )
+                    date_columns.update(converted)
                 
                 if add_source_column:
-                    df['archivo_origen'] = Path(file_path).name
+                    df['archivo_origen'] = file_name
+                    if sheets is not None:
+                        df['hoja_origen'] = sheet_name
                 
                 all_data.append(df)
-            
-            except Exception as e:
-                print(f"Error reading {file_path}: {e}")
-                continue
+                sheets_processed += 1
         
         if not all_data:
-            raise ValueError("No se pudieron leer archivos")
+            raise ValueError(f"No se pudieron leer archivos: {errors}")
         
         # Combinar todos los DataFrames
         unified_df = pd.concat(all_data, ignore_index=True)
@@ -65,20 +127,525 @@ class UnifierService:
         output_path = self.outputs_dir / output_name
         unified_df.to_excel(output_path, index=False)
         
-        return {
+        result = {
             'output_file': str(output_path),
             'total_rows': len(unified_df),
             'total_columns': len(unified_df.columns),
             'files_processed': len(file_paths),
+            'sheets_processed': sheets_processed,
+            'errors': errors,
             'duplicates_removed': duplicates_removed,
             'columns': unified_df.columns.tolist()
         }
+        
+        if normalize_dates:
+            result['date_columns'] = self._date_columns_summary(date_columns)
+        
+        return result
     
-    def normalize_column_names(self, file_path: str) -> Dict[str, str]:
-        """Normaliza nombres de columnas de un archivo"""
-        df = pd.read_excel(file_path)
+    def _unify_streaming(self, 
+                         file_paths: List[str], 
+                         output_name: str,
+                         remove_duplicates: bool,
+                         add_source_column: bool,
+                         sheets: Union[None, str, List[str]],
+                         normalize_dates: bool = False) -> Dict[str, Any]:
+        """
+        Unifica escribiendo fila a fila en un libro de solo escritura
+        
+        El esquema unificado se arma primero con los encabezados de todos
+        los archivos; luego cada hoja se recorre por bloques y se escribe
+        directamente en la salida. La memoria usada no depende de cuántos
+        archivos se unifiquen.
+        """
+        sources, union_columns, errors = self._union_schema(file_paths, sheets, add_source_column)
+        
+        if not sources:
+            raise ValueError(f"No se pudieron leer archivos: {errors}")
+        
+        normalized_columns = [self._normalize(col) for col in union_columns]
+        
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet('Sheet1')
+        ws.append(normalized_columns)
+        
+        total_rows = 0
+        duplicates_removed = 0
+        date_columns = {} if normalize_dates else None
+        
+        if remove_duplicates:
+            # Primera pasada: hashes por fila con volcado a disco por particiones
+            with DedupService() as dedup:
+                for chunk in self._iter_unified_chunks(sources, union_columns, add_source_column, sheets, [], date_columns):
+                    dedup.add(chunk)
+                duplicates_removed = dedup.resolve()
+                
+                for chunk in self._iter_unified_chunks(sources, union_columns, add_source_column, sheets, errors, date_columns):
+                    chunk = dedup.apply(chunk)
+                    for row in self._excel_rows(chunk):
+                        ws.append(row)
+                    total_rows += len(chunk)
+        else:
+            for chunk in self._iter_unified_chunks(sources, union_columns, add_source_column, sheets, errors, date_columns):
+                for row in self._excel_rows(chunk):
+                    ws.append(row)
+                total_rows += len(chunk)
+        
+        output_path = self.outputs_dir / output_name
+        wb.save(output_path)
+        
+        result = {
+            'output_file': str(output_path),
+            'total_rows': total_rows,
+            'total_columns': len(normalized_columns),
+            'files_processed': len(file_paths),
+            'sheets_processed': len(sources),
+            'errors': errors,
+            'duplicates_removed': duplicates_removed,
+            'columns': normalized_columns,
+            'out_of_core': True
+        }
+        
+        if normalize_dates:
+            result['date_columns'] = self._date_columns_summary(date_columns)
+        
+        return result
+    
+    def unify_incremental(self, 
+                          target_name: str,
+                          file_paths: List[str],
+                          remove_duplicates: bool = False,
+                          add_source_column: bool = True,
+                          sheets: Union[None, str, List[str]] = None,
+                          output_name: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Agrega archivos a un destino de unificación persistente
+        
+        El destino guarda un manifiesto con los archivos ya unificados
+        (identificados por el hash de su contenido) y los datos en partes
+        columnares que solo se agregan. En cada llamada se leen únicamente
+        los archivos nuevos; los ya incorporados se omiten sin abrirlos.
+        
+        Args:
+            target_name: Nombre del destino (se crea si no existe)
+            file_paths: Archivos a incorporar
+            remove_duplicates: Si descarta filas ya presentes en el destino
+                o repetidas entre los archivos nuevos (índice de hashes
+                persistido y comparación exacta)
+            add_source_column: Si agrega archivo_origen (se fija al crear
+                el destino)
+            sheets: Selección de hojas de cada archivo nuevo
+            output_name: Si se indica, genera además el Excel unificado
+            
+        Returns:
+            Diccionario con información del proceso
+        """
+        target_dir = self._target_dir(target_name)
+        
+        # El manifiesto se lee bajo el lock: otro proceso pudo agregar partes
+        with self._target_lock(target_dir):
+            manifest = self._load_manifest(target_dir)
+            if manifest is None:
+                manifest = self._new_manifest(target_name, add_source_column)
+            
+            storage = ColumnarCacheService(target_dir / 'parts')
+            index = self._load_hash_index(target_dir)
+            
+            errors = []
+            skipped = []
+            delta = []
+            
+            for file_path in file_paths:
+                content_hash = self.reader.file_hash(file_path)
+                if content_hash in manifest['sources'] or any(h == content_hash for h, _ in delta):
+                    skipped.append(Path(file_path).name)
+                else:
+                    delta.append((content_hash, file_path))
+            
+            rows_added = 0
+            duplicates_removed = 0
+            batch_size = max(1, Config.READER_MAX_WORKERS)
+            
+            # Los archivos nuevos se leen en lotes del tamaño del pool
+            for start in range(0, len(delta), batch_size):
+                batch = delta[start:start + batch_size]
+                outcomes = self.reader.read_many([path for _, path in batch], sheets)
+                
+                for (content_hash, file_path), outcome in zip(batch, outcomes):
+                    file_name = Path(file_path).name
+                    
+                    if 'error' in outcome:
+                        errors.append({'file': file_name, 'error': outcome['error']})
+                        continue
+                    
+                    source = {
+                        'file': file_name,
+                        'sheets': [],
+                        'parts': [],
+                        'rows': 0,
+                        'duplicates_removed': 0,
+                        'added': datetime.now().isoformat()
+                    }
+                    
+                    # Estado previo, para descartar el archivo si una parte no se guarda
+                    columns_before = list(manifest['columns'])
+                    parts_before = len(manifest['parts'])
+                    index_before = index
+                    saved = True
+                    
+                    for sheet_name, df in outcome['frames'].items():
+                        if manifest['add_source_column']:
+                            df['archivo_origen'] = file_name
+                            if sheets is not None:
+                                df['hoja_origen'] = sheet_name
+                        
+                        for col in df.columns:
+                            if col not in manifest['columns']:
+                                manifest['columns'].append(col)
+                        
+                        hashes = DedupService.row_hashes(df)
+                        
+                        if remove_duplicates:
+                            keep = ~self._duplicated_against(df, hashes, index, manifest, storage)
+                            source['duplicates_removed'] += int(len(df) - keep.sum())
+                            df = df[keep].reset_index(drop=True)
+                            hashes = hashes[keep]
+                        
+                        part_number = manifest['next_part']
+                        manifest['next_part'] += 1
+                        part_id = f'part_{part_number:06d}'
+                        if not storage.save(part_id, df):
+                            saved = False
+                            break
+                        
+                        index = self._merge_hash_index(index, hashes, part_number)
+                        manifest['parts'].append({'id': part_id, 'number': part_number, 'rows': len(df)})
+                        source['sheets'].append(sheet_name)
+                        source['parts'].append(part_id)
+                        source['rows'] += len(df)
+                    
+                    if not saved:
+                        for part in manifest['parts'][parts_before:]:
+                            shutil.rmtree(target_dir / 'parts' / part['id'], ignore_errors=True)
+                        del manifest['parts'][parts_before:]
+                        manifest['columns'] = columns_before
+                        index = index_before
+                        errors.append({'file': file_name, 'error': 'No se pudieron guardar los datos en el destino'})
+                        continue
+                    
+                    manifest['sources'][content_hash] = source
+                    rows_added += source['rows']
+                    duplicates_removed += source['duplicates_removed']
+            
+            manifest['total_rows'] += rows_added
+            manifest['duplicates_removed'] += duplicates_removed
+            manifest['updated'] = datetime.now().isoformat()
+            
+            self._save_hash_index(target_dir, index)
+            self._save_manifest(target_dir, manifest)
+            
+            result = {
+                'target': manifest['name'],
+                'files_added': len(delta) - len(errors),
+                'files_skipped': skipped,
+                'rows_added': rows_added,
+                'duplicates_removed': duplicates_removed,
+                'total_rows': manifest['total_rows'],
+                'total_files': len(manifest['sources']),
+                'errors': errors,
+                'columns': [self._normalize(col) for col in manifest['columns']]
+            }
+            
+            if output_name:
+                result['output_file'] = self._materialize(target_dir, manifest, output_name)
+            
+            return result
+    
+    def materialize_target(self, target_name: str, output_name: Optional[str] = None) -> Dict[str, Any]:
+        """Genera el Excel unificado de un destino a partir de sus partes"""
+        target_dir = self._target_dir(target_name)
+        manifest = self._load_manifest(target_dir)
+        if manifest is None:
+            raise ValueError(f"Destino no encontrado: {target_name}")
+        
+        output_name = output_name or f"{manifest['name']}.xlsx"
+        
+        return {
+            'target': manifest['name'],
+            'output_file': self._materialize(target_dir, manifest, output_name),
+            'total_rows': manifest['total_rows'],
+            'columns': [self._normalize(col) for col in manifest['columns']]
+        }
+    
+    def list_targets(self) -> List[Dict[str, Any]]:
+        """Lista los destinos de unificación persistentes"""
+        targets = []
         
-        original_columns = df.columns.tolist()
+        for target_dir in sorted(self.targets_dir.iterdir()):
+            manifest = self._load_manifest(target_dir) if target_dir.is_dir() else None
+            if manifest is None:
+                continue
+            
+            targets.append({
+                'name': manifest['name'],
+                'total_rows': manifest['total_rows'],
+                'total_files': len(manifest['sources']),
+                'updated': manifest['updated']
+            })
+        
+        return targets
+    
+    def get_target(self, target_name: str) -> Optional[Dict[str, Any]]:
+        """Obtiene el manifiesto de un destino"""
+        return self._load_manifest(self._target_dir(target_name))
+    
+    def delete_target(self, target_name: str) -> bool:
+        """Elimina un destino y todos sus datos"""
+        target_dir = self._target_dir(target_name)
+        
+        with self._target_lock(target_dir):
+            if not target_dir.exists():
+                return False
+            shutil.rmtree(target_dir)
+            return True
+    
+    @contextmanager
+    def _target_lock(self, target_dir: Path) -> Iterator[None]:
+        """
+        Lock exclusivo de un destino entre hilos y procesos
+        
+        El archivo de lock queda junto al directorio del destino (no dentro)
+        para que sobreviva a delete_target mientras otro proceso espera.
+        """
+        with self._targets_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.targets_dir / f'.{target_dir.name}.lock', 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def _target_dir(self, target_name: str) -> Path:
+        safe_name = re.sub(r'[^\w\-]', '_', target_name.strip()) or 'unificado'
+        return self.targets_dir / safe_name
+    
+    def _new_manifest(self, target_name: str, add_source_column: bool) -> Dict[str, Any]:
+        now = datetime.now().isoformat()
+        return {
+            'name': self._target_dir(target_name).name,
+            'created': now,
+            'updated': now,
+            'add_source_column': add_source_column,
+            'columns': [],
+            'total_rows': 0,
+            'duplicates_removed': 0,
+            'next_part': 1,
+            'parts': [],
+            'sources': {}
+        }
+    
+    def _load_manifest(self, target_dir: Path) -> Optional[Dict[str, Any]]:
+        manifest_path = target_dir / self.MANIFEST_FILE
+        if not manifest_path.exists():
+            return None
+        
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
+    def _save_manifest(self, target_dir: Path, manifest: Dict[str, Any]) -> None:
+        """Escribe el manifiesto de forma atómica (al final de cada carga)"""
+        target_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = target_dir / f'{self.MANIFEST_FILE}.tmp'
+        
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False, default=str)
+        
+        os.replace(tmp_path, target_dir / self.MANIFEST_FILE)
+    
+    def _load_hash_index(self, target_dir: Path) -> np.ndarray:
+        """Índice de hashes de fila ordenado: (hash, parte, fila)"""
+        index_path = target_dir / self.HASH_INDEX_FILE
+        if not index_path.exists():
+            return np.empty(0, dtype=self.HASH_INDEX_DTYPE)
+        return np.load(index_path)
+    
+    def _save_hash_index(self, target_dir: Path, index: np.ndarray) -> None:
+        target_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = target_dir / f'{self.HASH_INDEX_FILE}.tmp'
+        
+        with open(tmp_path, 'wb') as f:
+            np.save(f, index, allow_pickle=False)
+        
+        os.replace(tmp_path, target_dir / self.HASH_INDEX_FILE)
+    
+    def _merge_hash_index(self, index: np.ndarray, hashes: np.ndarray, part_number: int) -> np.ndarray:
+        """
+        Incorpora los hashes de una parte nueva manteniendo el orden
+        
+        Solo se ordenan las entradas nuevas; se intercalan en el índice
+        (que ya está ordenado) después de las existentes con el mismo hash.
+        """
+        entries = np.empty(len(hashes), dtype=self.HASH_INDEX_DTYPE)
+        entries['hash'] = hashes
+        entries['part'] = part_number
+        entries['row'] = np.arange(len(hashes))
+        entries = entries[np.argsort(entries['hash'], kind='stable')]
+        
+        positions = np.searchsorted(index['hash'], entries['hash'], side='right')
+        return np.insert(index, positions, entries)
+    
+    def _duplicated_against(self, 
+                            df: pd.DataFrame, 
+                            hashes: np.ndarray, 
+                            index: np.ndarray,
+                            manifest: Dict[str, Any],
+                            storage: ColumnarCacheService) -> np.ndarray:
+        """
+        Marca las filas ya presentes en el destino o repetidas en el bloque
+        
+        Solo se cargan desde disco las filas guardadas cuyo hash coincide
+        con alguna fila nueva; la igualdad se confirma comparando valores.
+        """
+        if len(df) == 0:
+            return np.zeros(0, dtype=bool)
+        
+        # Rangos del índice ordenado con los hashes del bloque
+        wanted = np.unique(hashes)
+        starts = np.searchsorted(index['hash'], wanted, side='left')
+        counts = np.searchsorted(index['hash'], wanted, side='right') - starts
+        found = counts > 0
+        starts, counts = starts[found], counts[found]
+        
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        matches = index[np.repeat(starts, counts) + offsets]
+        
+        stored = []
+        for part_number in np.unique(matches['part']):
+            rows = np.sort(matches['row'][matches['part'] == part_number])
+            part = storage.take(f'part_{int(part_number):06d}', rows)
+            if part is not None:
+                stored.append(part)
+        
+        columns = manifest['columns']
+        frames = [frame.reindex(columns=columns).astype(object) for frame in stored]
+        frames.append(df.reindex(columns=columns).astype(object))
+        
+        combined = pd.concat(frames, ignore_index=True)
+        return combined.duplicated(keep='first').to_numpy()[-len(df):]
+    
+    def _materialize(self, target_dir: Path, manifest: Dict[str, Any], output_name: str) -> str:
+        """Escribe el Excel unificado recorriendo las partes por bloques"""
+        storage = ColumnarCacheService(target_dir / 'parts')
+        columns = manifest['columns']
+        
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet('Sheet1')
+        ws.append([self._normalize(col) for col in columns])
+        
+        for part in manifest['parts']:
+            chunks = storage.iter_chunks(part['id'], Config.READ_CHUNK_ROWS)
+            if chunks is None:
+                continue
+            
+            for chunk in chunks:
+                for row in self._excel_rows(chunk.reindex(columns=columns)):
+                    ws.append(row)
+        
+        output_path = self.outputs_dir / output_name
+        wb.save(output_path)
+        return str(output_path)
+    
+    def _iter_unified_chunks(self, 
+                             sources: List[Tuple[str, Optional[str]]],
+                             union_columns: List[Any],
+                             add_source_column: bool,
+                             sheets: Union[None, str, List[str]],
+                             errors: List[Dict[str, Any]],
+                             date_columns: Optional[Dict[Any, List[str]]] = None) -> Iterator[pd.DataFrame]:
+        """
+        Recorre por bloques todas las hojas, ya alineadas al esquema unificado
+        
+        Si se pasa date_columns, las columnas de fechas se normalizan (los
+        formatos se detectan en el primer bloque de cada hoja y los bloques
+        siguientes usan la caché) y se registran ahí.
+        """
+        for file_path, sheet_name in sources:
+            file_name = Path(file_path).name
+            
+            try:
+                content_hash = self.reader.file_hash(file_path) if date_columns is not None else None
+                
+                for chunk in self.reader.iter_chunks(file_path, sheet_name=sheet_name):
+                    if date_columns is not None:
+                        chunk, converted = self.dates.normalize_frame(chunk, sheet_name or '', content_hash=content_hash)
+                        date_columns.update(converted)
+                    
+                    if add_source_column:
+                        chunk['archivo_origen'] = file_name
+                        if sheets is not None:
+                            chunk['hoja_origen'] = sheet_name
+                    
+                    yield chunk.reindex(columns=union_columns)
+            
+            except Exception as e:
+                errors.append({'file': file_name, 'sheet': sheet_name, 'error': str(e)})
+    
+    def _union_schema(self, 
+                      file_paths: List[str], 
+                      sheets: Union[None, str, List[str]],
+                      add_source_column: bool) -> Tuple[List[Tuple[str, Optional[str]]], List[Any], List[Dict[str, Any]]]:
+        """
+        Calcula el esquema unificado solo con los encabezados
+        
+        Las columnas quedan en el mismo orden que daría pd.concat: las de la
+        primera hoja (con las de origen al final) y luego las nuevas de cada
+        hoja siguiente.
+        """
+        sources = []
+        union_columns = []
+        seen = set()
+        errors = []
+        
+        for outcome in self.reader.probe_many(file_paths, sheets):
+            if 'error' in outcome:
+                errors.append({'file': Path(outcome['file']).name, 'error': outcome['error']})
+                continue
+            
+            for sheet_name, probe in outcome['probes'].items():
+                columns = list(probe['columns'])
+                if add_source_column:
+                    columns.append('archivo_origen')
+                    if sheets is not None:
+                        columns.append('hoja_origen')
+                
+                for col in columns:
+                    if col not in seen:
+                        seen.add(col)
+                        union_columns.append(col)
+                
+                sources.append((outcome['file'], sheet_name))
+        
+        return sources, union_columns, errors
+    
+    def _date_columns_summary(self, date_columns: Dict[Any, List[str]]) -> Dict[str, List[str]]:
+        """Columnas convertidas a fecha (homologadas) con sus formatos"""
+        return {self._normalize(column): formats for column, formats in date_columns.items()}
+    
+    def _excel_rows(self, chunk: pd.DataFrame):
+        """Convierte un bloque en filas de valores nativos para openpyxl"""
+        values = chunk.astype(object).where(chunk.notna(), None)
+        return values.itertuples(index=False, name=None)
+    
+    def _normalize(self, column: Any) -> str:
+        """Homologa un nombre de columna"""
+        return str(column).strip().lower().replace(' ', '_')
+    
+    def normalize_column_names(self, file_path: str, sheet_name: Optional[str] = None) -> Dict[str, str]:
+        """Normaliza nombres de columnas de un archivo"""
+        original_columns = self.reader.probe_headers(file_path, sheet_name)['columns']
         normalized_columns = [col.strip().lower().replace(' ', '_') for col in original_columns]
         
         return dict(zip(original_columns, normalized_columns))
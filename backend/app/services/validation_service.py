@@ -0,0 +1,292 @@
+import pandas as pd
+import numpy as np
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Union
+from config import Config
+from app.models.profile import Profile, Field
+from app.services.reader_service import ReaderService
+from app.services.fuzzy_matcher_service import FuzzyMatcherService
+from app.services.type_inference_service import TypeInferenceService
+from app.services.date_normalizer_service import DateNormalizerService
+
+
+class FieldValidator:
+    """
+    Verificaciones compiladas de un campo de perfil
+    
+    Cada verificación produce una máscara booleana de filas inválidas para
+    un bloque completo: 'required' (vacío en un campo requerido) y 'type'
+    (valor que no es del tipo_dato del campo). En columnas de texto las
+    verificaciones se evalúan una vez por valor distinto del bloque y se
+    expanden a las filas con los códigos de pd.factorize.
+    """
+    
+    EMAIL_PATTERN = TypeInferenceService.EMAIL_PATTERN
+    
+    def __init__(self, field: Field):
+        self.field = field
+        self.dates = DateNormalizerService()
+        self.tipo_dato = field.tipo_dato
+        self.requerido = field.requerido
+        
+        type_checks = {
+            'email': self._invalid_email,
+            'numero': self._invalid_number,
+            'fecha': self._invalid_date
+        }
+        self._type_check = type_checks.get(self.tipo_dato)
+    
+    def validate(self,
+                 series: pd.Series,
+                 source: Optional[str] = None,
+                 content_hash: Optional[str] = None) -> Dict[str, np.ndarray]:
+        """
+        Máscaras de filas inválidas por tipo de violación
+        
+        source identifica la hoja y content_hash el contenido del archivo:
+        los formatos de fecha detectados se guardan por (campo, source) y se
+        revisan cuando cambia el contenido (ver DateNormalizerService).
+        """
+        null = series.isna().to_numpy()
+        kind = series.dtype.kind
+        violations = {}
+        
+        if kind == 'O':
+            codes, uniques = pd.factorize(series)
+            text = pd.Series(uniques, dtype=object).astype(str).str.strip()
+            blank_unique = (text == '').to_numpy()
+            null = null | np.append(blank_unique, False)[codes]
+        else:
+            codes = uniques = text = None
+        
+        if self.requerido:
+            violations['required'] = null
+        
+        if self._type_check is not None:
+            if codes is not None:
+                invalid_unique = self._type_check(pd.Series(uniques, dtype=object), text, source, content_hash) & ~blank_unique
+                # El código -1 (vacío) toma el último elemento: nunca inválido
+                violations['type'] = np.append(invalid_unique, False)[codes]
+            else:
+                violations['type'] = self._invalid_typed(series, source, content_hash) & ~null
+        
+        return violations
+    
+    def _invalid_typed(self, series: pd.Series, source: Optional[str], content_hash: Optional[str]) -> np.ndarray:
+        """Verificación de tipo sobre columnas ya tipadas (numéricas, fechas)"""
+        kind = series.dtype.kind
+        
+        if self.tipo_dato == 'numero':
+            return np.zeros(len(series), dtype=bool) if kind in 'biuf' else np.ones(len(series), dtype=bool)
+        
+        if self.tipo_dato == 'fecha':
+            # Los números pueden ser seriales de fecha de Excel
+            if kind == 'M':
+                return np.zeros(len(series), dtype=bool)
+            return self.dates.normalize(series, self.field.nombre, source, content_hash=content_hash)[0].isna().to_numpy()
+        
+        # Un email nunca es un número ni una fecha
+        return np.ones(len(series), dtype=bool)
+    
+    def _invalid_email(self, values: pd.Series, text: pd.Series, source: Optional[str],
+                       content_hash: Optional[str]) -> np.ndarray:
+        return ~text.str.fullmatch(self.EMAIL_PATTERN).to_numpy(dtype=bool)
+    
+    def _invalid_number(self, values: pd.Series, text: pd.Series, source: Optional[str],
+                        content_hash: Optional[str]) -> np.ndarray:
+        """Valores numéricos con punto o con coma decimal (1.234,56)"""
+        valid = pd.to_numeric(text, errors='coerce').notna().to_numpy()
+        
+        # Coma decimal y punto de miles solo sobre lo que no se reconoció
+        pending = np.nonzero(~valid)[0]
+        if len(pending):
+            comma = text.iloc[pending].str.replace('.', '', regex=False).str.replace(',', '.', regex=False)
+            valid[pending[pd.to_numeric(comma, errors='coerce').notna().to_numpy()]] = True
+        
+        return ~valid
+    
+    def _invalid_date(self, values: pd.Series, text: pd.Series, source: Optional[str],
+                      content_hash: Optional[str]) -> np.ndarray:
+        """Fechas propias, seriales de Excel o texto en alguno de los formatos de la columna"""
+        return self.dates.normalize(values, self.field.nombre, source, content_hash=content_hash)[0].isna().to_numpy()
+
+
+class ValidationService:
+    """
+    Validación de archivos contra los campos de un perfil
+    
+    El perfil se compila una vez en un FieldValidator por campo (según
+    tipo_dato y requerido). Cada campo se asocia a una columna del archivo
+    por su nombre o palabras clave (igualdad sin tildes ni signos y, si no,
+    por similitud) y el archivo se recorre por bloques, así que la memoria
+    no depende de su tamaño. Por campo se devuelven los conteos de
+    violaciones y una muestra acotada de las filas que fallan.
+    """
+    
+    # Validadores compilados por (id, fecha de actualización) del perfil
+    _compiled = {}
+    
+    def __init__(self):
+        self.reader = ReaderService()
+        self.fuzzy = FuzzyMatcherService()
+    
+    def compile(self, profile: Union[Profile, Dict[str, Any]]) -> List[FieldValidator]:
+        """Validadores de los campos de un perfil (memorizados por versión)"""
+        if isinstance(profile, dict):
+            profile = Profile.from_dict(profile)
+        
+        key = (profile.id, profile.fecha_actualizacion)
+        validators = self._compiled.get(key) if key[0] else None
+        
+        if validators is None:
+            validators = [FieldValidator(field) for field in profile.campos]
+            if key[0]:
+                self._compiled[key] = validators
+        
+        return validators
+    
+    def validate_file(self,
+                      file_path: str,
+                      profile: Union[Profile, Dict[str, Any]],
+                      sheet_name: Optional[str] = None,
+                      sample_size: Optional[int] = None,
+                      chunk_size: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Valida una hoja contra un perfil
+        
+        Args:
+            file_path: Ruta al archivo
+            profile: Perfil (objeto o diccionario)
+            sheet_name: Hoja (por defecto la primera)
+            sample_size: Filas de ejemplo por campo (por defecto
+                Config.VALIDATION_SAMPLE_ROWS)
+            chunk_size: Filas por bloque
+            
+        Returns:
+            Diccionario con 'rows', 'valid', 'invalid_rows' (filas con al
+            menos una violación), 'missing_fields' (campos sin columna;
+            si son requeridos el archivo no es válido) y 'fields' con, por
+            campo, la columna asociada, las violaciones por tipo y
+            'sample_rows' (posición de la fila de datos, desde 0) con
+            'sample_values'
+        """
+        sample_size = sample_size if sample_size is not None else Config.VALIDATION_SAMPLE_ROWS
+        validators = self.compile(profile)
+        
+        headers = self.reader.probe_headers(file_path, sheet_name)['columns']
+        bindings = self.bind_columns(headers, [v.field for v in validators])
+        
+        fields = []
+        for validator in validators:
+            column = bindings.get(validator.field.nombre)
+            fields.append({
+                'field': validator.field.nombre,
+                'column': column,
+                'tipo_dato': validator.tipo_dato,
+                'requerido': validator.requerido,
+                'violations': {},
+                'total_violations': 0,
+                'sample_rows': [],
+                'sample_values': []
+            })
+        
+        positions = {column: i for i, column in reversed(list(enumerate(headers)))}
+        active = [(validator, result, positions[result['column']])
+                  for validator, result in zip(validators, fields) if result['column'] is not None]
+        
+        source = sheet_name or ''
+        content_hash = self.reader.file_hash(file_path)
+        rows = 0
+        invalid_rows = 0
+        
+        for chunk in self.reader.iter_chunks(file_path, chunk_size, sheet_name):
+            any_invalid = np.zeros(len(chunk), dtype=bool)
+            
+            for validator, result, position in active:
+                series = chunk.iloc[:, position]
+                field_invalid = np.zeros(len(chunk), dtype=bool)
+                
+                for violation, mask in validator.validate(series, source, content_hash).items():
+                    count = int(mask.sum())
+                    if count:
+                        result['violations'][violation] = result['violations'].get(violation, 0) + count
+                        field_invalid |= mask
+                
+                if not field_invalid.any():
+                    continue
+                
+                result['total_violations'] += int(field_invalid.sum())
+                any_invalid |= field_invalid
+                
+                missing = sample_size - len(result['sample_rows'])
+                if missing > 0:
+                    offenders = np.nonzero(field_invalid)[0][:missing]
+                    result['sample_rows'].extend((rows + offenders).tolist())
+                    result['sample_values'].extend(_sample_value(v) for v in series.iloc[offenders])
+            
+            invalid_rows += int(any_invalid.sum())
+            rows += len(chunk)
+        
+        missing_fields = [result['field'] for result in fields if result['column'] is None]
+        missing_required = [result['field'] for result in fields
+                            if result['column'] is None and result['requerido']]
+        
+        return {
+            'file': Path(file_path).name,
+            'sheet': sheet_name,
+            'profile_id': profile['id'] if isinstance(profile, dict) else profile.id,
+            'rows': rows,
+            'valid': invalid_rows == 0 and not missing_required,
+            'invalid_rows': invalid_rows,
+            'total_violations': sum(result['total_violations'] for result in fields),
+            'missing_fields': missing_fields,
+            'missing_required_fields': missing_required,
+            'fields': fields
+        }
+    
+    def bind_columns(self, headers: List[Any], fields: List[Field]) -> Dict[str, Any]:
+        """
+        Asocia cada campo a una columna
+        
+        Primero por igualdad (sin mayúsculas, tildes ni signos) con el
+        nombre del campo o una de sus palabras clave; los campos restantes,
+        por similitud con las columnas libres.
+        
+        Returns:
+            Diccionario nombre del campo -> encabezado de la columna
+        """
+        folded = {}
+        for header in headers:
+            folded.setdefault(self.fuzzy.fold(header), header)
+        
+        bindings = {}
+        used = set()
+        
+        for field in fields:
+            for keyword in [field.nombre] + list(field.palabras_clave or []):
+                header = folded.get(self.fuzzy.fold(keyword))
+                if header is not None and header not in used:
+                    bindings[field.nombre] = header
+                    used.add(header)
+                    break
+        
+        pending = {field.nombre: [field.nombre] + list(field.palabras_clave or [])
+                   for field in fields if field.nombre not in bindings}
+        free = [header for header in headers if header not in used]
+        
+        if pending and free:
+            for assignment in self.fuzzy.match(free, pending):
+                bindings[assignment['field']] = assignment['column']
+        
+        return bindings
+
+
+def _sample_value(value: Any) -> Any:
+    """Valor de ejemplo listo para JSON"""
+    if value is None or (not isinstance(value, (list, tuple, dict)) and pd.isna(value)):
+        return None
+    if isinstance(value, np.generic):
+        return value.item()
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
@@ -12,14 +12,78 @@ class Config:
     UPLOADS_DIR = BASE_DIR / 'uploads'
     TEMP_MUESTRAS_DIR = BASE_DIR / 'temp_muestras'
     OUTPUTS_DIR = BASE_DIR / 'outputs'
+    COLUMNAR_CACHE_DIR = BASE_DIR / 'columnar_cache'
+    UNIFY_TARGETS_DIR = DATA_DIR / 'unify_targets'
     
     for directory in [DATA_DIR, PROFILES_DIR, BATCH_JOBS_DIR, 
                      COMPARISON_REPORTS_DIR, UPLOADS_DIR, 
-                     TEMP_MUESTRAS_DIR, OUTPUTS_DIR]:
+                     TEMP_MUESTRAS_DIR, OUTPUTS_DIR, COLUMNAR_CACHE_DIR,
+                     UNIFY_TARGETS_DIR]:
         directory.mkdir(parents=True, exist_ok=True)
     
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key'
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024
+    
+    # Caché de DataFrames leídos (compartida entre servicios)
+    FRAME_CACHE_MAX_MB = int(os.environ.get('FRAME_CACHE_MAX_MB', 512))
+    
+    # Filas por bloque en la lectura por streaming
+    READ_CHUNK_ROWS = int(os.environ.get('READ_CHUNK_ROWS', 50000))
+    
+    # Procesos para parsear hojas/archivos en paralelo
+    READER_MAX_WORKERS = int(os.environ.get('READER_MAX_WORKERS', os.cpu_count() or 2))
+    READER_MAX_INFLIGHT_MB = int(os.environ.get('READER_MAX_INFLIGHT_MB', 1024))
+    
+    # Entradas de cada memo del lector (hashes, hojas y sondeos por archivo)
+    READER_MEMO_ENTRIES = int(os.environ.get('READER_MEMO_ENTRIES', 4096))
+    
+    # Copia columnar en disco de cada hoja parseada (se recarga con mmap)
+    COLUMNAR_CACHE_ENABLED = os.environ.get('COLUMNAR_CACHE_ENABLED', 'true').lower() == 'true'
+    COLUMNAR_CACHE_MAX_MB = int(os.environ.get('COLUMNAR_CACHE_MAX_MB', 4096))
+    
+    # A partir de este tamaño total de entrada, unificar escribe en streaming
+    UNIFY_OUT_OF_CORE_MB = int(os.environ.get('UNIFY_OUT_OF_CORE_MB', 200))
+    
+    # Memoria para detectar duplicados antes de volcar particiones a disco
+    DEDUP_MEMORY_MB = int(os.environ.get('DEDUP_MEMORY_MB', 256))
+    
+    # Filas de muestra por hoja para inferir el tipo de contenido
+    SAMPLE_ROWS = int(os.environ.get('SAMPLE_ROWS', 2000))
+    
+    # Índice de encabezados de todos los análisis; a partir de cuántas hojas
+    # se confía en el tipo aprendido sin volver a muestrear
+    HEADER_INDEX_FILE = DATA_DIR / 'header_index.json'
+    HEADER_INDEX_TRUST_SHEETS = int(os.environ.get('HEADER_INDEX_TRUST_SHEETS', 3))
+    # Hojas ya indexadas que se recuerdan (las más recientes)
+    HEADER_INDEX_MAX_FILES = int(os.environ.get('HEADER_INDEX_MAX_FILES', 10000))
+    
+    # Valores más frecuentes que se reportan por columna al perfilar
+    PROFILE_TOP_K = int(os.environ.get('PROFILE_TOP_K', 10))
+    
+    # Reportes de comparación en SQLite; opcionalmente también como JSON sueltos
+    REPORTS_DB_FILE = DATA_DIR / 'comparison_reports.db'
+    COMPARISON_REPORTS_JSON = os.environ.get('COMPARISON_REPORTS_JSON', 'false').lower() == 'true'
+    
+    # Filas devueltas por categoría (agregadas, eliminadas, modificadas) en un diff
+    DIFF_MAX_ROWS = int(os.environ.get('DIFF_MAX_ROWS', 1000))
+    
+    # Filas de ejemplo que se devuelven por campo al validar contra un perfil
+    VALIDATION_SAMPLE_ROWS = int(os.environ.get('VALIDATION_SAMPLE_ROWS', 20))
+    
+    # Valores distintos que se muestrean para detectar los formatos de fecha
+    # de una columna, y parte que deben reconocer para tratarla como fecha
+    DATE_SAMPLE_VALUES = int(os.environ.get('DATE_SAMPLE_VALUES', 1000))
+    DATE_COLUMN_MIN_SHARE = float(os.environ.get('DATE_COLUMN_MIN_SHARE', 0.8))
+    
+    # Filas por INSERT en los scripts SQL; el texto más largo que esto es TEXT
+    SQL_BATCH_ROWS = int(os.environ.get('SQL_BATCH_ROWS', 1000))
+    SQL_VARCHAR_MAX = int(os.environ.get('SQL_VARCHAR_MAX', 1000))
+    
+    # Filas por transacción al exportar directamente a una base SQLite
+    SQLITE_BATCH_ROWS = int(os.environ.get('SQLITE_BATCH_ROWS', 50000))
+    
+    # Bloques en espera por formato al exportar a varios formatos a la vez
+    EXPORT_QUEUE_CHUNKS = int(os.environ.get('EXPORT_QUEUE_CHUNKS', 4))
 
 class DevelopmentConfig(Config):
     DEBUG = True